@@ -0,0 +1,78 @@
+"""
+Module: bench_events.py
+Description: Event store write throughput and query / paging latency over millions of events
+"""
+import argparse
+import os
+import tempfile
+import time
+import sys
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import signatures
+from processing import feature_extractor
+from utils.event_store import EventStore, EventWriter
+
+def timed(fn, repeat=5):
+    """Best of `repeat` calls, in seconds, and the last result."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--events", type=int, default=2_000_000)
+    parser.add_argument("--meters", type=int, default=10_000)
+    parser.add_argument("--segment", type=int, default=64, help="samples per stored segment")
+    parser.add_argument("--chunk", type=int, default=100_000, help="events per append_batch call")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    n_features = len(feature_extractor.DETECTOR_FEATURES)
+    flags = np.array([signatures.STATUS_SAG, signatures.STATUS_SWELL, signatures.STATUS_HARMONIC,
+                      signatures.STATUS_ANOMALY])
+    segment = 325.0 * np.sin(np.linspace(0, 2 * np.pi, args.segment))
+    meter_ids = np.array([f"meter-{i}" for i in range(args.meters)])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "events.evt")
+        start = time.perf_counter()
+        with EventWriter(path, n_features) as writer:
+            for first in range(0, args.events, args.chunk):
+                n = min(args.chunk, args.events - first)
+                writer.append_batch(meter_ids[rng.integers(0, args.meters, n)], first + np.arange(n, dtype=float),
+                                    np.broadcast_to(segment, (n, args.segment)), rng.choice(flags, n),
+                                    rng.normal(size=(n, n_features)))
+        write_s = time.perf_counter() - start
+        index_mb = os.path.getsize(path + ".idx") / 2**20
+        print(f"write  : {args.events / write_s:12,.0f} events/sec ({index_mb:.1f} MB index, "
+              f"{os.path.getsize(path) / 2**20:.1f} MB segments)")
+
+        open_s, store = timed(lambda: EventStore(path))
+        print(f"open   : {open_s * 1000:9.3f} ms")
+        mid = args.events / 2
+        cases = [
+            ("time range (1%)", lambda: store.query(start=mid, end=mid + args.events / 100)),
+            ("status (all events)", lambda: store.query(status=signatures.STATUS_SAG)),
+            ("meter (all events)", lambda: store.query(meters=["meter-7"])),
+            ("range + meter + status", lambda: store.query(start=mid, end=mid + args.events / 10,
+                                                           meters=["meter-7", "meter-8"],
+                                                           status=signatures.STATUS_SWELL)),
+        ]
+        for name, fn in cases:
+            seconds, ids = timed(fn)
+            print(f"query  : {name:24s} {seconds * 1000:9.3f} ms  ({len(ids):,} events)")
+
+        ids = store.query(status=signatures.STATUS_HARMONIC)
+        page_s, _ = timed(lambda: store.rows(ids[len(ids) // 2:len(ids) // 2 + 50]))
+        segment_s, _ = timed(lambda: store.segment(int(ids[-1])))
+        print(f"page   : {page_s * 1000:9.3f} ms per 50 rows, segment read {segment_s * 1e6:7.1f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Module: bench_feature_extraction.py
+Description: Channels/sec of the per-waveform feature loop vs the fused and batched extractors
+"""
+import argparse
+import time
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import waveform_generator, fault_injector
+from processing import feature_extractor, fft_core
+from utils import config
+
+def make_channels(n_channels, frequency=config.FREQUENCY):
+    t, wave = waveform_generator.generate_sine_wave(frequency=frequency)
+    return np.stack([fault_injector.inject_noise(wave, noise_level=0.01) for _ in range(n_channels)])
+
+def run_loop(waveforms, frequency):
+    for w in waveforms:
+        feature_extractor.calculate_rms(w)
+        feature_extractor.calculate_peak(w)
+        feature_extractor.calculate_thd(w, fundamental_freq=frequency)
+        fft_core.compute_fft(w)
+
+def run_fused(waveforms, frequency):
+    for w in waveforms:
+        feature_extractor.extract_features(w, fundamental_freq=frequency)
+
+def run_batch(waveforms, frequency):
+    feature_extractor.extract_features_batch(waveforms, fundamental_freq=frequency)
+
+def best_of(fn, repeat, *args):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--channels", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    waveforms = make_channels(args.channels)
+    loop_s = best_of(run_loop, args.repeat, waveforms, config.FREQUENCY)
+    fused_s = best_of(run_fused, args.repeat, waveforms, config.FREQUENCY)
+    batch_s = best_of(run_batch, args.repeat, waveforms, config.FREQUENCY)
+
+    print(f"channels: {args.channels} x {waveforms.shape[1]} samples")
+    print(f"loop : {args.channels / loop_s:12.0f} channels/sec")
+    print(f"fused: {args.channels / fused_s:12.0f} channels/sec ({loop_s / fused_s:.1f}x)")
+    print(f"batch: {args.channels / batch_s:12.0f} channels/sec ({loop_s / batch_s:.1f}x)")
+
+if __name__ == "__main__":
+    main()
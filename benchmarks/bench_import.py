@@ -0,0 +1,145 @@
+"""
+Module: bench_import.py
+Description: Cold import time of the processing-only and inference paths (python -X importtime)
+
+Usage:
+    python benchmarks/bench_import.py                    # run, save results, compare to baseline
+    python benchmarks/bench_import.py --save-baseline    # record this run as the baseline
+"""
+import argparse
+import json
+import platform
+import subprocess
+import time
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BENCH_DIR = os.path.join(ROOT, "benchmarks")
+BASELINE_PATH = os.path.join(BENCH_DIR, "import_baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "import_results.json")
+
+HEAVY_MODULES = ("scipy", "sklearn", "pandas", "streamlit", "plotly")
+
+# Written to stderr just before the timed statement; interpreter startup
+# imports above it are not counted
+MARKER = "-- bench_import start --"
+
+# Statement run in a fresh interpreter for each path
+PATHS = {
+    "processing": "import processing.feature_extractor",
+    "inference": "import inference.predictor_core",
+    "first_diagnose": "from inference import predictor_core; predictor_core.diagnose(230.0, 0.01)",
+}
+
+# Runs in the fresh interpreter: time the statement, report which heavy modules it loaded
+CHILD = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+sys.stderr.write({marker!r} + "\\n")
+sys.stderr.flush()
+start = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"wall_ms": elapsed * 1000,
+                   "heavy": [m for m in {heavy!r} if m in sys.modules]}}))
+"""
+
+def parse_importtime(stderr):
+    """
+    (total_ms, {top-level module: cumulative ms}) from -X importtime output
+    after MARKER. Only top-level rows (the modules the statement imported
+    directly) are summed, so nested imports are not counted twice.
+    """
+    modules = {}
+    lines = stderr.splitlines()
+    if MARKER in lines:
+        lines = lines[lines.index(MARKER) + 1:]
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        if not cumulative.strip().isdigit():
+            continue # header row
+        if name.startswith("  "):
+            continue # nested import
+        modules[name.strip()] = int(cumulative) / 1000
+    return sum(modules.values()), modules
+
+def measure(statement, repeat):
+    """Fastest of `repeat` cold runs of statement, with its top-level import breakdown."""
+    best = None
+    for _ in range(repeat):
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-c",
+                               CHILD.format(root=ROOT, marker=MARKER, statement=statement,
+                                            heavy=HEAVY_MODULES)],
+                              capture_output=True, text=True, check=True, cwd=ROOT)
+        run = json.loads(proc.stdout.strip().splitlines()[-1])
+        run["import_ms"], run["modules"] = parse_importtime(proc.stderr)
+        if best is None or run["import_ms"] < best["import_ms"]:
+            best = run
+    return best
+
+def compare(results, baseline, tolerance):
+    """Paths whose import time grew more than `tolerance` above the baseline."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = current["import_ms"] / reference["import_ms"]
+        if ratio > 1.0 + tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=5, help="heaviest top-level imports listed per path")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed import time growth vs baseline")
+    args = parser.parse_args()
+
+    results = {}
+    for name, statement in PATHS.items():
+        r = measure(statement, args.repeat)
+        results[name] = r
+        heavy = ", ".join(r["heavy"]) or "none"
+        print(f"{name:16s} import {r['import_ms']:8.1f} ms  wall {r['wall_ms']:8.1f} ms  heavy modules: {heavy}")
+        for module, ms in sorted(r["modules"].items(), key=lambda item: -item[1])[:args.top]:
+            print(f"    {module:40s} {ms:8.1f} ms")
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x of baseline import time")
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,50 @@
+"""
+Module: bench_inference.py
+Description: Windows/sec of per-row diagnose() vs diagnose_batch()
+"""
+import argparse
+import time
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference import predictor_core
+from utils import config
+
+def make_features(n, seed=0):
+    rng = np.random.default_rng(seed)
+    rms = rng.normal(config.VOLTAGE_RMS, 15, n)
+    thd = np.abs(rng.normal(0.02, 0.02, n))
+    return np.column_stack([rms, thd])
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--windows", type=int, default=1_000_000)
+    parser.add_argument("--loop-windows", type=int, default=2000, help="rows timed through diagnose()")
+    parser.add_argument("--train", action="store_true", help="fit the anomaly model first")
+    args = parser.parse_args()
+
+    if args.train:
+        predictor_core.get_detector().train(make_features(1000, seed=1))
+
+    X = make_features(args.windows)
+
+    start = time.perf_counter()
+    for rms, thd in X[:args.loop_windows]:
+        predictor_core.diagnose(rms, thd)
+    loop_s = (time.perf_counter() - start) / args.loop_windows
+
+    start = time.perf_counter()
+    codes = predictor_core.diagnose_batch(X)
+    batch_s = (time.perf_counter() - start) / args.windows
+
+    print(f"model trained: {predictor_core.get_detector().is_trained}")
+    print(f"loop : {1 / loop_s:12,.0f} windows/sec")
+    print(f"batch: {1 / batch_s:12,.0f} windows/sec ({loop_s / batch_s:.0f}x), {args.windows:,} windows")
+    print(f"flagged: {np.count_nonzero(codes):,}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Module: bench_model_load.py
+Description: Cold-start time, peak RSS and file size of pickle vs flat model formats
+"""
+import argparse
+import json
+import subprocess
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inference.anomaly_detector import AnomalyDetector
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter: import, load and score one row, report timings
+COLD_START = """
+import json, resource, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {root!r})
+from inference import model_loader
+model = model_loader.registry.preload({path!r})
+model.predict([[230.0, 0.01]])
+elapsed = time.perf_counter() - start
+# ru_maxrss survives exec on Linux, so prefer this process's own high-water mark
+try:
+    with open("/proc/self/status") as f:
+        peak_kb = next(int(line.split()[1]) for line in f if line.startswith("VmHWM"))
+except OSError:
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    "cold_start_s": elapsed,
+    "peak_rss_mb": peak_kb / 1024,
+    "sklearn_imported": "sklearn" in sys.modules,
+}}))
+"""
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--model-path", default="/tmp/bench_isolation_forest.pkl")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    detector = AnomalyDetector(model_path=args.model_path)
+    detector.train(np.column_stack([rng.normal(230, 2, 1000), np.abs(rng.normal(0.01, 0.005, 1000))]))
+
+    for label, path in (("pickle", detector.model_path), ("flat", detector.flat_model_path)):
+        runs = []
+        for _ in range(args.repeat):
+            out = subprocess.run([sys.executable, "-c", COLD_START.format(root=ROOT, path=path)],
+                                 capture_output=True, text=True, check=True).stdout
+            runs.append(json.loads(out))
+        best = min(runs, key=lambda r: r["cold_start_s"])
+        print(f"{label:6s}: cold start {best['cold_start_s'] * 1000:7.1f} ms, "
+              f"peak RSS {best['peak_rss_mb']:6.1f} MB, file {os.path.getsize(path) / 1024:7.1f} KB, "
+              f"sklearn imported: {best['sklearn_imported']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Module: bench_precision.py
+Description: Throughput and peak RSS of float64 vs float32 processing and raw int16 ADC input
+"""
+import argparse
+import json
+import subprocess
+import sys
+import os
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so each mode reports its own high-water mark
+RUN_MODE = """
+import json, sys, time
+import numpy as np
+sys.path.insert(0, {root!r})
+from utils import config, precision
+config.PRECISION = {precision!r}
+from simulation import dataset_builder
+from processing import feature_extractor
+
+rng = np.random.default_rng(0)
+start = time.perf_counter()
+waveforms = np.concatenate([dataset_builder.generate_block({block}, rng)["waveforms"]
+                            for _ in range({batch} // {block})])
+generate_s = time.perf_counter() - start
+if {adc!r}:
+    waveforms = precision.volts_to_adc(waveforms)
+
+def peak_rss_mb():
+    with open("/proc/self/status") as f:
+        return next(int(line.split()[1]) for line in f if line.startswith("VmHWM")) / 1024
+
+generate_peak_mb = peak_rss_mb()
+# Reset the high-water mark so extraction reports its own peak
+with open("/proc/self/clear_refs", "w") as f:
+    f.write("5")
+
+start = time.perf_counter()
+for i in range(0, len(waveforms), {block}):
+    feature_extractor.extract_features_batch(waveforms[i:i + {block}])
+extract_s = time.perf_counter() - start
+
+print(json.dumps({{
+    "generate_s": generate_s,
+    "extract_s": extract_s,
+    "buffer_mb": waveforms.nbytes / 2**20,
+    "generate_peak_mb": generate_peak_mb,
+    "extract_peak_mb": peak_rss_mb(),
+}}))
+"""
+
+MODES = (
+    ("float64", "float64", False),
+    ("float32", "float32", False),
+    ("int16 ADC", "float32", True),
+)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--batch", type=int, default=50000, help="Windows per mode")
+    parser.add_argument("--block", type=int, default=5000, help="Windows per generation / extraction call")
+    args = parser.parse_args()
+
+    for label, dtype, adc in MODES:
+        code = RUN_MODE.format(root=ROOT, precision=dtype, adc=adc, batch=args.batch, block=args.block)
+        result = json.loads(subprocess.run([sys.executable, "-c", code], capture_output=True,
+                                           text=True, check=True).stdout)
+        print(f"{label:10s}: generate {args.batch / result['generate_s']:9.0f} win/s, "
+              f"extract {args.batch / result['extract_s']:9.0f} win/s, "
+              f"buffer {result['buffer_mb']:7.1f} MB, peak RSS generate {result['generate_peak_mb']:7.1f} MB / "
+              f"extract {result['extract_peak_mb']:7.1f} MB")
+
+if __name__ == "__main__":
+    main()
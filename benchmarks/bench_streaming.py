@@ -0,0 +1,61 @@
+"""
+Module: bench_streaming.py
+Description: Throughput of StreamingAnalyzer on a multi-hour synthetic meter stream
+"""
+import argparse
+import time
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing.streaming import StreamingAnalyzer
+from utils import config
+
+def synthetic_stream(hours, chunk_size, sampling_rate, frequency, seed=0):
+    """
+    Phase-continuous sine stream with noise and a 100 ms sag every minute.
+    Yields chunks of `chunk_size` samples.
+    """
+    rng = np.random.default_rng(seed)
+    amplitude = config.VOLTAGE_RMS * np.sqrt(2)
+    total = int(hours * 3600 * sampling_rate)
+    sag_every = 60 * sampling_rate
+    sag_len = int(0.1 * sampling_rate)
+    for start in range(0, total, chunk_size):
+        n = np.arange(start, min(start + chunk_size, total))
+        chunk = amplitude * np.sin(2 * np.pi * frequency * n / sampling_rate)
+        chunk *= np.where(n % sag_every < sag_len, 0.5, 1.0)
+        chunk += rng.normal(0, amplitude * 0.01, len(n))
+        yield chunk
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--hours", type=float, default=3.0)
+    parser.add_argument("--chunk", type=int, default=100, help="samples per chunk")
+    parser.add_argument("--sampling-rate", type=int, default=config.SAMPLING_RATE)
+    args = parser.parse_args()
+
+    # Pre-generate so only the analyzer is timed
+    chunks = list(synthetic_stream(args.hours, args.chunk, args.sampling_rate, config.FREQUENCY))
+    analyzer = StreamingAnalyzer(sampling_rate=args.sampling_rate)
+
+    half_cycles = 0
+    sags = 0
+    start = time.perf_counter()
+    for chunk in chunks:
+        for reading in analyzer.process(chunk):
+            if reading["type"] == "rms":
+                half_cycles += len(reading["cycle_rms"])
+                sags += np.count_nonzero(reading["cycle_rms"] < config.SAG_THRESHOLD)
+    elapsed = time.perf_counter() - start
+
+    stream_s = analyzer.samples_seen / args.sampling_rate
+    print(f"stream : {stream_s / 3600:.2f} h, {analyzer.samples_seen} samples in chunks of {args.chunk}")
+    print(f"elapsed: {elapsed:.2f} s ({analyzer.samples_seen / elapsed:,.0f} samples/sec, {stream_s / elapsed:,.0f}x real time)")
+    print(f"output : {half_cycles} half-cycle readings, {sags} below sag threshold")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Module: suite.py
+Description: Benchmark suite for the simulation, processing and inference hot paths
+
+Usage:
+    python benchmarks/suite.py                      # run, save results, compare to baseline
+    python benchmarks/suite.py --quick              # 1k/10k windows only
+    python benchmarks/suite.py --save-baseline      # record this run as the baseline
+"""
+import argparse
+import json
+import platform
+import tempfile
+import time
+import tracemalloc
+import sys
+import os
+import numpy as np
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import waveform_generator, fault_injector
+from processing import feature_extractor, fft_core, three_phase, wavelet
+from inference import predictor_core
+from inference.anomaly_detector import AnomalyDetector
+from utils import config
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BASELINE_PATH = os.path.join(BENCH_DIR, "baseline.json")
+RESULTS_PATH = os.path.join(BENCH_DIR, "results.json")
+
+WINDOW_SIZES = (1_000, 10_000, 100_000, 1_000_000)
+BATCH_SIZES = (1, 100, 10_000)
+
+def window_cases(n):
+    """(name, callable, items per call) for one window of n samples (1 s at n Hz)."""
+    t, wave = waveform_generator.generate_sine_wave(sampling_rate=n)
+    harmonics = {3: 0.1, 5: 0.05, 7: 0.02}
+    return [
+        (f"generate_sine_wave[n={n}]", lambda: waveform_generator.generate_sine_wave(sampling_rate=n), 1),
+        (f"inject_sag[n={n}]", lambda: fault_injector.inject_sag(wave, depth=0.5), 1),
+        (f"inject_swell[n={n}]", lambda: fault_injector.inject_swell(wave, magnitude=1.5), 1),
+        (f"inject_harmonics[n={n}]", lambda: fault_injector.inject_harmonics(t, wave, harmonics), 1),
+        (f"inject_noise[n={n}]", lambda: fault_injector.inject_noise(wave, noise_level=0.01), 1),
+        (f"compute_fft[n={n}]", lambda: fft_core.compute_fft(wave, sampling_rate=n), 1),
+        (f"calculate_thd[n={n}]", lambda: feature_extractor.calculate_thd(wave, sampling_rate=n), 1),
+        (f"calculate_thd_sparse[n={n}]", lambda: feature_extractor.calculate_thd(wave, sampling_rate=n, method="sparse"), 1),
+        (f"extract_features[n={n}]", lambda: feature_extractor.extract_features(wave, sampling_rate=n), 1),
+    ]
+
+def batch_cases(batch, detector):
+    """(name, callable, items per call) for a batch of 1000-sample windows / feature rows."""
+    rng = np.random.default_rng(0)
+    t, wave = waveform_generator.generate_sine_wave()
+    waves = np.tile(wave, (batch, 1)) + rng.normal(0, 3, (batch, len(wave)))
+    features = np.column_stack([rng.normal(config.VOLTAGE_RMS, 10, batch), np.abs(rng.normal(0.02, 0.02, batch))])
+    short = waves[:, :int(round(config.SYNC_CYCLES * config.SAMPLING_RATE / config.FREQUENCY)) + 10] # SYNC_CYCLES cycles, with margin for a slightly slow fundamental
+    _, phases = waveform_generator.generate_three_phase(amplitudes=np.full((max(1, batch // 3), 3), wave.max()))
+    cases = [
+        (f"extract_features_batch[batch={batch}]", lambda: feature_extractor.extract_features_batch(waves), batch),
+        (f"analyze_three_phase[batch={batch}]", lambda: three_phase.analyze_three_phase(phases), phases.shape[0] * 3),
+        (f"dwt_features[batch={batch}]", lambda: wavelet.dwt_features(waves), batch),
+        (f"sparse_thd_batch[batch={batch}]", lambda: feature_extractor.sparse_thd_batch(waves), batch),
+        (f"sparse_thd_batch_tracked[batch={batch}]", lambda: feature_extractor.sparse_thd_batch(waves, track_frequency=True), batch),
+        (f"synchronous_features[batch={batch}]", lambda: feature_extractor.synchronous_features(short), batch),
+        (f"diagnose_batch[batch={batch}]", lambda: predictor_core.diagnose_batch(features), batch),
+        (f"predict_batch[batch={batch}]", lambda: detector.predict_batch(features), batch),
+    ]
+    if batch == 1:
+        rms, thd = features[0]
+        cases += [
+            ("diagnose", lambda: predictor_core.diagnose(rms, thd), 1),
+            ("AnomalyDetector.predict", lambda: detector.predict([rms, thd]), 1),
+        ]
+    return cases
+
+def measure(fn, items=1, min_time=0.2, max_calls=10_000):
+    """
+    Per-call latencies until min_time elapsed, then one traced call for peak
+    memory. items: windows or rows handled per call, for items_per_sec.
+    """
+    fn() # warm caches / plans
+    latencies = []
+    deadline = time.perf_counter() + min_time
+    while len(latencies) < max_calls and (len(latencies) < 3 or time.perf_counter() < deadline):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = np.array(latencies)
+    return {
+        "calls": len(latencies),
+        "ops_per_sec": float(1.0 / latencies.mean()),
+        "items_per_sec": float(items / latencies.mean()),
+        "p50_ms": float(np.percentile(latencies, 50) * 1000),
+        "p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "peak_mem_kb": peak / 1024,
+    }
+
+def compare(results, baseline, tolerance):
+    """Cases whose ops/sec fell more than `tolerance` below the baseline."""
+    regressions = []
+    for name, current in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        ratio = current["ops_per_sec"] / reference["ops_per_sec"]
+        if ratio < 1.0 - tolerance:
+            regressions.append((name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark suite")
+    parser.add_argument("--quick", action="store_true", help="only 1k and 10k sample windows")
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds per case")
+    parser.add_argument("--filter", default="", help="only cases whose name contains this")
+    parser.add_argument("--out", default=RESULTS_PATH)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed ops/sec drop vs baseline")
+    args = parser.parse_args()
+
+    sizes = WINDOW_SIZES[:2] if args.quick else WINDOW_SIZES
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Score against a trained model without touching data/models
+        detector = AnomalyDetector(model_path=os.path.join(tmp, "isolation_forest.pkl"))
+        rng = np.random.default_rng(1)
+        detector.train(np.column_stack([rng.normal(config.VOLTAGE_RMS, 2, 500), np.abs(rng.normal(0.01, 0.005, 500))]))
+        predictor_core.set_detector(detector)
+
+        cases = [case for n in sizes for case in window_cases(n)]
+        cases += [case for batch in BATCH_SIZES for case in batch_cases(batch, detector)]
+
+        results = {}
+        for name, fn, items in cases:
+            if args.filter not in name:
+                continue
+            results[name] = measure(fn, items, args.min_time)
+            r = results[name]
+            print(f"{name:42s} {r['ops_per_sec']:12.1f} ops/s {r['items_per_sec']:12.0f} items/s  p50 {r['p50_ms']:9.3f} ms  "
+                  f"p99 {r['p99_ms']:9.3f} ms  peak {r['peak_mem_kb']:10.1f} KB")
+
+    report = {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        },
+        "results": results,
+    }
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"results written to {args.out}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare against (run with --save-baseline)")
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline, args.tolerance)
+    for name, ratio in regressions:
+        print(f"REGRESSION {name}: {ratio:.2f}x of baseline ops/sec")
+    if not regressions:
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
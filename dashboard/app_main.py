@@ -11,96 +11,131 @@ import numpy as np
 # Add parent directory to path to import modules
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from simulation import waveform_generator, fault_injector
-from processing import feature_extractor, fft_core
-from inference import predictor_core
+from simulation import dataset_builder
+from processing import feature_extractor
 from inference.anomaly_detector import AnomalyDetector
-from dashboard import components, visualizations
-from utils import config
+from inference import predictor_core
+from dashboard import components, visualizations, pipeline, live_worker
+from utils import config, logger
+from utils.event_store import EventStore
 
 # Config should be set first
 st.set_page_config(page_title="Smart Meter with a Brain", page_icon="⚡", layout="wide")
 
+# Load the saved anomaly models before the first analysis cycle
+predictor_core.preload()
+
 st.title("⚡ Smart Meter 'Edge AI' Prototype")
 st.markdown("Real-time Power Quality Analysis & Fault Classification")
 
 # Render Sidebar
-freq, noise_level, fault_type = components.render_sidebar()
+freq, noise_level, fault_type, seed = components.render_sidebar()
 sag_depth, swell_mag, harmonics = components.get_fault_params(fault_type)
 
 st.sidebar.divider()
 st.sidebar.subheader("Advanced AI")
 if st.sidebar.button("Train Anomaly Model"):
     # Train on 100 random normal samples
-    features = []
-    for _ in range(100):
-        t, w = waveform_generator.generate_sine_wave(frequency=50) # Normal
-        w = fault_injector.inject_noise(w, noise_level=0.01)
-        r = feature_extractor.calculate_rms(w)
-        th = feature_extractor.calculate_thd(w, 50)
-        features.append([r, th])
+    block = dataset_builder.generate_block(100, np.random.default_rng(), fault_classes=("Normal",),
+                                           frequency=50, noise_range=(0.01, 0.01))
+    batch = feature_extractor.extract_features_batch(block["waveforms"], fundamental_freq=50, wavelet_features=True)
+    features = feature_extractor.detector_matrix(batch)
     
     ad = AnomalyDetector()
     ad.train(features)
     st.sidebar.success("Model Trained on Normal Data!")
 
+# Per-stage timing
+show_timing = st.sidebar.checkbox("Show Pipeline Timing", value=logger.is_enabled())
+logger.enable(show_timing)
+
 # Live Mode Toggle
 live_mode = st.sidebar.checkbox("Start Live Simulation", value=False)
+show_events = st.sidebar.checkbox("Show Event Log", value=False, disabled=live_mode)
 
 def run_cycle():
-    # 1. Generat
-    t, waveform = waveform_generator.generate_sine_wave(frequency=freq)
-
-    # 2. Inject Faults
-    if fault_type == "Sag":
-        waveform = fault_injector.inject_sag(waveform, depth=sag_depth)
-    elif fault_type == "Swell":
-        waveform = fault_injector.inject_swell(waveform, magnitude=swell_mag)
-    elif fault_type == "Harmonics":
-        waveform = fault_injector.inject_harmonics(t, waveform, harmonics)
-
-    # Random jitter in live mode to make it look alive
-    if live_mode:
-        noise_jitter = np.random.uniform(0.8, 1.2)
-        waveform = fault_injector.inject_noise(waveform, noise_level=noise_level * noise_jitter)
-        # Shift phase slightly? No need, random noise is enough for visual jitter
-    else:
-        waveform = fault_injector.inject_noise(waveform, noise_level=noise_level)
-
-    # 3. Process
-    rms_val = feature_extractor.calculate_rms(waveform)
-    thd_val = feature_extractor.calculate_thd(waveform, fundamental_freq=freq)
-    fft_freqs, fft_mags = fft_core.compute_fft(waveform)
-
-    # 4. Infer
-    diagnosis = predictor_core.diagnose(rms_val, thd_val)
-
-    return t, waveform, fft_freqs, fft_mags, rms_val, thd_val, diagnosis
+    return pipeline.run_cycle(freq, fault_type, sag_depth, swell_mag, harmonics, noise_level,
+                              jitter=live_mode, seed=seed)
 
 # Main Loop Area
 placeholder = st.empty()
 
 if live_mode:
-    # Run loop
+    analysis_interval, refresh_interval = components.render_live_settings(config)
+
+    # Analysis runs on a background thread that outlives script reruns; the
+    # script thread only redraws the newest result at its own refresh rate.
+    worker = st.session_state.get("analysis_worker")
+    if worker is None or not worker.is_alive():
+        worker = live_worker.AnalysisWorker(run_cycle, interval=analysis_interval).start()
+        st.session_state["analysis_worker"] = worker
+    worker.set_cycle(run_cycle)
+    worker.interval = analysis_interval
+
+    with placeholder.container():
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            time_slot = st.empty()
+            freq_slot = st.empty()
+        with col2:
+            metrics_slot = st.empty()
+
+    time_fig = st.session_state.get("time_fig")
+    freq_fig = st.session_state.get("freq_fig")
     while True:
-        t, wave, f_f, f_m, rms, thd, diag = run_cycle()
-        
-        with placeholder.container():
-            col1, col2 = st.columns([3, 1])
-            with col1:
-                st.plotly_chart(visualizations.plot_time_domain(t, wave), use_container_width=True, key=f"time_{time.time()}")
-                st.plotly_chart(visualizations.plot_frequency_domain(f_f, f_m), use_container_width=True, key=f"freq_{time.time()}")
-            with col2:
+        latest = worker.latest()
+        if latest is not None:
+            t, wave, f_f, f_m, rms, thd, diag = latest["result"]
+            if time_fig is None:
+                time_fig = st.session_state["time_fig"] = visualizations.plot_time_domain(t, wave)
+                freq_fig = st.session_state["freq_fig"] = visualizations.plot_frequency_domain(f_f, f_m)
+            else:
+                visualizations.update_time_domain(time_fig, t, wave)
+                visualizations.update_frequency_domain(freq_fig, f_f, f_m)
+
+            time_slot.plotly_chart(time_fig, use_container_width=True, key=f"time_{latest['seq']}")
+            freq_slot.plotly_chart(freq_fig, use_container_width=True, key=f"freq_{latest['seq']}")
+            with metrics_slot.container():
                 components.render_metrics(rms, thd, diag, config)
-        
-        time.sleep(0.5) # Update every 0.5s
+                components.render_worker_status(worker)
+                if show_timing:
+                    components.render_timing_panel(logger.metrics.snapshot())
+
+        time.sleep(refresh_interval)
 else:
-    # Single run
+    worker = st.session_state.pop("analysis_worker", None)
+    if worker is not None:
+        worker.stop()
+
+    # Single run; seeded cycles are cached, and so are their figures while
+    # the settings stay the same
     t, wave, f_f, f_m, rms, thd, diag = run_cycle()
+    figure_key = (freq, fault_type, pipeline.fault_params(fault_type, sag_depth, swell_mag, harmonics),
+                  noise_level, seed)
+    figures = st.session_state.get("static_figs")
+    if figures is None or figures[0] != figure_key:
+        figures = st.session_state["static_figs"] = (
+            figure_key, visualizations.plot_time_domain(t, wave), visualizations.plot_frequency_domain(f_f, f_m))
     with placeholder.container():
         col1, col2 = st.columns([3, 1])
         with col1:
-            st.plotly_chart(visualizations.plot_time_domain(t, wave), use_container_width=True)
-            st.plotly_chart(visualizations.plot_frequency_domain(f_f, f_m), use_container_width=True)
+            st.plotly_chart(figures[1], use_container_width=True)
+            st.plotly_chart(figures[2], use_container_width=True)
         with col2:
             components.render_metrics(rms, thd, diag, config)
+            if show_timing:
+                components.render_timing_panel(logger.metrics.snapshot())
+
+    if show_events:
+        # The store is memory-mapped once per session and refreshed to pick up new events
+        store = st.session_state.get("event_store")
+        if store is None and os.path.exists(config.EVENT_STORE_PATH):
+            store = st.session_state["event_store"] = EventStore(config.EVENT_STORE_PATH)
+        elif store is not None:
+            store.refresh()
+        event_id = components.render_event_log(store, config.EVENT_PAGE_SIZE)
+        if event_id is not None:
+            record = store.records[event_id]
+            segment = store.segment(event_id)
+            t_event = (np.arange(len(segment)) - int(record["trigger"])) / store.sampling_rate
+            st.plotly_chart(visualizations.plot_time_domain(t_event, segment), use_container_width=True)
@@ -2,8 +2,14 @@
 Module: components.py
 Description: Reusable UI components
 """
-import streamlit as st
-from simulation import waveform_generator, fault_injector
+import numpy as np
+from datetime import datetime, timezone
+
+from inference import signatures
+from utils.lazy import LazyModule
+
+# streamlit loads when the first widget is rendered
+st = LazyModule("streamlit")
 
 def render_sidebar():
     st.sidebar.header("Simulation Settings")
@@ -12,12 +18,14 @@ def render_sidebar():
     st.sidebar.subheader("Generator")
     freq = st.sidebar.slider("Frequency (Hz)", 40, 70, 50)
     noise_level = st.sidebar.slider("Noise Level", 0.0, 0.1, 0.01)
+    seed = st.sidebar.number_input("Noise Seed", min_value=0, value=0, step=1,
+                                   help="Same seed and settings reproduce (and reuse) the same window")
 
     # 2. Fault Injection
     st.sidebar.subheader("Fault Injection")
     fault_type = st.sidebar.selectbox("Inject Fault", ["None", "Sag", "Swell", "Harmonics"])
     
-    return freq, noise_level, fault_type
+    return freq, noise_level, fault_type, int(seed)
 
 def get_fault_params(fault_type):
     sag_depth = 0.5
@@ -36,6 +44,26 @@ def get_fault_params(fault_type):
         
     return sag_depth, swell_mag, harmonics
 
+def render_live_settings(config):
+    st.sidebar.subheader("Live Rates")
+    analysis_interval = st.sidebar.slider("Analysis Interval (s)", 0.05, 2.0, float(config.ANALYSIS_INTERVAL))
+    refresh_interval = st.sidebar.slider("Refresh Interval (s)", 0.1, 5.0, float(config.DASHBOARD_REFRESH_INTERVAL))
+    return analysis_interval, refresh_interval
+
+def render_worker_status(worker):
+    st.caption(f"Analysed {worker.produced} windows, "
+               f"{worker.last_cycle_s * 1000:.1f} ms/cycle, {worker.dropped} skipped by the display")
+
+def render_timing_panel(snapshot):
+    st.markdown("### Pipeline Timing")
+    if not snapshot:
+        st.caption("No samples yet.")
+        return
+    rows = [{"stage": stage, "calls": s["count"], "mean (ms)": round(s["mean_ms"], 3),
+             "p99 (ms)": round(s["p99_ms"], 3), "max (ms)": round(s["max_ms"], 3)}
+            for stage, s in snapshot.items()]
+    st.dataframe(rows, hide_index=True)
+
 def render_metrics(rms_val, thd_val, diagnosis, config):
     st.subheader("Diagnostics")
     
@@ -55,3 +83,46 @@ def render_metrics(rms_val, thd_val, diagnosis, config):
     st.caption(f"Sag: < {config.SAG_THRESHOLD} V")
     st.caption(f"Swell: > {config.SWELL_THRESHOLD} V")
     st.caption(f"THD: > {config.THD_THRESHOLD*100} %")
+
+EVENT_STATUS_FILTERS = {"Sag": signatures.STATUS_SAG, "Swell": signatures.STATUS_SWELL,
+                        "Harmonic": signatures.STATUS_HARMONIC, "Anomaly": signatures.STATUS_ANOMALY,
+                        "Unbalance": signatures.STATUS_UNBALANCE}
+
+def render_event_log(store, page_size):
+    """
+    Paged table of recorded events. Only the IDs matching the filters are
+    computed over the whole store; rows are read for the current page only.
+    Returns the event ID selected for plotting, or None.
+    """
+    st.markdown("### Event Log")
+    if store is None or len(store) == 0:
+        st.caption("No events recorded yet (run the fleet service or replay with --events).")
+        return None
+
+    col1, col2 = st.columns(2)
+    meters = col1.text_input("Meters (comma separated)", "")
+    kinds = col2.multiselect("Fault types", list(EVENT_STATUS_FILTERS))
+    meters = [m.strip() for m in meters.split(",") if m.strip()] or None
+    status = None
+    for kind in kinds:
+        status = (status or 0) | EVENT_STATUS_FILTERS[kind]
+
+    ids = store.query(meters=meters, status=status)
+    n_pages = max(1, -(-len(ids) // page_size))
+    page = st.number_input(f"Page (of {n_pages})", min_value=1, max_value=n_pages, value=1, step=1)
+    page_ids = ids[(page - 1) * page_size:page * page_size]
+    st.caption(f"{len(ids)} of {len(store)} events")
+    if len(page_ids) == 0:
+        return None
+
+    rows = store.rows(page_ids)
+    st.dataframe([{
+        "id": row["id"],
+        "time (UTC)": datetime.fromtimestamp(row["time"], timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3],
+        "meter": row["meter"],
+        "diagnosis": signatures.status_message(row["status"]),
+        "rms (V)": round(float(row["features"][0]), 2),
+        "thd (%)": round(float(row["features"][1]) * 100, 2),
+        "duration (s)": row["duration_s"],
+    } for row in rows], hide_index=True)
+    return st.selectbox("Plot event", [int(i) for i in np.asarray(page_ids)])
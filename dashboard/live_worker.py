@@ -0,0 +1,89 @@
+"""
+Module: live_worker.py
+Description: Background acquisition/analysis thread feeding the live dashboard
+"""
+import queue
+import threading
+import time
+
+from utils import config
+
+class AnalysisWorker:
+    """
+    Runs `cycle_fn` every `interval` seconds on a daemon thread and keeps the
+    newest results in a bounded queue (the oldest is dropped when full), so
+    analysis keeps its own pace however slowly the UI drains it. The thread
+    stops itself once nobody has asked for results for `idle_timeout` seconds,
+    e.g. after the browser session went away.
+    """
+    def __init__(self, cycle_fn, interval=config.ANALYSIS_INTERVAL, maxsize=config.RESULT_QUEUE_SIZE,
+                 idle_timeout=config.WORKER_IDLE_TIMEOUT):
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.produced = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_cycle_s = 0.0
+        self._cycle_fn = cycle_fn
+        self._results = queue.Queue(maxsize=maxsize)
+        self._stop = threading.Event()
+        self._last_poll = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="analysis-worker", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+    def is_alive(self):
+        return self._thread.is_alive()
+
+    def set_cycle(self, cycle_fn):
+        """Swaps the analysis function, e.g. after the user changed a setting."""
+        self._cycle_fn = cycle_fn
+
+    def latest(self):
+        """Drains the queue and returns the newest result (or None): {'seq', 'time', 'result'}."""
+        self._last_poll = time.monotonic()
+        newest = None
+        while True:
+            try:
+                newest = self._results.get_nowait()
+            except queue.Empty:
+                return newest
+
+    def _run(self):
+        next_tick = time.monotonic()
+        while not self._stop.is_set():
+            if time.monotonic() - self._last_poll > self.idle_timeout:
+                break
+
+            start = time.perf_counter()
+            try:
+                result = self._cycle_fn()
+            except Exception as e: # keep the feed alive; the UI shows the last good frame
+                self.errors += 1
+                self.last_error = repr(e)
+            else:
+                self.produced += 1
+                self._publish({"seq": self.produced, "time": time.time(), "result": result})
+            self.last_cycle_s = time.perf_counter() - start
+
+            # Fixed cadence; if a cycle overran, restart the schedule instead of bursting
+            next_tick = max(next_tick + self.interval, time.monotonic())
+            self._stop.wait(next_tick - time.monotonic())
+
+    def _publish(self, item):
+        while True:
+            try:
+                self._results.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._results.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
@@ -0,0 +1,121 @@
+"""
+Module: pipeline.py
+Description: One simulate -> process -> infer cycle, independent of Streamlit
+"""
+import numpy as np
+from collections import OrderedDict
+import threading
+
+from simulation import waveform_generator, fault_injector
+from processing import feature_extractor
+from inference import predictor_core
+from utils import config
+from utils.logger import stage_timer
+
+# LRU over clean waveforms, faulted waveforms and seeded feature/spectrum
+# results. Cached arrays are shared between reruns and made read-only.
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_cache_stats = {"hits": 0, "misses": 0}
+
+def _memo(key, compute):
+    with _cache_lock:
+        value = _cache.get(key)
+        if value is not None:
+            _cache.move_to_end(key)
+            _cache_stats["hits"] += 1
+            return value
+        _cache_stats["misses"] += 1
+
+    value = compute()
+    with _cache_lock:
+        _cache[key] = value
+        while len(_cache) > config.CYCLE_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return value
+
+def _frozen(*arrays):
+    for array in arrays:
+        array.setflags(write=False)
+    return arrays if len(arrays) > 1 else arrays[0]
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
+        _cache_stats.update(hits=0, misses=0)
+
+def cache_stats():
+    with _cache_lock:
+        return dict(_cache_stats, size=len(_cache))
+
+def fault_params(fault_type, sag_depth, swell_mag, harmonics):
+    """The hashable subset of fault settings that affects `fault_type`."""
+    if fault_type == "Sag":
+        return (sag_depth,)
+    if fault_type == "Swell":
+        return (swell_mag,)
+    if fault_type == "Harmonics":
+        return tuple(sorted(harmonics.items()))
+    return ()
+
+def _clean_wave(freq):
+    return _memo(("clean", freq), lambda: _frozen(*waveform_generator.generate_sine_wave(frequency=freq)))
+
+def _faulted_wave(freq, fault_type, params):
+    def inject():
+        t, waveform = _clean_wave(freq)
+        if fault_type == "Sag":
+            waveform = fault_injector.inject_sag(waveform, depth=params[0])
+        elif fault_type == "Swell":
+            waveform = fault_injector.inject_swell(waveform, magnitude=params[0])
+        elif fault_type == "Harmonics":
+            waveform = fault_injector.inject_harmonics(t, waveform, dict(params))
+        return _frozen(waveform) if waveform.flags.writeable else waveform
+    return _memo(("faulted", freq, fault_type, params), inject)
+
+def _analyse(freq, fault_type, params, noise_level, rng):
+    """Generate/inject (from cache where possible), add noise, extract features."""
+    with stage_timer("cycle.generate"):
+        t, _ = _clean_wave(freq)
+
+    with stage_timer("cycle.inject"):
+        waveform = _faulted_wave(freq, fault_type, params)
+        if rng is None:
+            waveform = fault_injector.inject_noise(waveform, noise_level=noise_level)
+        else:
+            waveform = fault_injector.inject_noise_batch(waveform[np.newaxis, :], noise_level, rng)[0]
+
+    with stage_timer("cycle.process"):
+        features = feature_extractor.extract_features(waveform, fundamental_freq=freq, wavelet_features=True)
+        detector_row = tuple(features[name] for name in feature_extractor.DETECTOR_FEATURES)
+
+    return t, waveform, features["frequencies"], features["magnitudes"], detector_row
+
+def run_cycle(freq, fault_type, sag_depth, swell_mag, harmonics, noise_level, jitter=False, seed=None):
+    """
+    Generates one window, injects the selected fault and analyses it.
+    jitter: randomize the noise level (live mode) so the display looks alive
+    seed: noise seed; a seeded cycle is deterministic, so its waveform,
+          spectrum and features are served from the LRU cache on repeats
+          (the diagnosis is always recomputed against the current model)
+    Returns: t, waveform, fft_freqs, fft_mags, rms, thd, diagnosis
+    """
+    params = fault_params(fault_type, sag_depth, swell_mag, harmonics)
+    with stage_timer("cycle.total"):
+        if seed is not None and not jitter:
+            def compute():
+                analysis = _analyse(freq, fault_type, params, noise_level, np.random.default_rng(seed))
+                _frozen(analysis[1], analysis[3])
+                return analysis
+            analysis = _memo(("cycle", freq, fault_type, params, noise_level, seed), compute)
+        else:
+            if jitter:
+                noise_level = noise_level * np.random.uniform(0.8, 1.2)
+            analysis = _analyse(freq, fault_type, params, noise_level, None)
+
+        t, waveform, fft_freqs, fft_mags, detector_row = analysis
+        rms_val, thd_val = detector_row[:2]
+        with stage_timer("cycle.diagnose"):
+            diagnosis = predictor_core.diagnose(*detector_row)
+
+    return t, waveform, fft_freqs, fft_mags, rms_val, thd_val, diagnosis
@@ -2,11 +2,57 @@
 Module: visualizations.py
 Description: Plotting logic for the dashboard
 """
-import plotly.graph_objects as go
+import numpy as np
 
-def plot_time_domain(t, waveform, samples=200):
+from utils import config
+from utils.lazy import LazyModule
+
+# plotly loads when the first figure is built
+go = LazyModule("plotly.graph_objects")
+
+def decimate_minmax(x, y, max_points=config.PLOT_MAX_POINTS):
+    """
+    Min/max-preserving decimation: keeps the minimum and maximum of each of
+    max_points/2 buckets in time order, so peaks and dips survive at any N.
+    """
+    n = len(y)
+    if n <= max_points:
+        return x, y
+
+    n_buckets = max_points // 2
+    size = -(-n // n_buckets)
+    # Pad the last bucket with the final sample; padded picks map back to it
+    buckets = np.pad(np.asarray(y), (0, n_buckets * size - n), mode='edge').reshape(n_buckets, size)
+    picks = np.sort(np.stack([buckets.argmin(axis=1), buckets.argmax(axis=1)], axis=1), axis=1)
+    idx = np.minimum((picks + (np.arange(n_buckets) * size)[:, np.newaxis]).ravel(), n - 1)
+    return x[idx], y[idx]
+
+def aggregate_spectrum(frequencies, magnitudes, max_bins=config.SPECTRUM_MAX_BINS):
+    """
+    Peak-preserving bin aggregation: each group of adjacent bins is replaced
+    by its largest bin, so harmonic spikes keep their height and frequency.
+    """
+    n = len(magnitudes)
+    if n <= max_bins:
+        return frequencies, magnitudes
+
+    size = -(-n // max_bins)
+    padded = np.full(max_bins * size, -np.inf)
+    padded[:n] = magnitudes
+    groups = padded.reshape(max_bins, size)
+    idx = groups.argmax(axis=1) + np.arange(max_bins) * size
+    idx = idx[idx < n]
+    return frequencies[idx], magnitudes[idx]
+
+def plot_time_domain(t, waveform, samples=None, max_points=config.PLOT_MAX_POINTS):
+    """
+    Oscilloscope view of the first `samples` samples (default: the whole
+    window), decimated to at most max_points. Large windows use WebGL.
+    """
+    n = len(waveform) if samples is None else min(samples, len(waveform))
+    trace = go.Scattergl if n > config.WEBGL_MIN_POINTS else go.Scatter
     fig = go.Figure()
-    fig.add_trace(go.Scatter(x=t[:samples], y=waveform[:samples], mode='lines', name='Voltage'))
+    fig.add_trace(trace(mode='lines', name='Voltage'))
     fig.update_layout(
         title="Time Domain (Oscilloscope)", 
         xaxis_title="Time (s)", 
@@ -14,11 +60,23 @@ def plot_time_domain(t, waveform, samples=200):
         height=350,
         margin=dict(l=20, r=20, t=40, b=20)
     )
+    return update_time_domain(fig, t, waveform, samples, max_points)
+
+def update_time_domain(fig, t, waveform, samples=None, max_points=config.PLOT_MAX_POINTS):
+    """Replaces the trace data of a plot_time_domain figure in place."""
+    x, y = decimate_minmax(t[:samples], waveform[:samples], max_points)
+    fig.data[0].update(x=x, y=y)
     return fig
 
-def plot_frequency_domain(frequencies, magnitudes, limit=100):
+def plot_frequency_domain(frequencies, magnitudes, limit=None, max_bins=config.SPECTRUM_MAX_BINS):
+    """
+    Spectrum of the first `limit` bins (default: all), aggregated to at most
+    max_bins. Drawn as bars while that stays readable, else as a WebGL line.
+    """
+    n = min(len(magnitudes) if limit is None else limit, max_bins)
+    trace = go.Bar(name='Spectrum') if n <= config.SPECTRUM_BAR_LIMIT else go.Scattergl(mode='lines', name='Spectrum')
     fig = go.Figure()
-    fig.add_trace(go.Bar(x=frequencies[:limit], y=magnitudes[:limit], name='Spectrum'))
+    fig.add_trace(trace)
     fig.update_layout(
         title="Frequency Domain (Spectrum)", 
         xaxis_title="Frequency (Hz)", 
@@ -26,4 +84,10 @@ def plot_frequency_domain(frequencies, magnitudes, limit=100):
         height=350,
         margin=dict(l=20, r=20, t=40, b=20)
     )
+    return update_frequency_domain(fig, frequencies, magnitudes, limit, max_bins)
+
+def update_frequency_domain(fig, frequencies, magnitudes, limit=None, max_bins=config.SPECTRUM_MAX_BINS):
+    """Replaces the trace data of a plot_frequency_domain figure in place."""
+    x, y = aggregate_spectrum(frequencies[:limit], magnitudes[:limit], max_bins)
+    fig.data[0].update(x=x, y=y)
     return fig
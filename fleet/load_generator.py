@@ -0,0 +1,75 @@
+"""
+Module: load_generator.py
+Description: Synthetic multi-meter load for benchmarking the fleet service
+"""
+import numpy as np
+import argparse
+import json
+import time
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simulation import waveform_generator, fault_injector
+from fleet.service import FleetService
+from utils import config
+
+def generate_round(n_meters, rng, fault_rate=0.1):
+    """
+    One window per meter: a clean sine from waveform_generator with noise,
+    plus a sag or harmonics on a random `fault_rate` share of the meters.
+    Returns: (n_meters, n_samples) waveforms
+    """
+    t, wave = waveform_generator.generate_sine_wave()
+    waveforms = np.tile(wave, (n_meters, 1))
+    faulty = rng.random(n_meters) < fault_rate
+    depths = np.where(faulty & (rng.random(n_meters) < 0.5), rng.uniform(0.3, 0.8, n_meters), 1.0)
+    fault_injector.inject_sag_batch(waveforms, depths, out=waveforms)
+    ratios = np.where((faulty & (depths == 1.0))[:, np.newaxis], rng.uniform(0.05, 0.2, (n_meters, 3)), 0.0)
+    fault_injector.inject_harmonics_batch(t, waveforms, ratios, out=waveforms)
+    fault_injector.inject_noise_batch(waveforms, 0.01, rng, out=waveforms)
+    return waveforms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--meters", type=int, default=1000)
+    parser.add_argument("--rounds", type=int, default=20, help="windows per meter")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=config.FLEET_BATCH_SIZE)
+    parser.add_argument("--spool", default=None, help="write rounds as spool files instead of driving the service")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    meter_ids = np.array([f"meter-{i:05d}" for i in range(args.meters)])
+
+    if args.spool:
+        os.makedirs(args.spool, exist_ok=True)
+        for r in range(args.rounds):
+            path = os.path.join(args.spool, f"round_{r:06d}.npz")
+            np.savez(path + ".tmp.npz", meter_ids=meter_ids, waveforms=generate_round(args.meters, rng),
+                     timestamps=np.full(args.meters, time.time()))
+            os.replace(path + ".tmp.npz", path) # the service only picks up complete files
+        print(f"wrote {args.rounds} rounds of {args.meters} windows to {args.spool}")
+        return
+
+    service = FleetService(n_workers=args.workers, batch_size=args.batch_size)
+    try:
+        start = time.perf_counter()
+        for _ in range(args.rounds):
+            service.submit_many(meter_ids, generate_round(args.meters, rng))
+        service.drain()
+        elapsed = time.perf_counter() - start
+    finally:
+        service.close()
+
+    stats = service.stats()
+    stats["wall_windows_per_sec"] = stats["windows"] / elapsed
+    flagged = sum(1 for _, code, _, _ in service.latest.values() if code)
+    print(json.dumps(stats, indent=2))
+    print(f"meters with a fault in their latest window: {flagged}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Module: replay.py
+Description: Faster-than-real-time replay of raw waveform captures through the analysis pipeline
+"""
+import numpy as np
+import argparse
+import json
+import time
+import sys
+import os
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet.service import analyze_batch
+from fleet.load_generator import generate_round
+from inference import predictor_core, signatures
+from inference.event_recorder import EventRecorder
+from processing import feature_extractor
+from utils import config, io, precision
+from utils.event_store import EventWriter
+
+def replay_capture(path, window_seconds=config.DURATION, batch=config.FLEET_BATCH_SIZE, start=None, end=None,
+                   channel=0, fundamental_freq=config.FREQUENCY, recorder=None, synchronous=False):
+    """
+    Streams a capture through feature extraction and diagnosis in batches of
+    memory-mapped windows; only one batch is ever resident in RAM.
+    start, end: optional timestamps (seek via the capture's sparse index)
+    recorder: optional EventRecorder fed every batch, with the capture's file
+              name as the meter ID
+    synchronous: see analyze_batch; pair it with a short window_seconds
+                 (e.g. 0.2) for 200 ms decisions
+    Yields: analyze_batch results with an added 'timestamps' (window starts)
+    """
+    capture = io.Capture(path)
+    window = int(round(window_seconds * capture.sampling_rate))
+    meter_id = os.path.basename(path)
+    for timestamps, windows in capture.windows(window, start=start, end=end, batch=batch, channel=channel):
+        result = analyze_batch(windows, fundamental_freq, capture.sampling_rate, volts_per_count=capture.scale,
+                               synchronous=synchronous)
+        result["timestamps"] = timestamps
+        if recorder is not None:
+            volts = precision.adc_to_volts(windows, capture.scale) if precision.is_adc(windows) else windows
+            recorder.process_batch([meter_id] * len(windows), timestamps, volts, result["codes"], result["features"])
+        yield result
+
+def synthesize_capture(path, seconds, rng, fault_rate=0.05, start_time=None):
+    """Writes `seconds` of synthetic int16 ADC signal (1 s windows from load_generator) to a capture."""
+    with io.CaptureWriter(path, config.SAMPLING_RATE, dtype=np.int16, scale=config.ADC_VOLTS_PER_COUNT,
+                          start_time=start_time) as writer:
+        for done in range(0, seconds, 600):
+            waveforms = generate_round(min(600, seconds - done), rng, fault_rate)
+            writer.append(precision.volts_to_adc(waveforms.ravel()))
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a raw capture through the analysis pipeline")
+    parser.add_argument("capture", help="capture file written by utils.io.CaptureWriter")
+    parser.add_argument("--window", type=float, default=config.DURATION, help="seconds per analysis window")
+    parser.add_argument("--batch-size", type=int, default=config.FLEET_BATCH_SIZE)
+    parser.add_argument("--synchronous", action="store_true",
+                        help="whole-cycle RMS/THD at the tracked frequency, for short windows (e.g. --window 0.2)")
+    parser.add_argument("--start", type=float, default=None, help="start timestamp (epoch seconds)")
+    parser.add_argument("--end", type=float, default=None, help="end timestamp (epoch seconds)")
+    parser.add_argument("--synthesize", type=int, default=None, metavar="SECONDS",
+                        help="first write SECONDS of synthetic signal to the capture path")
+    parser.add_argument("--events", default=None, metavar="PATH",
+                        help="record fault events to this event store (e.g. %s)" % config.EVENT_STORE_PATH)
+    args = parser.parse_args()
+
+    if args.synthesize:
+        synthesize_capture(args.capture, args.synthesize, np.random.default_rng(0))
+
+    writer = recorder = None
+    if args.events:
+        writer = EventWriter(args.events, len(feature_extractor.DETECTOR_FEATURES),
+                             sampling_rate=io.Capture(args.capture).sampling_rate)
+        recorder = EventRecorder(writer, sampling_rate=writer.sampling_rate)
+
+    predictor_core.preload() # load the model before the clock starts
+    started = time.perf_counter()
+    windows = 0
+    statuses = {}
+    try:
+        for result in replay_capture(args.capture, args.window, args.batch_size, args.start, args.end,
+                                     recorder=recorder, synchronous=args.synchronous):
+            windows += len(result["codes"])
+            for code, count in zip(*np.unique(result["codes"], return_counts=True)):
+                message = signatures.status_message(code)
+                statuses[message] = statuses.get(message, 0) + int(count)
+    finally:
+        if writer is not None:
+            recorder.flush()
+            writer.close()
+    elapsed = time.perf_counter() - started
+
+    print(json.dumps({
+        "windows": windows,
+        "signal_s": windows * args.window,
+        "elapsed_s": elapsed,
+        "realtime_factor": windows * args.window / elapsed if elapsed > 0 else None,
+        "statuses": statuses,
+        "events": recorder.events_written if recorder is not None else None,
+    }))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,304 @@
+"""
+Module: service.py
+Description: Headless multi-meter analysis service with a worker pool and backpressure
+"""
+import numpy as np
+import argparse
+import glob
+import json
+import time
+import sys
+import os
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+
+# Add parent directory to path to import modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from processing import feature_extractor
+from inference import predictor_core, signatures
+from inference.online_detector import OnlineDetector
+from inference.event_recorder import EventRecorder
+from utils import config, precision
+from utils.event_store import EventWriter
+from utils.logger import get_logger
+
+logger = get_logger("fleet.service")
+
+def analyze_batch(waveforms, fundamental_freq, sampling_rate, volts_per_count=config.ADC_VOLTS_PER_COUNT,
+                  synchronous=False):
+    """
+    Worker: feature_extractor -> diagnose for a (n, n_samples) block.
+    volts_per_count: scale of raw int16 ADC blocks (ignored for volts)
+    synchronous: take the features from synchronous_features (RMS and THD
+                 over whole cycles of the tracked fundamental) instead of
+                 the fixed-grid FFT, so short windows such as 10 cycles
+                 (200 ms) are diagnosed accurately at any line frequency
+    Returns: dict of per-row 'rms', 'peak', 'thd', status 'codes' and the
+             detector 'features' matrix
+    """
+    if synchronous:
+        features = feature_extractor.synchronous_features(waveforms, sampling_rate=sampling_rate, cycles=None,
+                                                          volts_per_count=volts_per_count,
+                                                          fundamental_freq=fundamental_freq, wavelet_features=True)
+    else:
+        features = feature_extractor.extract_features_batch(waveforms, fundamental_freq, sampling_rate,
+                                                            volts_per_count, wavelet_features=True)
+    matrix = feature_extractor.detector_matrix(features)
+    codes = predictor_core.diagnose_batch(matrix)
+    return {"rms": features["rms"], "peak": features["peak"], "thd": features["thd"], "codes": codes,
+            "features": matrix}
+
+class FleetService:
+    """
+    Collects windows from many meters into fixed-size batches and shards the
+    batches over a process pool. At most `max_pending` batches are in flight;
+    past that, submit() blocks until a worker finishes (backpressure).
+
+    Batches complete in the order they were submitted, even when a later one
+    finishes first. Results land in `latest` (meter_id -> (timestamp, status
+    code, rms, thd); a window never replaces a newer one) and, if given, are
+    passed to on_result(meter_ids, timestamps, result).
+    n_workers=0 analyses batches synchronously in the calling process.
+
+    online: optional OnlineDetector. Per-meter baselines live here, in the
+    coordinating process: each completed batch is scored against (and then
+    learned into) them, and windows far from their own meter's envelope get
+    STATUS_ANOMALY on top of the workers' diagnosis.
+
+    recorder: optional EventRecorder. Completed batches (with their
+    waveforms, which are then kept until the batch returns) are fed to it,
+    so fault onsets are persisted with their surrounding segment.
+
+    synchronous: analyse windows as analyze_batch(synchronous=True), for
+    meters that send short (e.g. 10-cycle) windows.
+    """
+    def __init__(self, n_workers=None, batch_size=config.FLEET_BATCH_SIZE, max_pending=config.FLEET_MAX_PENDING,
+                 fundamental_freq=config.FREQUENCY, sampling_rate=config.SAMPLING_RATE, on_result=None, online=None,
+                 recorder=None, synchronous=False):
+        self.n_workers = os.cpu_count() if n_workers is None else n_workers
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.fundamental_freq = fundamental_freq
+        self.sampling_rate = sampling_rate
+        self.on_result = on_result
+        self.online = online
+        self.recorder = recorder
+        self.synchronous = synchronous
+        self.latest = {}
+
+        if self.n_workers > 0:
+            self._pool = ProcessPoolExecutor(max_workers=self.n_workers, initializer=predictor_core.preload)
+        else:
+            self._pool = None
+            predictor_core.preload()
+        self._pending = {}
+        self._buffer_ids, self._buffer_waves, self._buffer_ts, self._buffer_enqueued = [], [], [], []
+        self._latencies = deque(maxlen=config.FLEET_LATENCY_WINDOW)
+        self._started = time.perf_counter()
+        self.windows_done = 0
+        self.batches_done = 0
+        self.backpressure_waits = 0
+
+    def submit(self, meter_id, waveform, timestamp=None):
+        """Queues one window; dispatches a batch once batch_size windows are buffered."""
+        if self._buffer_waves and len(waveform) != len(self._buffer_waves[0]):
+            self.flush() # a batch holds windows of one length
+        self._buffer_ids.append(meter_id)
+        self._buffer_waves.append(waveform)
+        self._buffer_ts.append(time.time() if timestamp is None else timestamp)
+        self._buffer_enqueued.append(time.perf_counter())
+        if len(self._buffer_ids) >= self.batch_size:
+            self.flush()
+
+    def submit_many(self, meter_ids, waveforms, timestamps=None):
+        """Queues a (n, n_samples) block of windows."""
+        timestamps = np.full(len(meter_ids), time.time()) if timestamps is None else timestamps
+        for meter_id, waveform, ts in zip(meter_ids, waveforms, timestamps):
+            self.submit(meter_id, waveform, ts)
+
+    def flush(self):
+        """Dispatches whatever is buffered as one batch."""
+        if not self._buffer_ids:
+            return
+        waveforms = np.stack(self._buffer_waves)
+        meta = (self._buffer_ids, np.array(self._buffer_ts), np.array(self._buffer_enqueued),
+                waveforms if self.recorder is not None else None)
+        self._buffer_ids, self._buffer_waves, self._buffer_ts, self._buffer_enqueued = [], [], [], []
+
+        if self._pool is None:
+            self._complete(meta, analyze_batch(waveforms, self.fundamental_freq, self.sampling_rate,
+                                               synchronous=self.synchronous))
+            return
+
+        while len(self._pending) >= self.max_pending:
+            self.backpressure_waits += 1
+            self._collect(block=True)
+        future = self._pool.submit(analyze_batch, waveforms, self.fundamental_freq, self.sampling_rate,
+                                   synchronous=self.synchronous)
+        self._pending[future] = meta
+        self._collect(block=False)
+
+    def drain(self):
+        """Flushes the buffer and waits for every in-flight batch."""
+        self.flush()
+        while self._pending:
+            self._collect(block=True)
+
+    def close(self):
+        self.drain()
+        if self._pool is not None:
+            self._pool.shutdown()
+        if self.recorder is not None:
+            self.recorder.flush()
+
+    def stats(self):
+        """Fleet throughput and window latency (enqueue -> result) percentiles."""
+        elapsed = time.perf_counter() - self._started
+        latencies = np.concatenate(self._latencies) if self._latencies else np.zeros(1)
+        return {
+            "windows": self.windows_done,
+            "batches": self.batches_done,
+            "meters": len(self.latest),
+            "windows_per_sec": self.windows_done / elapsed if elapsed > 0 else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50) * 1000),
+            "latency_p99_ms": float(np.percentile(latencies, 99) * 1000),
+            "in_flight_batches": len(self._pending),
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+    def _collect(self, block):
+        """
+        Completes finished batches in submit order (_pending keeps insertion
+        order), so results and recorded events never go back in time.
+        block: wait for the oldest batch if it is still running
+        """
+        while self._pending:
+            future = next(iter(self._pending))
+            if not future.done():
+                if not block:
+                    return
+                wait([future])
+            self._complete(self._pending.pop(future), future.result())
+            block = False
+
+    def _complete(self, meta, result):
+        meter_ids, timestamps, enqueued, waveforms = meta
+        self._latencies.append(time.perf_counter() - enqueued)
+        self.windows_done += len(meter_ids)
+        self.batches_done += 1
+        if self.online is not None:
+            outliers = self.online.observe(meter_ids, result["features"]) == -1
+            result["codes"] = result["codes"] | outliers.astype(np.uint8) * signatures.STATUS_ANOMALY
+        if self.recorder is not None:
+            if precision.is_adc(waveforms):
+                waveforms = precision.adc_to_volts(waveforms)
+            self.recorder.process_batch(meter_ids, timestamps, waveforms, result["codes"], result["features"])
+        for i, meter_id in enumerate(meter_ids):
+            previous = self.latest.get(meter_id)
+            if previous is None or timestamps[i] >= previous[0]:
+                self.latest[meter_id] = (timestamps[i], int(result["codes"][i]), result["rms"][i], result["thd"][i])
+        if self.on_result is not None:
+            self.on_result(meter_ids, timestamps, result)
+
+# Errors that mark a spool file as unreadable rather than the service as broken
+SPOOL_ERRORS = (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile)
+
+def read_spool_file(path):
+    """
+    A spool file is an .npz with 'meter_ids' (n,), 'waveforms' (n, n_samples) and optional 'timestamps'.
+    Raises one of SPOOL_ERRORS if the file is unreadable or its arrays do not line up.
+    """
+    with np.load(path) as data:
+        meter_ids, waveforms = data["meter_ids"], data["waveforms"]
+        timestamps = data["timestamps"] if "timestamps" in data.files else None
+    if waveforms.ndim != 2 or len(meter_ids) != len(waveforms):
+        raise ValueError("expected 'meter_ids' (n,) and 'waveforms' (n, n_samples)")
+    if timestamps is not None and len(timestamps) != len(meter_ids):
+        raise ValueError("'timestamps' must have one entry per window")
+    return meter_ids, waveforms, timestamps
+
+def run_spool(spool_dir, service, poll_interval=0.5, once=False, report_every=10.0):
+    """
+    Feeds every *.npz dropped into spool_dir through the service, oldest
+    first, then removes it. Diagnoses are appended to spool_dir/results.jsonl.
+    A file that cannot be read is renamed to <name>.bad and skipped.
+    """
+    results_path = os.path.join(spool_dir, "results.jsonl")
+    last_report = time.perf_counter()
+
+    def write_results(meter_ids, timestamps, result):
+        with open(results_path, "a") as f:
+            for i, meter_id in enumerate(meter_ids):
+                f.write(json.dumps({
+                    "meter_id": str(meter_id),
+                    "timestamp": float(timestamps[i]),
+                    "status": int(result["codes"][i]),
+                    "diagnosis": signatures.status_message(result["codes"][i]),
+                    "rms": float(result["rms"][i]),
+                    "thd": float(result["thd"][i]),
+                }) + "\n")
+    service.on_result = write_results
+
+    while True:
+        paths = sorted(glob.glob(os.path.join(spool_dir, "*.npz")), key=os.path.getmtime)
+        for path in paths:
+            try:
+                meter_ids, waveforms, timestamps = read_spool_file(path)
+            except SPOOL_ERRORS as exc:
+                logger.warning("skipping unreadable spool file %s: %s", path, exc)
+                os.replace(path, path + ".bad")
+                continue
+            service.submit_many(meter_ids, waveforms, timestamps)
+            os.remove(path)
+        if not paths:
+            service.drain()
+            if once:
+                return service.stats()
+            time.sleep(poll_interval)
+        if time.perf_counter() - last_report > report_every:
+            print(json.dumps(service.stats()))
+            last_report = time.perf_counter()
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse windows dropped into a spool directory")
+    parser.add_argument("--spool", required=True, help="directory receiving *.npz window files")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=config.FLEET_BATCH_SIZE)
+    parser.add_argument("--once", action="store_true", help="exit once the spool is empty")
+    parser.add_argument("--synchronous", action="store_true",
+                        help="whole-cycle RMS/THD at the tracked frequency, for short (e.g. 10-cycle) windows")
+    parser.add_argument("--events", default=None, metavar="PATH",
+                        help="record fault events to this event store (e.g. %s)" % config.EVENT_STORE_PATH)
+    parser.add_argument("--online-state", default=None,
+                        help="per-meter baseline snapshot (.npz); enables online anomaly scoring")
+    args = parser.parse_args()
+
+    online = None
+    if args.online_state:
+        if os.path.exists(args.online_state):
+            online = OnlineDetector.load(args.online_state, snapshot_path=args.online_state)
+        else:
+            online = OnlineDetector(len(feature_extractor.DETECTOR_FEATURES), snapshot_path=args.online_state)
+
+    writer = recorder = None
+    if args.events:
+        writer = EventWriter(args.events, len(feature_extractor.DETECTOR_FEATURES))
+        recorder = EventRecorder(writer)
+
+    os.makedirs(args.spool, exist_ok=True)
+    service = FleetService(n_workers=args.workers, batch_size=args.batch_size, online=online, recorder=recorder,
+                           synchronous=args.synchronous)
+    try:
+        stats = run_spool(args.spool, service, once=args.once)
+        print(json.dumps(stats))
+    finally:
+        service.close()
+        if online is not None:
+            online.snapshot()
+        if writer is not None:
+            writer.close()
+
+if __name__ == "__main__":
+    main()
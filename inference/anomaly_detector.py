@@ -3,23 +3,61 @@ Module: anomaly_detector.py
 Description: Unsupervised Anomaly Detection using Isolation Forest
 """
 import numpy as np
-from sklearn.ensemble import IsolationForest
 import pickle
+import glob
 import os
 
+from utils import config
+from utils.logger import instrument
+from inference import model_loader, flat_forest
+
 MODEL_PATH = "data/models/isolation_forest.pkl"
 
+# Width of the default model: [rms, thd]
+BASE_FEATURES = 2
+
 class AnomalyDetector:
-    def __init__(self):
-        self.model = IsolationForest(contamination=0.1, random_state=42)
+    """
+    One Isolation Forest per feature width. model_path holds the [rms, thd]
+    model; a model trained on wider rows (e.g. the full
+    feature_extractor.DETECTOR_FEATURES vector) is saved beside it as
+    <name>_<width>f.pkl, so training one width never replaces the model that
+    callers of another width score with.
+    """
+    def __init__(self, model_path=MODEL_PATH):
+        self.model_path = model_path
+        # Array-backed export of the same forest, scored without sklearn
+        self.flat_model_path = os.path.splitext(model_path)[0] + ".npz"
+        self._model = None
+        # Loaded flat export: a scorer only, kept apart from the refittable model
+        self.flat_model = None
+        self.n_features = None # width of this instance's fitted model
         self.is_trained = False
+
+    @property
+    def model(self):
+        """
+        The fitted (or loaded) model. An unfitted IsolationForest is built on
+        first access, so scoring a saved model never imports sklearn.
+        """
+        if self._model is None:
+            from sklearn.ensemble import IsolationForest
+            self._model = IsolationForest(contamination=0.1, random_state=42)
+        return self._model
+
+    @model.setter
+    def model(self, model):
+        self._model = model
         
     def train(self, X):
         """
         Train the model on normal data.
-        X: Feature matrix (n_samples, n_features)
+        X: Feature matrix (n_samples, n_features); the model is saved under
+           model_path_for(n_features)
         """
+        X = np.asarray(X, dtype=float)
         self.model.fit(X)
+        self.n_features = X.shape[1]
         self.is_trained = True
         self.save_model()
         
@@ -29,23 +67,102 @@ class AnomalyDetector:
         features: [rms, thd, peak, etc.]
         Returns: -1 for anomaly, 1 for normal
         """
-        if not self.is_trained:
-            self.load_model()
-            
-        if not self.is_trained:
-            return 1 # Default to normal if no model
-            
         # Reshape for single prediction
         X = np.array(features).reshape(1, -1)
-        return self.model.predict(X)[0]
+        return self.predict_batch(X)[0]
+
+    @instrument("inference.predict_batch")
+    def predict_batch(self, X):
+        """
+        Predict many samples with one pass over the forest.
+        X: Feature matrix (n_samples, n_features), scored by the model of
+           the same width; without one, the [rms, thd] model scores the
+           leading columns
+        Returns: (n_samples,) array, -1 for anomaly, 1 for normal
+        Raises ValueError if the model needs more columns than X has.
+        """
+        X = np.asarray(X, dtype=float)
+        width = X.shape[1]
+        model = self.active_model(width)
+        if model is None and width > BASE_FEATURES:
+            model = self.active_model(BASE_FEATURES)
+        if model is None:
+            return np.ones(len(X), dtype=int) # Default to normal if no model
+
+        expected = getattr(model, "n_features_in_", width)
+        if expected > width:
+            raise ValueError(f"anomaly model expects {expected} features but rows have {width}; "
+                             "pass full feature_extractor.DETECTOR_FEATURES rows")
+        return model.predict(X[:, :expected])
+
+    def active_model(self, n_features=BASE_FEATURES):
+        """
+        The model that scores n_features-wide rows: the registry's copy of
+        its file (the flat export when config.INFERENCE_MODEL_FORMAT is
+        "flat"; both follow retrains on disk), else this instance's own
+        fitted model if it has that width.
+        """
+        model = model_loader.registry.get(self.serving_path_for(n_features))
+        if model is None and self.is_trained and self.n_features == n_features:
+            if config.INFERENCE_MODEL_FORMAT == "flat" and self.flat_model is not None:
+                return self.flat_model
+            return self.model
+        return model
+
+    def model_path_for(self, n_features):
+        """Pickle path of the n_features-wide model (model_path for [rms, thd])."""
+        if n_features == BASE_FEATURES:
+            return self.model_path
+        root, ext = os.path.splitext(self.model_path)
+        return f"{root}_{n_features}f{ext}"
+
+    def serving_path_for(self, n_features):
+        path = self.model_path_for(n_features)
+        if config.INFERENCE_MODEL_FORMAT == "flat":
+            return os.path.splitext(path)[0] + ".npz"
+        return path
+
+    @property
+    def serving_path(self):
+        return self.serving_path_for(BASE_FEATURES)
+
+    def preload(self):
+        """
+        Loads every saved width of this detector's model into the registry.
+        Call it at startup (see predictor_core.preload): until then lookups
+        only schedule a background load and score every row as normal.
+        """
+        root, ext = os.path.splitext(self.serving_path)
+        for path in [self.serving_path] + sorted(glob.glob(f"{root}_*f{ext}")):
+            model_loader.registry.preload(path)
     
     def save_model(self):
-        os.makedirs(os.path.dirname(MODEL_PATH), exist_ok=True)
-        with open(MODEL_PATH, 'wb') as f:
+        model_path = self.model_path_for(self.n_features or BASE_FEATURES)
+        flat_model_path = os.path.splitext(model_path)[0] + ".npz"
+        os.makedirs(os.path.dirname(model_path), exist_ok=True)
+        # Write then rename so readers never see a half-written file
+        tmp_path = model_path + ".tmp"
+        with open(tmp_path, 'wb') as f:
             pickle.dump(self.model, f)
+        os.replace(tmp_path, model_path)
+        model_loader.registry.publish(model_path, self.model)
+
+        tmp_path = flat_model_path + ".tmp.npz"
+        flat_forest.export_forest(self.model, tmp_path)
+        os.replace(tmp_path, flat_model_path)
+        self.flat_model = flat_forest.FlatForest.load(flat_model_path)
+        model_loader.registry.publish(flat_model_path, self.flat_model)
             
-    def load_model(self):
-        if os.path.exists(MODEL_PATH):
-            with open(MODEL_PATH, 'rb') as f:
-                self.model = pickle.load(f)
-            self.is_trained = True
+    def load_model(self, n_features=BASE_FEATURES):
+        """Loads the saved n_features-wide model into this instance."""
+        path = self.serving_path_for(n_features)
+        model_loader.registry.refresh(path)
+        model = model_loader.registry.preload(path)
+        if model is None:
+            return
+        if isinstance(model, flat_forest.FlatForest):
+            self.flat_model = model
+        else:
+            self.model = model
+        self.n_features = n_features
+        self.is_trained = True
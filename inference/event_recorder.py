@@ -0,0 +1,120 @@
+"""
+Module: event_recorder.py
+Description: Event-triggered capture: pre-trigger ring buffers per meter, persisting only faulted segments
+"""
+
+import numpy as np
+
+from utils import config
+from inference import signatures
+
+# Status flags that open an event
+TRIGGER_FLAGS = (signatures.STATUS_SAG | signatures.STATUS_SWELL | signatures.STATUS_HARMONIC |
+                 signatures.STATUS_ANOMALY | signatures.STATUS_UNBALANCE)
+
+class EventRecorder:
+    """
+    Watches the diagnosed windows of many meters and writes an event to an
+    EventWriter whenever a meter's status gains trigger flags (the onset of a
+    sag, swell, harmonic fault or AI anomaly). A fault that persists over
+    several windows is one event, not one per window.
+
+    Each meter keeps a ring of its last pre_trigger seconds of signal, so an
+    event's segment is [pre-trigger | triggering window | post-trigger],
+    where the post-trigger samples come from the meter's next windows. A gap
+    in a meter's timestamps clears its ring. Nothing else is stored.
+    """
+    def __init__(self, writer, sampling_rate=config.SAMPLING_RATE, pre_trigger=config.EVENT_PRE_TRIGGER,
+                 post_trigger=config.EVENT_POST_TRIGGER):
+        self.writer = writer
+        self.sampling_rate = sampling_rate
+        self.pre_samples = int(round(pre_trigger * sampling_rate))
+        self.post_samples = int(round(post_trigger * sampling_rate))
+        self.events_written = 0
+
+        self._rings = {}     # meter -> (pre_samples,) float32 ring, oldest sample first
+        self._filled = {}    # meter -> valid samples in the ring
+        self._next_time = {} # meter -> expected timestamp of the next window
+        self._status = {}    # meter -> status of the previous window
+        self._pending = {}   # meter -> event waiting for post-trigger samples
+
+    def process(self, meter_id, timestamp, window, status, features):
+        """Feeds one diagnosed window; returns True if it opened an event."""
+        window = np.asarray(window, dtype=np.float32)
+        expected = self._next_time.get(meter_id)
+        if expected is not None and abs(timestamp - expected) > 0.5 / self.sampling_rate:
+            self._finish(meter_id)
+            self._filled[meter_id] = 0
+        self._next_time[meter_id] = timestamp + len(window) / self.sampling_rate
+
+        self._collect_post(meter_id, window)
+
+        status = int(status)
+        onset = status & TRIGGER_FLAGS & ~self._status.get(meter_id, 0)
+        self._status[meter_id] = status
+        if onset and meter_id not in self._pending:
+            pre = self._pre_trigger(meter_id)
+            self._pending[meter_id] = {
+                "time": timestamp, "status": status, "features": np.asarray(features, dtype=np.float32),
+                "chunks": [pre, window], "trigger": len(pre), "remaining": self.post_samples,
+            }
+            if self.post_samples == 0:
+                self._finish(meter_id)
+        self._push(meter_id, window)
+        return bool(onset)
+
+    def process_batch(self, meter_ids, timestamps, windows, codes, features):
+        """
+        process() for every row of a batch (e.g. a fleet or replay batch).
+        features: (n, n_features) detector rows
+        Returns: number of events opened
+        """
+        opened = 0
+        for i, meter_id in enumerate(meter_ids):
+            opened += self.process(meter_id, float(timestamps[i]), windows[i], codes[i], features[i])
+        return opened
+
+    def _pre_trigger(self, meter_id):
+        ring = self._rings.get(meter_id)
+        filled = self._filled.get(meter_id, 0)
+        if ring is None or filled == 0:
+            return np.empty(0, dtype=np.float32)
+        return ring[len(ring) - filled:].copy()
+
+    def _push(self, meter_id, window):
+        if self.pre_samples == 0:
+            return
+        ring = self._rings.get(meter_id)
+        if ring is None:
+            ring = self._rings[meter_id] = np.zeros(self.pre_samples, dtype=np.float32)
+        n = min(len(window), self.pre_samples)
+        if n == 0:
+            return
+        if n < self.pre_samples:
+            ring[:-n] = ring[n:]
+        ring[-n:] = window[-n:]
+        self._filled[meter_id] = min(self.pre_samples, self._filled.get(meter_id, 0) + n)
+
+    def _collect_post(self, meter_id, window):
+        event = self._pending.get(meter_id)
+        if event is None:
+            return
+        take = window[:event["remaining"]]
+        event["chunks"].append(take)
+        event["remaining"] -= len(take)
+        if event["remaining"] == 0:
+            self._finish(meter_id)
+
+    def _finish(self, meter_id):
+        event = self._pending.pop(meter_id, None)
+        if event is None:
+            return
+        self.writer.append(meter_id, event["time"], np.concatenate(event["chunks"]), event["status"],
+                           event["features"], trigger=event["trigger"])
+        self.events_written += 1
+
+    def flush(self):
+        """Writes events still waiting for post-trigger samples with what they have."""
+        for meter_id in list(self._pending):
+            self._finish(meter_id)
+        self.writer.flush()
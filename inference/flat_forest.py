@@ -0,0 +1,128 @@
+"""
+Module: flat_forest.py
+Description: Array-backed Isolation Forest export and pure-NumPy scorer
+"""
+import numpy as np
+
+FORMAT_VERSION = 1
+
+# Rows scored per traversal block; bounds the (n_trees, rows) index arrays
+BLOCK_SIZE = 1024
+
+def average_path_length(n):
+    """c(n): average path length of an unsuccessful BST search over n samples."""
+    n = np.asarray(n, dtype=float)
+    c = np.zeros_like(n)
+    c[n == 2] = 1.0
+    big = n > 2
+    c[big] = 2.0 * (np.log(n[big] - 1.0) + np.euler_gamma) - 2.0 * (n[big] - 1.0) / n[big]
+    return c
+
+def export_forest(model, path):
+    """
+    Flattens a fitted sklearn IsolationForest into one .npz file.
+    All trees share global node arrays; leaves point at themselves so a
+    fixed number of traversal steps always ends on a leaf.
+    """
+    features, thresholds, lefts, rights, leaf_values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for tree_est, tree_features in zip(model.estimators_, model.estimators_features_):
+        tree = tree_est.tree_
+        n_nodes = tree.node_count
+        left = tree.children_left.astype(np.int64)
+        right = tree.children_right.astype(np.int64)
+        is_leaf = left == -1
+
+        # Node depths, parents always precede children in sklearn's layout
+        depth = np.zeros(n_nodes)
+        for node in range(n_nodes):
+            if not is_leaf[node]:
+                depth[left[node]] = depth[node] + 1
+                depth[right[node]] = depth[node] + 1
+        max_depth = max(max_depth, int(depth.max()))
+
+        own = np.arange(n_nodes)
+        lefts.append(np.where(is_leaf, own, left) + offset)
+        rights.append(np.where(is_leaf, own, right) + offset)
+        features.append(np.where(is_leaf, 0, np.asarray(tree_features)[np.maximum(tree.feature, 0)]))
+        thresholds.append(np.where(is_leaf, 0.0, tree.threshold))
+        leaf_values.append(np.where(is_leaf, depth + average_path_length(tree.n_node_samples), 0.0))
+        roots.append(offset)
+        offset += n_nodes
+
+    np.savez(
+        path,
+        format_version=FORMAT_VERSION,
+        feature=np.concatenate(features).astype(np.int32),
+        threshold=np.concatenate(thresholds),
+        left=np.concatenate(lefts).astype(np.int32),
+        right=np.concatenate(rights).astype(np.int32),
+        leaf_value=np.concatenate(leaf_values),
+        roots=np.array(roots, dtype=np.int32),
+        max_depth=max_depth,
+        denominator=len(model.estimators_) * average_path_length([model.max_samples_])[0],
+        offset=model.offset_,
+        n_features=model.n_features_in_,
+    )
+
+class FlatForest:
+    """
+    Vectorized Isolation Forest scorer over flat node arrays. Mirrors
+    IsolationForest.score_samples / decision_function / predict without
+    importing sklearn.
+    """
+    def __init__(self, arrays):
+        if int(arrays["format_version"]) != FORMAT_VERSION:
+            raise ValueError(f"Unsupported flat forest format {int(arrays['format_version'])}")
+        self.feature = arrays["feature"].astype(np.intp)
+        self.threshold = arrays["threshold"]
+        # Interleaved (left, right) pairs: child = children[2 * node + goes_right]
+        self.children = np.stack([arrays["left"], arrays["right"]], axis=1).astype(np.intp).ravel()
+        self.leaf_value = arrays["leaf_value"]
+        self.roots = arrays["roots"].astype(np.intp)
+        self.max_depth = int(arrays["max_depth"])
+        self.denominator = float(arrays["denominator"])
+        self.offset_ = float(arrays["offset"])
+        self.n_features_in_ = int(arrays["n_features"])
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as arrays:
+            return cls({key: arrays[key] for key in arrays.files})
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.children, self.leaf_value, self.roots))
+
+    def score_samples(self, X):
+        """Opposite of the anomaly score; lower is more abnormal."""
+        # sklearn evaluates splits on float32 inputs
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim != 2 or X.shape[1] != self.n_features_in_:
+            raise ValueError(f"X must have shape (n_samples, {self.n_features_in_})")
+
+        n_features = X.shape[1]
+        depths = np.empty(len(X))
+        for start in range(0, len(X), BLOCK_SIZE):
+            block = X[start:start + BLOCK_SIZE]
+            flat = block.ravel()
+            row_base = (np.arange(len(block)) * n_features)[np.newaxis, :]
+            # (n_trees, rows) node index per tree and sample, stepped down in lockstep
+            nodes = np.repeat(self.roots[:, np.newaxis], len(block), axis=1)
+            for _ in range(self.max_depth):
+                values = flat.take(row_base + self.feature.take(nodes))
+                goes_right = values > self.threshold.take(nodes)
+                nodes = self.children.take(2 * nodes + goes_right)
+            depths[start:start + len(block)] = self.leaf_value.take(nodes).sum(axis=0)
+
+        if self.denominator == 0:
+            return -np.ones(len(X))
+        return -(2.0 ** (-depths / self.denominator))
+
+    def decision_function(self, X):
+        return self.score_samples(X) - self.offset_
+
+    def predict(self, X):
+        """Returns: -1 for anomaly, 1 for normal"""
+        return np.where(self.decision_function(X) < 0, -1, 1)
@@ -1,5 +1,159 @@
 """
 Module: model_loader.py
-Description: Implementation for model_loader
+Description: Process-wide registry of loaded anomaly models with hot reload
 """
 
+import pickle
+import threading
+import time
+import os
+from collections import namedtuple
+
+from utils import config
+from inference import flat_forest
+
+# Immutable snapshot of one model file; swapping the dict value is atomic
+ModelEntry = namedtuple("ModelEntry", ["model", "version", "mtime", "model_bytes", "load_time_s", "loaded_at"])
+
+_EMPTY = ModelEntry(None, 0, None, 0, 0.0, None)
+
+class ModelRegistry:
+    """
+    Holds one deserialized model per file for the whole process, so every
+    AnomalyDetector reading the same path shares the same fitted forest.
+    Load the model before forking worker processes and the children share
+    its pages copy-on-write.
+
+    Lookups never wait on I/O. preload() reads a model at startup; a path
+    first seen by get() returns None while the daemon watcher thread loads
+    it in the background. The watcher also polls every file's mtime/size
+    and swaps in a retrained model. With watch_interval <= 0 there is no
+    watcher, so only preload() and refresh() read the disk.
+    """
+    def __init__(self, watch_interval=config.MODEL_WATCH_INTERVAL):
+        self.watch_interval = watch_interval
+        self._entries = {}
+        self._lock = threading.Lock()
+        self._watcher = None
+        self._watcher_pid = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def get(self, path):
+        """
+        Returns the current model for `path`, or None if none is loaded
+        yet. Never reads the disk: an unknown path is queued for the watcher.
+        """
+        key = os.path.abspath(path)
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._lock:
+                self._entries.setdefault(key, _EMPTY)
+            self._ensure_watcher()
+            self._wake.set()
+            return None
+        return entry.model
+
+    def preload(self, path):
+        """Loads `path` now unless a model is already loaded, and returns it (None if there is none)."""
+        key = os.path.abspath(path)
+        entry = self._entries.get(key, _EMPTY)
+        if entry.model is None:
+            # Read without the lock; a model installed meanwhile wins
+            loaded = self._load(key, entry)
+            with self._lock:
+                entry = self._entries.get(key, _EMPTY)
+                if entry.model is None:
+                    entry = self._entries[key] = loaded
+        self._ensure_watcher()
+        return entry.model
+
+    def publish(self, path, model):
+        """Installs a model that was just saved to `path` by this process."""
+        key = os.path.abspath(path)
+        stat = _stat(key)
+        previous = self._entries.get(key, _EMPTY)
+        self._entries[key] = ModelEntry(model, previous.version + 1, stat and stat.st_mtime_ns,
+                                        stat.st_size if stat else 0, 0.0, time.time())
+        self._ensure_watcher()
+
+    def invalidate(self, path):
+        """Forgets `path`; the next lookup reads the disk again."""
+        self._entries.pop(os.path.abspath(path), None)
+
+    def refresh(self, path=None):
+        """
+        Reloads models whose file changed on disk. The last good model is
+        kept if a file disappears or fails to load.
+        """
+        keys = [os.path.abspath(path)] if path else list(self._entries)
+        for key in keys:
+            entry = self._entries.get(key, _EMPTY)
+            stat = _stat(key)
+            if stat is None or (stat.st_mtime_ns == entry.mtime and stat.st_size == entry.model_bytes):
+                continue
+            self._entries[key] = self._load(key, entry)
+
+    def stats(self, path):
+        """Load metrics for `path`: version, load time, file size and mtime."""
+        entry = self._entries.get(os.path.abspath(path), _EMPTY)
+        return {
+            "loaded": entry.model is not None,
+            "version": entry.version,
+            "load_time_s": entry.load_time_s,
+            "model_bytes": entry.model_bytes,
+            "mtime_ns": entry.mtime,
+            "loaded_at": entry.loaded_at,
+        }
+
+    def stop_watcher(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _load(self, key, previous):
+        stat = _stat(key)
+        if stat is None:
+            return previous
+        start = time.perf_counter()
+        try:
+            model = _read_model(key)
+        except (OSError, EOFError, ValueError, pickle.UnpicklingError):
+            # Half-written file; try again on the next poll
+            return previous
+        load_time = time.perf_counter() - start
+        return ModelEntry(model, previous.version + 1, stat.st_mtime_ns, stat.st_size, load_time, time.time())
+
+    def _ensure_watcher(self):
+        # Threads do not survive fork, so a child process starts its own
+        if self.watch_interval <= 0 or (self._watcher_pid == os.getpid() and self._watcher.is_alive()):
+            return
+        with self._lock:
+            if self._watcher_pid == os.getpid() and self._watcher.is_alive():
+                return
+            self._stop.clear()
+            self._watcher = threading.Thread(target=self._watch, name="model-registry-watcher", daemon=True)
+            self._watcher_pid = os.getpid()
+            self._watcher.start()
+
+    def _watch(self):
+        # get() wakes the thread early so a newly seen path loads right away
+        while not self._stop.is_set():
+            self.refresh()
+            self._wake.wait(self.watch_interval)
+            self._wake.clear()
+
+def _read_model(path):
+    """Flat .npz exports load as FlatForest, anything else is a pickle."""
+    if path.endswith(".npz"):
+        return flat_forest.FlatForest.load(path)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+def _stat(path):
+    try:
+        return os.stat(path)
+    except OSError:
+        return None
+
+# Process-wide instance
+registry = ModelRegistry()
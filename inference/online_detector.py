@@ -0,0 +1,237 @@
+"""
+Module: online_detector.py
+Description: Per-meter online baselines (streaming mean/covariance) with Mahalanobis anomaly scoring
+"""
+
+import numpy as np
+import threading
+import time
+import os
+
+from utils import config
+from utils.logger import instrument
+
+class OnlineDetector:
+    """
+    Learns each meter's normal operating envelope incrementally, keyed by
+    meter ID, instead of one global offline model.
+
+    Every meter owns one row of three preallocated arrays: the window count,
+    the running feature mean and the running sum of squared deviations (M2,
+    the unnormalised covariance). A batch of windows is merged per meter with
+    the parallel Welford/Chan update, O(n_features^2) per window, and no
+    refit is ever needed. A window is scored by its Mahalanobis distance
+    from its own meter's baseline. With 7 features a meter costs ~460 bytes,
+    so thousands of meters fit in a few MB; the arrays double when full.
+
+    The effective count is capped at max_count (M2 is rescaled with it), so
+    old windows are gradually forgotten and the baseline follows slow drift.
+    """
+    def __init__(self, n_features, min_samples=config.ONLINE_MIN_SAMPLES, threshold=config.ONLINE_THRESHOLD,
+                 max_count=config.ONLINE_MAX_COUNT, regularization=config.ONLINE_REGULARIZATION,
+                 capacity=config.ONLINE_INITIAL_METERS, snapshot_path=None,
+                 snapshot_interval=config.ONLINE_SNAPSHOT_INTERVAL):
+        self.n_features = n_features
+        self.min_samples = min_samples
+        self.threshold = threshold
+        self.max_count = max_count
+        self.regularization = regularization
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+
+        self._slots = {}
+        self._ids = []
+        self.count = np.zeros(capacity)
+        self.mean = np.zeros((capacity, n_features))
+        self.m2 = np.zeros((capacity, n_features, n_features))
+        self._lock = threading.Lock()
+        self._last_snapshot = time.monotonic()
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def meter_ids(self):
+        return list(self._ids)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the per-meter state arrays (allocated capacity)."""
+        return self.count.nbytes + self.mean.nbytes + self.m2.nbytes
+
+    def _rows(self, X):
+        X = np.asarray(X, dtype=float)
+        if X.ndim == 1:
+            X = X[np.newaxis, :]
+        if X.ndim != 2 or X.shape[1] < self.n_features:
+            raise ValueError(f"X must be a (n, >= {self.n_features}) feature matrix")
+        # Wider rows (e.g. the full detector vector) use their leading columns
+        return X[:, :self.n_features]
+
+    def _lookup(self, meter_ids, create):
+        """Slot of every meter ID; unknown meters get a new slot, or -1 when create=False."""
+        slots = np.empty(len(meter_ids), dtype=np.intp)
+        for i, meter_id in enumerate(meter_ids):
+            slot = self._slots.get(meter_id)
+            if slot is None:
+                if not create:
+                    slot = -1
+                else:
+                    slot = self._slots[meter_id] = len(self._ids)
+                    self._ids.append(meter_id)
+            slots[i] = slot
+        if len(self._ids) > len(self.count):
+            self._grow(len(self._ids))
+        return slots
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self.count))
+        for name in ("count", "mean", "m2"):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:])
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    @instrument("inference.online_update")
+    def update(self, meter_ids, X):
+        """
+        Merges a batch of windows into their meters' baselines.
+        meter_ids: (n,) meter ID per row (IDs may repeat within a batch)
+        X: (n, n_features) feature rows
+        """
+        X = self._rows(X)
+        if len(X) != len(meter_ids):
+            raise ValueError("meter_ids and X must have the same length")
+        if len(X) == 0:
+            return
+        with self._lock:
+            slots = self._lookup(meter_ids, create=True)
+
+            # Per-meter batch statistics: sort rows by slot, reduce each run
+            order = np.argsort(slots, kind="stable")
+            sorted_slots = slots[order]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            uniq = sorted_slots[starts]
+            n_b = np.diff(np.r_[starts, len(order)]).astype(float)
+            rows = X[order]
+            mean_b = np.add.reduceat(rows, starts, axis=0) / n_b[:, np.newaxis]
+            dev = rows - np.repeat(mean_b, n_b.astype(int), axis=0)
+            m2_b = np.add.reduceat(np.einsum('ni,nj->nij', dev, dev), starts, axis=0)
+
+            # Chan et al. merge with the stored (count, mean, M2)
+            n_a = self.count[uniq]
+            n = n_a + n_b
+            delta = mean_b - self.mean[uniq]
+            self.mean[uniq] += delta * (n_b / n)[:, np.newaxis]
+            self.m2[uniq] += m2_b + np.einsum('ki,kj->kij', delta, delta) * (n_a * n_b / n)[:, np.newaxis, np.newaxis]
+
+            # Forget old windows once a meter reaches max_count
+            over = n > self.max_count
+            if over.any():
+                self.m2[uniq[over]] *= (self.max_count / n[over])[:, np.newaxis, np.newaxis]
+                n[over] = self.max_count
+            self.count[uniq] = n
+
+    def covariance(self, meter_id):
+        """Sample covariance of one meter's baseline (None for an unknown meter)."""
+        slot = self._slots.get(meter_id)
+        if slot is None or self.count[slot] < 2:
+            return None
+        return self.m2[slot] / (self.count[slot] - 1)
+
+    @instrument("inference.online_score")
+    def score(self, meter_ids, X):
+        """
+        Mahalanobis distance of each row from its meter's baseline.
+        Rows of unknown meters, or of meters with fewer than min_samples
+        windows (still warming up), score 0.
+        """
+        X = self._rows(X)
+        scores = np.zeros(len(X))
+        with self._lock:
+            slots = self._lookup(meter_ids, create=False)
+            ready = slots >= 0
+            ready[ready] = self.count[slots[ready]] >= self.min_samples
+            if not ready.any():
+                return scores
+
+            uniq, inverse = np.unique(slots[ready], return_inverse=True)
+            cov = self.m2[uniq] / (self.count[uniq] - 1)[:, np.newaxis, np.newaxis]
+            mean = self.mean[uniq]
+
+        # Ridge relative to each feature's level keeps constant features invertible
+        diag = np.arange(self.n_features)
+        cov[:, diag, diag] += (self.regularization * np.abs(mean)) ** 2 + np.finfo(float).tiny
+        precision = np.linalg.inv(cov)
+
+        dev = X[ready] - mean[inverse]
+        d2 = np.einsum('ni,nij,nj->n', dev, precision[inverse], dev)
+        scores[ready] = np.sqrt(np.maximum(d2, 0.0))
+        return scores
+
+    def predict(self, meter_ids, X):
+        """-1 for rows farther than `threshold` from their meter's baseline, else 1."""
+        return np.where(self.score(meter_ids, X) > self.threshold, -1, 1)
+
+    def observe(self, meter_ids, X, learn_anomalies=False):
+        """
+        Scores a batch, then learns from it: only the normal rows unless
+        learn_anomalies, so faults do not widen the envelope. Snapshots the
+        state if snapshot_interval has elapsed.
+        Returns: (n,) -1/1 predictions as predict()
+        """
+        meter_ids = list(meter_ids)
+        X = self._rows(X)
+        predictions = self.predict(meter_ids, X)
+        if learn_anomalies:
+            self.update(meter_ids, X)
+        else:
+            normal = np.flatnonzero(predictions == 1)
+            self.update([meter_ids[i] for i in normal], X[normal])
+        self.maybe_snapshot()
+        return predictions
+
+    def maybe_snapshot(self):
+        """Writes a snapshot to snapshot_path if snapshot_interval has elapsed."""
+        if not self.snapshot_path or self.snapshot_interval <= 0:
+            return False
+        if time.monotonic() - self._last_snapshot < self.snapshot_interval:
+            return False
+        self.snapshot()
+        return True
+
+    def snapshot(self, path=None):
+        """Saves every meter's state to an .npz (written then renamed, so readers never see a partial file)."""
+        path = path or self.snapshot_path
+        with self._lock:
+            n = len(self._ids)
+            state = {
+                "meter_ids": np.array(self._ids),
+                "count": self.count[:n].copy(),
+                "mean": self.mean[:n].copy(),
+                "m2": self.m2[:n].copy(),
+                "n_features": np.array(self.n_features),
+                "max_count": np.array(self.max_count),
+            }
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, path)
+        self._last_snapshot = time.monotonic()
+        return path
+
+    @classmethod
+    def load(cls, path, **kwargs):
+        """Restores a detector from snapshot(); kwargs override the scoring settings."""
+        with np.load(path, allow_pickle=False) as data:
+            kwargs.setdefault("max_count", float(data["max_count"]))
+            detector = cls(int(data["n_features"]), capacity=max(1, len(data["count"])), **kwargs)
+            detector._ids = data["meter_ids"].tolist()
+            detector._slots = {meter_id: slot for slot, meter_id in enumerate(detector._ids)}
+            n = len(detector._ids)
+            detector.count[:n] = data["count"]
+            detector.mean[:n] = data["mean"]
+            detector.m2[:n] = data["m2"]
+        return detector
@@ -3,42 +3,104 @@ Module: predictor_core.py
 Description: Implementation for predictor_core
 """
 
-import sys
-import os
+import numpy as np
+import threading
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from inference import signatures
-# Lazy import/init of anomaly detector
-from inference.anomaly_detector import AnomalyDetector
+from utils.logger import instrument
 
-# Singleton instance
-detector = AnomalyDetector()
+# Singleton anomaly detector, created on first use (see get_detector)
+detector = None
+_detector_lock = threading.Lock()
 
-def diagnose(rms, thd):
+def get_detector():
+    """The shared AnomalyDetector, created (and its module imported) on first call."""
+    global detector
+    if detector is None:
+        with _detector_lock:
+            if detector is None:
+                from inference.anomaly_detector import AnomalyDetector
+                detector = AnomalyDetector()
+    return detector
+
+def set_detector(replacement):
+    """Replaces the shared detector (e.g. one trained on a temporary model path)."""
+    global detector
+    detector = replacement
+
+def preload():
+    """
+    Builds the shared detector and loads its saved models (importing sklearn
+    for a pickled forest), so the first diagnosis does not pay for it. Call
+    once at service start; fleet pool workers run it as their initializer.
+    """
+    get_detector().preload()
+
+@instrument("inference.diagnose")
+def diagnose(rms, thd, *extra):
     """
     Classifies the signal state based on extracted features.
+    extra: further detector features (see feature_extractor.DETECTOR_FEATURES)
     Returns a status string. Can return multiple faults joined by ' | '.
     """
-    msgs = signatures.get_status_messages()
-    issues = []
-    
+    code = diagnose_batch(np.array([[rms, thd, *extra]]))[0]
+    return signatures.status_message(code)
+
+@instrument("inference.diagnose_batch")
+def diagnose_batch(features, render=False):
+    """
+    Classifies many windows at once.
+    features: (n, n_features) array whose first two columns are rms and thd;
+              every column is passed to the anomaly detector.
+    Returns: (n,) uint8 array of signatures.STATUS_* bit flags, or the list of
+             status strings when render=True.
+    """
+    features = np.asarray(features, dtype=float)
+    if features.ndim != 2 or features.shape[1] < 2:
+        raise ValueError("features must be a (n, n_features) array with rms and thd columns")
+    rms = features[:, 0]
+    thd = features[:, 1]
+
     # 1. Check Rule-Based (Deterministic knowledge)
-    if rms < signatures.SAG_THRESHOLD:
-        issues.append(msgs["SAG"])
-    elif rms > signatures.SWELL_THRESHOLD:
-        issues.append(msgs["SWELL"])
-    
-    if thd > signatures.THD_THRESHOLD:
-        issues.append(msgs["HARMONIC"])
-    
-    # 2. Check Anomaly Detector (Unsupervised / Unknown Faults)
-    is_normal = detector.predict([rms, thd])
-    if is_normal == -1:
-        issues.append("WARNING: Unknown Anomaly Detected (AI)")
-    
-    # Return Logic
-    if not issues:
-        return msgs["NORMAL"]
-        
-    return " | ".join(issues)
+    sag = rms < signatures.SAG_THRESHOLD
+    codes = sag.astype(np.uint8) * signatures.STATUS_SAG
+    codes |= ((rms > signatures.SWELL_THRESHOLD) & ~sag).astype(np.uint8) * signatures.STATUS_SWELL
+    codes |= (thd > signatures.THD_THRESHOLD).astype(np.uint8) * signatures.STATUS_HARMONIC
+
+    # 2. Check Anomaly Detector (Unsupervised / Unknown Faults), one pass per batch
+    is_normal = get_detector().predict_batch(features)
+    codes |= (is_normal == -1).astype(np.uint8) * signatures.STATUS_ANOMALY
+
+    if render:
+        return render_statuses(codes)
+    return codes
+
+@instrument("inference.diagnose_three_phase")
+def diagnose_three_phase(phase_features, unbalance, render=False):
+    """
+    Classifies three-phase windows.
+    phase_features: (n, 3, n_features) per-phase detector rows (see
+                    three_phase.detector_tensor); each phase gets the
+                    single-phase rules and the anomaly detector in one batch
+    unbalance: (n,) negative/positive sequence ratios
+    Returns: ((n,) combined codes, (n, 3) per-phase codes); the combined code
+             ORs the phases and adds STATUS_UNBALANCE. With render=True the
+             first element is the list of status strings naming the phases.
+    """
+    phase_features = np.asarray(phase_features, dtype=float)
+    if phase_features.ndim != 3 or phase_features.shape[1] != 3:
+        raise ValueError("phase_features must be a (n, 3, n_features) array")
+    n = len(phase_features)
+    phase_codes = diagnose_batch(phase_features.reshape(n * 3, -1)).reshape(n, 3)
+
+    codes = np.bitwise_or.reduce(phase_codes, axis=1)
+    codes |= (np.asarray(unbalance) > signatures.UNBALANCE_THRESHOLD).astype(np.uint8) * signatures.STATUS_UNBALANCE
+
+    if render:
+        return [signatures.three_phase_message(code, row) for code, row in zip(codes, phase_codes)], phase_codes
+    return codes, phase_codes
+
+def render_statuses(codes):
+    """Status strings for an array of status codes."""
+    lookup = {code: signatures.status_message(code) for code in np.unique(codes)}
+    return [lookup[code] for code in codes]
@@ -2,22 +2,62 @@
 Module: signatures.py
 Description: Definitions of fault signatures and operating thresholds
 """
-import sys
-import os
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import config
 
 # Thresholds can be derived from config or defined explicitly here if they are rule constants
 SAG_THRESHOLD = config.SAG_THRESHOLD
 SWELL_THRESHOLD = config.SWELL_THRESHOLD
 THD_THRESHOLD = config.THD_THRESHOLD
+UNBALANCE_THRESHOLD = config.UNBALANCE_THRESHOLD
+
+# Compact status codes (bit flags) used by batched diagnosis
+STATUS_NORMAL = 0
+STATUS_SAG = 1
+STATUS_SWELL = 2
+STATUS_HARMONIC = 4
+STATUS_ANOMALY = 8
+STATUS_UNBALANCE = 16
+
+_FLAGS = ((STATUS_SAG, "SAG"), (STATUS_SWELL, "SWELL"), (STATUS_HARMONIC, "HARMONIC"),
+          (STATUS_ANOMALY, "ANOMALY"), (STATUS_UNBALANCE, "UNBALANCE"))
 
 def get_status_messages():
     return {
         "SAG": "WARNING: Voltage Sag Detected",
         "SWELL": "WARNING: Voltage Swell Detected",
         "HARMONIC": "WARNING: Harmonic Fault Detected",
+        "ANOMALY": "WARNING: Unknown Anomaly Detected (AI)",
+        "UNBALANCE": "WARNING: Voltage Unbalance Detected",
         "NORMAL": "Normal Operation"
     }
+
+def status_message(code):
+    """
+    Renders a status code as the diagnosis string.
+    Multiple faults are joined by ' | '.
+    """
+    msgs = get_status_messages()
+    issues = [msgs[name] for flag, name in _FLAGS if code & flag]
+    if not issues:
+        return msgs["NORMAL"]
+    return " | ".join(issues)
+
+def three_phase_message(code, phase_codes, phases=("A", "B", "C")):
+    """
+    Renders a three-phase status code; per-phase faults name the affected
+    phases unless all three are hit, e.g. 'WARNING: Voltage Sag Detected (B)'.
+    """
+    msgs = get_status_messages()
+    issues = []
+    for flag, name in _FLAGS:
+        if not code & flag:
+            continue
+        hit = [phase for phase, phase_code in zip(phases, phase_codes) if phase_code & flag]
+        if hit and len(hit) < len(phases):
+            issues.append("%s (%s)" % (msgs[name], ", ".join(hit)))
+        else:
+            issues.append(msgs[name])
+    if not issues:
+        return msgs["NORMAL"]
+    return " | ".join(issues)
@@ -4,26 +4,285 @@ Description: Implementation for fft_core
 """
 
 import numpy as np
-from scipy.fft import fft, fftfreq
-import sys
-import os
+from collections import OrderedDict
+from functools import lru_cache
+import threading
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import config
+from utils.logger import instrument
+from utils.lazy import LazyModule
 
+# scipy.fft costs ~0.25 s to import; it loads when the first plan is built
+scipy_fft = LazyModule("scipy.fft")
+
+# Bins on either side of the fundamental / DC that THD treats as leakage
+EXCLUSION_WINDOW = 5
+
+class FFTPlan:
+    """
+    Precomputed FFT state for one (n_samples, sampling_rate, fundamental) setup.
+    The bin axis, the fundamental/DC/harmonic bin indices and the scaling are
+    built once; a plan is then reused for every window of that shape.
+    """
+    def __init__(self, n_samples, sampling_rate=config.SAMPLING_RATE, fundamental_freq=config.FREQUENCY,
+                 max_order=config.MAX_HARMONIC_ORDER):
+        self.n_samples = n_samples
+        self.sampling_rate = sampling_rate
+        self.fundamental_freq = fundamental_freq
+        self.scale = 2.0 / n_samples
+
+        # rfft also returns the Nyquist bin, which fftfreq reports as negative;
+        # it is trimmed so the axis matches the historical fft-based output.
+        self.n_bins = (n_samples + 1) // 2
+        frequencies = np.fft.rfftfreq(n_samples, 1 / sampling_rate)[:self.n_bins]
+        frequencies.setflags(write=False)
+        self.frequencies = frequencies
+
+        self.fundamental_idx = int(np.abs(frequencies - fundamental_freq).argmin())
+        self.dc_idx = int(np.abs(frequencies - 0).argmin())
+        self.fundamental_window = slice(max(0, self.fundamental_idx - EXCLUSION_WINDOW), self.fundamental_idx + EXCLUSION_WINDOW)
+        self.dc_window = slice(max(0, self.dc_idx - EXCLUSION_WINDOW), self.dc_idx + EXCLUSION_WINDOW)
+
+        # Harmonic orders 1..max_order that fall below Nyquist, and their bins
+        orders = np.arange(1, max_order + 1)
+        orders = orders[orders * fundamental_freq < sampling_rate / 2]
+        self.harmonic_orders = orders
+        self.harmonic_indices = np.abs(frequencies[np.newaxis, :] - (orders * fundamental_freq)[:, np.newaxis]).argmin(axis=1)
+        orders.setflags(write=False)
+        self.harmonic_indices.setflags(write=False)
+
+        self._rfft = scipy_fft.rfft
+        self._buffer = np.empty(self.n_bins)
+        self._lock = threading.Lock()
+
+    def spectrum(self, waveforms, overwrite_x=False):
+        """
+        Complex one-sided spectrum along the last axis (unscaled).
+        overwrite_x: allow scipy to reuse the input buffer as scratch space.
+        """
+        return self._rfft(waveforms, axis=-1, overwrite_x=overwrite_x, workers=config.FFT_WORKERS)[..., :self.n_bins]
+
+    def magnitudes(self, waveforms, out=None, gain=1.0):
+        """
+        Scaled one-sided magnitudes along the last axis.
+        out: optional preallocated float array to write into.
+        gain: extra linear scale folded into the same multiply (e.g. volts per ADC count)
+        """
+        out = np.abs(self.spectrum(waveforms), out=out)
+        out *= out.dtype.type(self.scale * gain)
+        return out
+
+    def phasor(self, spectrum, gain=1.0):
+        """
+        Complex fundamental phasor (peak amplitude, cosine reference) of each
+        row of a spectrum returned by spectrum().
+        """
+        return spectrum[..., self.fundamental_idx] * (self.scale * gain)
+
+    def thd(self, magnitudes):
+        """
+        THD = sqrt(sum(V_n^2)) / V_fundamental from a one-sided magnitude
+        spectrum (single spectrum or (n_channels, n_bins) stack).
+        """
+        if magnitudes.ndim == 1:
+            return self._single_thd(magnitudes)
+        fundamental_amp = magnitudes[..., self.fundamental_idx]
+
+        # Sum of squares of harmonic components (ignore DC and fundamental);
+        # einsum avoids materialising a full-size squared spectrum
+        harmonics_sq_sum = np.einsum('...i,...i->...', magnitudes, magnitudes)
+        for window in (self.fundamental_window, self.dc_window):
+            part = magnitudes[..., window]
+            harmonics_sq_sum = harmonics_sq_sum - np.einsum('...i,...i->...', part, part)
+        harmonics_sq_sum = np.maximum(harmonics_sq_sum, 0) # Numerical noise
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(fundamental_amp == 0, 0.0, np.sqrt(harmonics_sq_sum) / fundamental_amp)
+
+    def _single_thd(self, magnitudes):
+        """Scalar THD of one spectrum; plain dot products keep per-window overhead low."""
+        fundamental_amp = magnitudes[self.fundamental_idx]
+        if fundamental_amp == 0:
+            return 0.0
+        fundamental = magnitudes[self.fundamental_window]
+        dc = magnitudes[self.dc_window]
+        harmonics_sq_sum = np.dot(magnitudes, magnitudes) - np.dot(fundamental, fundamental) - np.dot(dc, dc)
+        return np.sqrt(max(harmonics_sq_sum, 0.0)) / fundamental_amp
+
+    def waveform_thd(self, waveform):
+        """THD of a single window, using the plan's preallocated magnitude buffer."""
+        with self._lock:
+            return self.thd(self.magnitudes(waveform, out=self._buffer))
+
+class HarmonicProjection:
+    """
+    Sparse alternative to a full FFT: the least-squares fit of a window onto
+    DC and the harmonics 1..max_order of one fundamental. Only the 2K+1
+    inner products with cos/sin rows are evaluated, then solved against
+    their (2K+1)^2 Gram matrix, which has a closed form. Unlike FFT bins the
+    fit is exact for any fundamental, not only integer cycles.
+
+    The cos/sin table covers one block of SPARSE_PROJECTION_BLOCK samples
+    at the input dtype; longer windows are summed block by block, each
+    block's sums rotated by its start phase, so memory does not grow with N.
+    """
+    def __init__(self, n_samples, sampling_rate=config.SAMPLING_RATE, fundamental_freq=config.FREQUENCY,
+                 max_order=config.SPARSE_THD_MAX_ORDER, dtype=np.float64):
+        self.n_samples = n_samples
+        self.sampling_rate = sampling_rate
+        self.fundamental_freq = fundamental_freq
+
+        orders = np.arange(1, max_order + 1)
+        orders = orders[orders * fundamental_freq < sampling_rate / 2]
+        orders.setflags(write=False)
+        self.harmonic_orders = orders
+        step = 2 * np.pi * fundamental_freq / sampling_rate * orders # radians per sample, per order
+
+        self.block = min(n_samples, config.SPARSE_PROJECTION_BLOCK)
+        phase = step[np.newaxis, :] * np.arange(self.block)[:, np.newaxis]
+        matrix = np.hstack([np.ones((self.block, 1)), np.cos(phase), np.sin(phase)]).astype(dtype)
+        matrix.setflags(write=False)
+        self.matrix = matrix # (block, 2K+1)
+        # Start phase of every block, the last one possibly partial
+        starts = np.arange(0, n_samples, self.block)
+        self.rotations = np.exp(1j * step[np.newaxis, :] * starts[:, np.newaxis]) # (n_blocks, K)
+        self.gram_inverse = _pseudo_inverse(_harmonic_gram(step, n_samples))
+
+    @property
+    def nbytes(self):
+        return self.matrix.nbytes + self.rotations.nbytes + self.gram_inverse.nbytes
+
+    def _coefficients(self, waveforms):
+        """[DC, cos_1..K, sin_1..K] fit coefficients along the last axis."""
+        n_full = self.n_samples - self.n_samples % self.block
+        sums = waveforms[..., :n_full].reshape(waveforms.shape[:-1] + (-1, self.block)) @ self.matrix
+        if n_full < self.n_samples:
+            tail = waveforms[..., n_full:] @ self.matrix[:self.n_samples - n_full]
+            sums = np.concatenate([sums, tail[..., np.newaxis, :]], axis=-2)
+
+        n_orders = len(self.harmonic_orders)
+        dc = sums[..., 0].sum(axis=-1)
+        if len(self.rotations) == 1:
+            cos, sin = sums[..., 0, 1:n_orders + 1], sums[..., 0, n_orders + 1:]
+        else:
+            rotated = np.einsum('...bk,bk->...k', sums[..., 1:n_orders + 1] + 1j * sums[..., n_orders + 1:],
+                                self.rotations)
+            cos, sin = rotated.real, rotated.imag
+        return np.concatenate([dc[..., np.newaxis], cos, sin], axis=-1) @ self.gram_inverse
+
+    def amplitudes(self, waveforms):
+        """Peak amplitude of each harmonic order along the last axis."""
+        coeffs = self._coefficients(waveforms)
+        n_orders = len(self.harmonic_orders)
+        return np.hypot(coeffs[..., 1:n_orders + 1], coeffs[..., n_orders + 1:])
+
+    def thd(self, waveforms):
+        """THD = sqrt(sum(V_n^2, n >= 2)) / V_1 for one window or a stack."""
+        coeffs = self._coefficients(waveforms)
+        n_orders = len(self.harmonic_orders)
+        cos, sin = coeffs[..., 1:n_orders + 1], coeffs[..., n_orders + 1:]
+        if coeffs.ndim == 1:
+            fundamental_sq = cos[0] * cos[0] + sin[0] * sin[0]
+            if fundamental_sq == 0:
+                return 0.0
+            return np.sqrt((np.dot(cos[1:], cos[1:]) + np.dot(sin[1:], sin[1:])) / fundamental_sq)
+
+        fundamental_sq = cos[:, 0] ** 2 + sin[:, 0] ** 2
+        harmonics_sq_sum = np.einsum('ij,ij->i', cos[:, 1:], cos[:, 1:]) + np.einsum('ij,ij->i', sin[:, 1:], sin[:, 1:])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(fundamental_sq == 0, 0.0, np.sqrt(harmonics_sq_sum / fundamental_sq))
+
+def _trig_sums(angles, n_samples):
+    """sum(cos(a*n)) and sum(sin(a*n)) over n = 0..N-1, in closed form (Dirichlet kernel)."""
+    half = angles / 2
+    sin_half = np.sin(half)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # a a multiple of 2*pi: the limit of the ratio
+        ratio = np.where(np.abs(sin_half) > 1e-12, np.sin(n_samples * half) / sin_half,
+                         n_samples * np.cos(n_samples * half) / np.cos(half))
+    return ratio * np.cos((n_samples - 1) * half), ratio * np.sin((n_samples - 1) * half)
+
+def _harmonic_gram(step, n_samples):
+    """Gram matrix of the [1, cos(step*n), sin(step*n)] columns over N samples."""
+    diff = step[:, np.newaxis] - step[np.newaxis, :]
+    total = step[:, np.newaxis] + step[np.newaxis, :]
+    cos_diff, sin_diff = _trig_sums(diff, n_samples)
+    cos_total, sin_total = _trig_sums(total, n_samples)
+    cos_one, sin_one = _trig_sums(step, n_samples)
+
+    k = len(step)
+    gram = np.empty((2 * k + 1, 2 * k + 1))
+    gram[0, 0] = n_samples
+    gram[0, 1:k + 1] = gram[1:k + 1, 0] = cos_one
+    gram[0, k + 1:] = gram[k + 1:, 0] = sin_one
+    gram[1:k + 1, 1:k + 1] = (cos_diff + cos_total) / 2
+    gram[k + 1:, k + 1:] = (cos_diff - cos_total) / 2
+    # cos(a)sin(b) = (sin(a+b) - sin(a-b)) / 2
+    gram[1:k + 1, k + 1:] = (sin_total - sin_diff) / 2
+    gram[k + 1:, 1:k + 1] = gram[1:k + 1, k + 1:].T
+    return gram
+
+def _pseudo_inverse(gram, rcond=1e-13):
+    """Inverse of a symmetric Gram matrix, dropping directions the samples cannot resolve."""
+    eigenvalues, vectors = np.linalg.eigh(gram)
+    keep = eigenvalues > rcond * eigenvalues.max()
+    inverse = (vectors[:, keep] / eigenvalues[keep]) @ vectors[:, keep].T
+    inverse.setflags(write=False)
+    return inverse
+
+def get_plan(n_samples, sampling_rate=config.SAMPLING_RATE, fundamental_freq=config.FREQUENCY):
+    """Returns the cached FFTPlan for a configuration (LRU over mixed setups)."""
+    # lru_cache keys on how arguments were passed; normalise them so that
+    # positional, keyword and defaulted calls share one plan
+    return _cached_plan(int(n_samples), float(sampling_rate), float(fundamental_freq))
+
+@lru_cache(maxsize=config.FFT_PLAN_CACHE_SIZE)
+def _cached_plan(n_samples, sampling_rate, fundamental_freq):
+    return FFTPlan(n_samples, sampling_rate, fundamental_freq)
+
+_projection_cache = OrderedDict()
+_projection_bytes = 0
+_projection_lock = threading.Lock()
+
+def get_projection(n_samples, sampling_rate=config.SAMPLING_RATE, fundamental_freq=config.FREQUENCY,
+                   max_order=config.SPARSE_THD_MAX_ORDER, dtype=np.float64):
+    """
+    Returns the cached HarmonicProjection for a configuration, its table in
+    `dtype` (the dtype of the windows it will project). The LRU is bounded
+    by SPARSE_PROJECTION_CACHE_BYTES rather than by entry count.
+    """
+    global _projection_bytes
+    key = (int(n_samples), float(sampling_rate), float(fundamental_freq), int(max_order), np.dtype(dtype).str)
+    with _projection_lock:
+        projection = _projection_cache.get(key)
+        if projection is not None:
+            _projection_cache.move_to_end(key)
+            return projection
+
+    projection = HarmonicProjection(*key[:4], dtype=dtype)
+    with _projection_lock:
+        if key not in _projection_cache:
+            _projection_cache[key] = projection
+            _projection_bytes += projection.nbytes
+        while _projection_bytes > config.SPARSE_PROJECTION_CACHE_BYTES and len(_projection_cache) > 1:
+            _projection_bytes -= _projection_cache.popitem(last=False)[1].nbytes
+    return projection
+
+@instrument("processing.compute_fft")
 def compute_fft(waveform, sampling_rate=config.SAMPLING_RATE):
     """
     Performs FFT analysis.
     Returns: frequencies, magnitudes
     """
-    N = len(waveform)
-    yf = fft(waveform)
-    xf = fftfreq(N, 1 / sampling_rate)
-    
-    # Return only positive frequencies
-    positive_indices = xf >= 0
-    magnitudes = 2.0/N * np.abs(yf[positive_indices])
-    frequencies = xf[positive_indices]
-    
-    return frequencies, magnitudes
+    plan = get_plan(len(waveform), sampling_rate, config.FREQUENCY)
+    return plan.frequencies, plan.magnitudes(waveform)
+
+@instrument("processing.compute_fft_batch")
+def compute_fft_batch(waveforms, sampling_rate=config.SAMPLING_RATE):
+    """
+    Performs FFT analysis on every row of a (n_channels, n_samples) array
+    with a single real-input FFT.
+    Returns: frequencies (n_bins,), magnitudes (n_channels, n_bins)
+    """
+    plan = get_plan(waveforms.shape[-1], sampling_rate, config.FREQUENCY)
+    return plan.frequencies, plan.magnitudes(waveforms)
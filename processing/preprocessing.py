@@ -1,5 +1,171 @@
 """
 Module: preprocessing.py
-Description: Implementation for preprocessing
+Description: Signal conditioning ahead of feature extraction (fundamental frequency tracking, synchronous resampling)
 """
 
+import numpy as np
+from functools import lru_cache
+
+from utils import config
+from utils.lazy import LazyModule
+from processing import fft_core
+
+scipy_sparse = LazyModule("scipy.sparse")
+
+# Rows per block when tracking large stacks (bounds the smoothing temporaries)
+BLOCK_ROWS = 256
+
+def estimate_frequency(waveforms, sampling_rate=config.SAMPLING_RATE, fallback=config.FREQUENCY,
+                       method="zero_crossing"):
+    """
+    Fundamental frequency of each window.
+    waveforms: single window or (n_channels, n_samples) stack
+    method: "zero_crossing" (interpolated rising zero crossings) or "fft"
+            (interpolated peak of a Hann-windowed spectrum)
+    For zero crossings a short moving average suppresses noise-induced extra
+    crossings (it delays every crossing equally, so the period is unaffected).
+    Results are clipped to [FREQ_TRACK_MIN, FREQ_TRACK_MAX]; windows too short
+    to track (fewer than two crossings, no spectral peak in range) report
+    `fallback`.
+    """
+    if method == "zero_crossing":
+        track = _track_block
+    elif method == "fft":
+        track = _fft_track_block
+    else:
+        raise ValueError(f"Unknown frequency tracking method: {method}")
+    waveforms = np.asarray(waveforms, dtype=float)
+    if waveforms.ndim == 1:
+        return float(track(waveforms[np.newaxis, :], sampling_rate, fallback)[0])
+    if len(waveforms) == 0:
+        return np.empty(0)
+    return np.concatenate([track(waveforms[i:i + BLOCK_ROWS], sampling_rate, fallback)
+                           for i in range(0, len(waveforms), BLOCK_ROWS)])
+
+def _track_block(x, sampling_rate, fallback):
+    """Zero-crossing frequency of each row of a 2-D block."""
+    # Moving sum minus the window's DC; the 1/width scale is irrelevant to
+    # where the signal crosses zero, so it is skipped
+    width = max(1, int(round(sampling_rate / (4 * config.FREQ_TRACK_MAX))))
+    offset = width * x.mean(axis=1, keepdims=True)
+    if width > 1:
+        csum = np.cumsum(x, axis=1)
+        x = csum[:, width:] - csum[:, :-width]
+        x -= offset
+    else:
+        x = x - offset
+
+    negative = x < 0
+    rising = negative[:, :-1] & ~negative[:, 1:]
+    counts = np.count_nonzero(rising, axis=1)
+    rows = np.arange(len(x))
+    first = rising.argmax(axis=1)
+    last = rising.shape[1] - 1 - rising[:, ::-1].argmax(axis=1)
+
+    def crossing(idx):
+        lo, hi = x[rows, idx], x[rows, idx + 1]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return idx + np.where(hi != lo, lo / (lo - hi), 0.0)
+
+    span = crossing(last) - crossing(first)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        freqs = np.where((counts >= 2) & (span > 0), (counts - 1) * sampling_rate / span, fallback)
+    freqs = np.clip(freqs, config.FREQ_TRACK_MIN, config.FREQ_TRACK_MAX)
+    return freqs
+
+def _fft_track_block(x, sampling_rate, fallback):
+    """Interpolated-FFT frequency of each row of a 2-D block."""
+    n = x.shape[1]
+    spectrum = np.abs(fft_core.scipy_fft.rfft((x - x.mean(axis=1, keepdims=True)) * np.hanning(n), axis=1))
+    # Peak search over the bins that can hold a fundamental in the tracked range
+    lo = max(1, int(np.floor(config.FREQ_TRACK_MIN * n / sampling_rate)))
+    hi = min(spectrum.shape[1] - 2, int(np.ceil(config.FREQ_TRACK_MAX * n / sampling_rate)))
+    if lo > hi:
+        return np.full(len(x), float(fallback))
+
+    rows = np.arange(len(x))
+    k = lo + spectrum[:, lo:hi + 1].argmax(axis=1)
+    peak = spectrum[rows, k]
+    left, right = spectrum[rows, k - 1], spectrum[rows, k + 1]
+    # Two-point interpolation for the Hann window: with alpha the larger
+    # neighbour over the peak, the tone sits (2 alpha - 1) / (alpha + 1)
+    # bins from the peak towards that neighbour
+    side = np.where(right >= left, 1.0, -1.0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alpha = np.maximum(left, right) / peak
+        freqs = (k + side * (2 * alpha - 1) / (alpha + 1)) * sampling_rate / n
+    freqs = np.where(peak > 0, freqs, fallback)
+    return np.clip(freqs, config.FREQ_TRACK_MIN, config.FREQ_TRACK_MAX)
+
+def quantize_frequency(freqs, resolution=config.FREQ_TRACK_RESOLUTION):
+    """Snaps tracked frequencies to a fixed grid so cached projections are reused."""
+    return np.round(np.round(np.asarray(freqs) / resolution) * resolution, 6)
+
+def resample_cycles(waveforms, frequencies, sampling_rate=config.SAMPLING_RATE, cycles=config.SYNC_CYCLES,
+                    samples_per_cycle=config.SYNC_SAMPLES_PER_CYCLE, lobes=config.SYNC_KERNEL_LOBES):
+    """
+    Resamples each window onto exactly `cycles` periods of its own
+    fundamental, samples_per_cycle points per period, starting at the
+    window's first sample. A DFT of the result puts harmonic h exactly on
+    bin h * cycles whatever the line frequency, so short windows need no
+    leakage allowance.
+    waveforms: single window or (n_channels, n_samples) stack
+    frequencies: fundamental of each window (scalar or (n_channels,)); rows
+                 sharing a frequency share one cached resampler, so tracked
+                 frequencies are best passed through quantize_frequency()
+    lobes: half-width of the Lanczos (windowed sinc) interpolation kernel
+    Returns: (n_channels, cycles * samples_per_cycle) array
+    Raises ValueError if a window holds fewer than `cycles` periods.
+    """
+    waveforms = np.asarray(waveforms, dtype=float)
+    single = waveforms.ndim == 1
+    if single:
+        waveforms = waveforms[np.newaxis, :]
+    if waveforms.ndim != 2:
+        raise ValueError("waveforms must be a (n_channels, n_samples) array")
+    frequencies = np.broadcast_to(np.asarray(frequencies, dtype=float), (len(waveforms),))
+
+    out = np.empty((len(waveforms), cycles * samples_per_cycle))
+    groups, inverse = np.unique(frequencies, return_inverse=True)
+    for i, frequency in enumerate(groups):
+        resampler = get_resampler(waveforms.shape[1], sampling_rate, float(frequency), cycles, samples_per_cycle, lobes)
+        if len(groups) == 1:
+            out[:] = resampler(waveforms)
+        else:
+            rows = np.flatnonzero(inverse == i)
+            out[rows] = resampler(waveforms[rows])
+    return out[0] if single else out
+
+class CycleResampler:
+    """
+    Lanczos interpolation of n_samples-long windows at one fundamental,
+    stored as a sparse (n_out, n_samples) matrix with 2 * lobes taps per
+    output sample; samples past either edge repeat the edge sample.
+    """
+    def __init__(self, n_samples, sampling_rate, frequency, cycles, samples_per_cycle, lobes):
+        n_out = cycles * samples_per_cycle
+        step = sampling_rate / (frequency * samples_per_cycle)
+        if (n_out - 1) * step > n_samples - 1:
+            raise ValueError(f"windows of {n_samples} samples hold fewer than {cycles} cycles at {frequency} Hz")
+
+        positions = np.arange(n_out) * step
+        base = np.floor(positions).astype(np.intp)
+        taps = np.arange(1 - lobes, lobes + 1)
+        distance = (positions - base)[:, np.newaxis] - taps
+        weights = np.sinc(distance) * np.sinc(distance / lobes)
+        weights /= weights.sum(axis=1, keepdims=True) # unit DC gain at every position
+        columns = np.clip(base[:, np.newaxis] + taps, 0, n_samples - 1)
+        rows = np.repeat(np.arange(n_out), len(taps))
+        # Duplicate (row, column) pairs at the edges are summed on conversion
+        self.matrix = scipy_sparse.csr_matrix((weights.ravel(), (rows, columns.ravel())), shape=(n_out, n_samples))
+
+    def __call__(self, waveforms):
+        """(n_channels, n_samples) -> (n_channels, n_out)"""
+        return np.ascontiguousarray((self.matrix @ waveforms.T).T)
+
+@lru_cache(maxsize=config.SYNC_RESAMPLER_CACHE_SIZE)
+def get_resampler(n_samples, sampling_rate=config.SAMPLING_RATE, frequency=config.FREQUENCY,
+                  cycles=config.SYNC_CYCLES, samples_per_cycle=config.SYNC_SAMPLES_PER_CYCLE,
+                  lobes=config.SYNC_KERNEL_LOBES):
+    """Returns the cached CycleResampler for a configuration."""
+    return CycleResampler(n_samples, sampling_rate, frequency, cycles, samples_per_cycle, lobes)
@@ -0,0 +1,118 @@
+"""
+Module: streaming.py
+Description: Incremental RMS/THD analysis of a continuous sample stream
+"""
+
+import numpy as np
+
+from utils import config
+from processing import fft_core
+
+class StreamingAnalyzer:
+    """
+    Consumes an endless sample stream in chunks of any size.
+
+    RMS follows IEC 61000-4-30 Urms(1/2): each half-cycle's sum of squares is
+    accumulated exactly once, and every completed half-cycle emits its own RMS
+    and the RMS over the last full cycle. THD is computed on consecutive,
+    non-overlapping windows of `thd_cycles` cycles held in a ring buffer.
+    """
+    def __init__(self, sampling_rate=config.SAMPLING_RATE, frequency=config.FREQUENCY, thd_cycles=10):
+        self.sampling_rate = sampling_rate
+        self.frequency = frequency
+        self.half_period = sampling_rate / (2.0 * frequency) # samples, may be fractional
+        self.thd_window = int(round(thd_cycles * sampling_rate / frequency))
+        self._plan = fft_core.get_plan(self.thd_window, sampling_rate, frequency)
+        self._ring = np.empty(self.thd_window)
+        self.reset()
+
+    def reset(self):
+        """Drops all stream state."""
+        self.samples_seen = 0
+        self._half_count = 0
+        self._half_sumsq = 0.0       # partial sum of the half-cycle in progress
+        self._prev_half_sumsq = 0.0  # last completed half-cycle
+        self._prev_half_len = 0
+        self._ring_pos = 0
+
+    def _boundary(self, k):
+        """Absolute sample index at which half-cycle k ends."""
+        return np.rint((k + 1) * self.half_period).astype(np.int64)
+
+    def process(self, chunk):
+        """
+        Feeds one chunk and yields the readings it completes:
+        {'type': 'rms', 'time', 'half_cycle_rms', 'cycle_rms'} with one array
+        entry per completed half-cycle, and {'type': 'thd', 'time', 'thd'}
+        per completed THD window. 'time' is the window end in seconds.
+        """
+        chunk = np.asarray(chunk, dtype=float)
+        if chunk.size == 0:
+            return
+
+        rms = self._process_rms(chunk)
+        if rms is not None:
+            yield rms
+        yield from self._process_thd(chunk)
+        self.samples_seen += len(chunk)
+
+    def _process_rms(self, chunk):
+        start = self.samples_seen
+        end = start + len(chunk)
+
+        # Half-cycle boundaries that fall inside this chunk
+        last_k = int(np.floor((end + 0.5) / self.half_period)) # upper bound on completed half-cycles
+        ks = np.arange(self._half_count, last_k + 1)
+        boundaries = self._boundary(ks)
+        boundaries = boundaries[boundaries <= end]
+
+        cumsum = np.cumsum(chunk * chunk)
+        if len(boundaries) == 0:
+            self._half_sumsq += cumsum[-1]
+            return None
+
+        rel = boundaries - start
+        sums_to = np.where(rel > 0, cumsum[np.maximum(rel - 1, 0)], 0.0)
+        half_sums = np.diff(sums_to, prepend=0.0)
+        half_sums[0] += self._half_sumsq
+
+        lengths = np.diff(boundaries, prepend=self._boundary(self._half_count - 1) if self._half_count else 0)
+        prev_sums = np.concatenate(([self._prev_half_sumsq], half_sums[:-1]))
+        prev_lengths = np.concatenate(([self._prev_half_len], lengths[:-1]))
+
+        self._half_sumsq = cumsum[-1] - sums_to[-1]
+        self._prev_half_sumsq = half_sums[-1]
+        self._prev_half_len = int(lengths[-1])
+        self._half_count += len(boundaries)
+
+        return {
+            "type": "rms",
+            "time": boundaries / self.sampling_rate,
+            "half_cycle_rms": np.sqrt(half_sums / lengths),
+            "cycle_rms": np.sqrt((half_sums + prev_sums) / (lengths + prev_lengths)),
+        }
+
+    def _process_thd(self, chunk):
+        W = self.thd_window
+        i = 0
+        n = len(chunk)
+        while i < n:
+            if self._ring_pos == 0 and n - i >= W:
+                # Whole windows straight from the chunk, one batched FFT
+                n_windows = (n - i) // W
+                block = chunk[i:i + n_windows * W].reshape(n_windows, W)
+                thd = self._plan.thd(self._plan.magnitudes(block))
+                i += n_windows * W
+                ends = self.samples_seen + i - W * np.arange(n_windows - 1, -1, -1)
+                yield {"type": "thd", "time": ends / self.sampling_rate, "thd": thd}
+                continue
+
+            take = min(W - self._ring_pos, n - i)
+            self._ring[self._ring_pos:self._ring_pos + take] = chunk[i:i + take]
+            self._ring_pos += take
+            i += take
+            if self._ring_pos == W:
+                self._ring_pos = 0
+                thd = self._plan.waveform_thd(self._ring)
+                end = self.samples_seen + i
+                yield {"type": "thd", "time": np.array([end / self.sampling_rate]), "thd": np.array([thd])}
@@ -0,0 +1,75 @@
+"""
+Module: three_phase.py
+Description: Three-phase analysis (per-phase features, symmetrical components and voltage unbalance)
+"""
+
+import numpy as np
+
+from utils import config
+from utils.logger import instrument
+from processing import feature_extractor
+
+PHASES = ("A", "B", "C")
+
+# Fortescue operator a = 1 at 120 degrees, and the phase -> sequence matrix
+# (rows: zero, positive, negative)
+A = np.exp(2j * np.pi / 3)
+SEQUENCE_MATRIX = np.array([[1, 1, 1],
+                            [1, A, A * A],
+                            [1, A * A, A]]) / 3
+SEQUENCE_MATRIX.setflags(write=False)
+
+def symmetrical_components(phasors):
+    """
+    Zero, positive and negative sequence phasors.
+    phasors: complex (..., 3) array of phase A, B, C phasors
+    Returns: complex (..., 3) array ordered (zero, positive, negative)
+    """
+    phasors = np.asarray(phasors)
+    if phasors.shape[-1] != 3:
+        raise ValueError("phasors must have a trailing axis of 3 phases")
+    return phasors @ SEQUENCE_MATRIX.T
+
+def unbalance(sequence):
+    """
+    Voltage unbalance factors from sequence phasors (see symmetrical_components).
+    Returns: (negative, zero) sequence magnitudes relative to the positive sequence
+    """
+    magnitudes = np.abs(sequence)
+    positive = np.maximum(magnitudes[..., 1], np.finfo(float).tiny)
+    return magnitudes[..., 2] / positive, magnitudes[..., 0] / positive
+
+@instrument("processing.three_phase")
+def analyze_three_phase(waveforms, fundamental_freq=config.FREQUENCY, sampling_rate=config.SAMPLING_RATE,
+                        volts_per_count=config.ADC_VOLTS_PER_COUNT, wavelet_features=False):
+    """
+    Per-phase features plus sequence components for three-phase windows.
+    waveforms: (3, n_samples) or (batch, 3, n_samples) array, in volts or as
+               raw int16 ADC counts scaled by volts_per_count
+    All phases of all windows go through one extract_features_batch call, so
+    they share one FFT; the fundamental phasors come from the same spectrum.
+    Returns: the extract_features_batch dict with per-row entries shaped
+             (batch, 3) (or (3,) for a single window), plus 'sequence'
+             (complex (..., 3): zero, positive, negative), 'unbalance'
+             (negative/positive ratio) and 'zero_sequence' (zero/positive ratio)
+    """
+    waveforms = np.asarray(waveforms)
+    if waveforms.ndim not in (2, 3) or waveforms.shape[-2] != 3:
+        raise ValueError("waveforms must be a (3, n_samples) or (batch, 3, n_samples) array")
+    leading = waveforms.shape[:-1]
+
+    flat = waveforms.reshape(-1, waveforms.shape[-1])
+    features = feature_extractor.extract_features_batch(flat, fundamental_freq, sampling_rate,
+                                                        volts_per_count, wavelet_features)
+    for name, values in features.items():
+        if name != "frequencies":
+            features[name] = values.reshape(leading + values.shape[1:])
+
+    sequence = symmetrical_components(features["fundamental"])
+    features["sequence"] = sequence
+    features["unbalance"], features["zero_sequence"] = unbalance(sequence)
+    return features
+
+def detector_tensor(features):
+    """(..., 3, len(DETECTOR_FEATURES)) per-phase detector input from analyze_three_phase(wavelet_features=True)."""
+    return np.stack([features[name] for name in feature_extractor.DETECTOR_FEATURES], axis=-1)
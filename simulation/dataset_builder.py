@@ -0,0 +1,181 @@
+"""
+Module: dataset_builder.py
+Description: Parallel, chunked generation of labelled waveform corpora
+"""
+
+import numpy as np
+import argparse
+import json
+import time
+import sys
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+# Add parent directory to path to import utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from utils import config, precision
+from processing import feature_extractor
+from simulation import fault_injector
+
+# Label ids follow data/power_quality_fault_dataset.csv (3 is Transient there)
+LABELS = {
+    "Normal": 0,
+    "Sag": 1,
+    "Swell": 2,
+    "Harmonics": 4,
+    "Noise": 5,
+    "Sag+Harmonics": 6,
+    "Swell+Harmonics": 7,
+}
+FAULT_CLASSES = tuple(LABELS)
+HARMONIC_ORDERS = (3, 5, 7)
+
+def generate_block(n_waveforms, rng, fault_classes=FAULT_CLASSES, frequency=config.FREQUENCY,
+                   sampling_rate=config.SAMPLING_RATE, duration=config.DURATION, noise_range=(0.0, 0.02)):
+    """
+    Generates a (n_waveforms, n_samples) block of labelled waveforms with
+    randomized fault parameters, using the same physics as fault_injector.
+    Returns: dict with 'waveforms', 'labels' and the per-row parameters
+    """
+    n_samples = int(sampling_rate * duration)
+    dtype = precision.float_dtype()
+    t = np.linspace(0, duration, n_samples, endpoint=False, dtype=dtype)
+    amplitude = config.VOLTAGE_RMS * np.sqrt(2)
+
+    classes = np.array(fault_classes)[rng.integers(len(fault_classes), size=n_waveforms)]
+    has_sag = np.char.startswith(classes, "Sag")
+    has_swell = np.char.startswith(classes, "Swell")
+    has_harmonics = np.char.endswith(classes, "Harmonics")
+    is_noise = classes == "Noise"
+
+    # Sag depth / swell magnitude as a per-row gain over [start, end)
+    gain = np.ones(n_waveforms)
+    gain[has_sag] = rng.uniform(0.1, 0.9, has_sag.sum())
+    gain[has_swell] = rng.uniform(1.1, 2.0, has_swell.sum())
+    start_ratio = rng.uniform(0.0, 0.6, n_waveforms)
+    end_ratio = start_ratio + rng.uniform(0.1, 0.4, n_waveforms)
+
+    harmonic_ratios = np.zeros((n_waveforms, len(HARMONIC_ORDERS)))
+    harmonic_ratios[has_harmonics] = rng.uniform(0.02, 0.3, (has_harmonics.sum(), len(HARMONIC_ORDERS)))
+
+    noise_level = rng.uniform(noise_range[0], noise_range[1], n_waveforms)
+    noise_level[is_noise] = rng.uniform(0.05, 0.15, is_noise.sum())
+
+    # One buffer for the whole block; every injection works in place
+    waveforms = np.empty((n_waveforms, n_samples), dtype=dtype)
+    waveforms[:] = dtype.type(amplitude) * np.sin(2 * np.pi * frequency * t)
+    fault_injector.inject_sag_batch(waveforms, gain, start_ratio, end_ratio, out=waveforms)
+    fault_injector.inject_harmonics_batch(t, waveforms, harmonic_ratios, HARMONIC_ORDERS, out=waveforms,
+                                          frequency=frequency)
+    fault_injector.inject_noise_batch(waveforms, noise_level, rng, out=waveforms)
+
+    return {
+        "waveforms": waveforms,
+        "labels": np.array([LABELS[c] for c in classes], dtype=np.int8),
+        "gain": gain,
+        "start_ratio": start_ratio,
+        "end_ratio": end_ratio,
+        "harmonic_ratios": harmonic_ratios,
+        "noise_level": noise_level,
+    }
+
+def _build_chunk(index, seed_seq, n_waveforms, out_dir, options):
+    """Worker: generates one chunk, extracts features and writes it to disk."""
+    rng = np.random.default_rng(seed_seq)
+    block = generate_block(n_waveforms, rng, **options["generator"])
+    features = feature_extractor.extract_features_batch(
+        block["waveforms"], options["generator"]["frequency"], options["generator"]["sampling_rate"],
+        wavelet_features=True)
+    block["features"] = feature_extractor.detector_matrix(features)
+    if options["store_waveforms"]:
+        block["waveforms"] = block["waveforms"].astype(np.float32, copy=False)
+    else:
+        del block["waveforms"]
+
+    path = os.path.join(out_dir, f"chunk_{index:06d}.npz")
+    np.savez(path, **block)
+    return index, path, np.bincount(block["labels"], minlength=max(LABELS.values()) + 1)
+
+def build_dataset(out_dir, n_waveforms, chunk_size=10000, n_workers=None, seed=0, store_waveforms=True,
+                  fault_classes=FAULT_CLASSES, frequency=config.FREQUENCY, sampling_rate=config.SAMPLING_RATE,
+                  duration=config.DURATION, noise_range=(0.0, 0.02)):
+    """
+    Writes a corpus of `n_waveforms` labelled windows as chunk_*.npz files
+    plus a manifest.json. Each chunk has its own child seed, so the corpus is
+    identical for any worker count. At most 2 chunks per worker are in flight,
+    keeping memory bounded regardless of corpus size.
+    features columns: feature_extractor.DETECTOR_FEATURES
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    n_workers = n_workers or os.cpu_count()
+    n_chunks = -(-n_waveforms // chunk_size)
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+    sizes = [min(chunk_size, n_waveforms - i * chunk_size) for i in range(n_chunks)]
+    options = {
+        "store_waveforms": store_waveforms,
+        "generator": {
+            "fault_classes": tuple(fault_classes),
+            "frequency": frequency,
+            "sampling_rate": sampling_rate,
+            "duration": duration,
+            "noise_range": tuple(noise_range),
+        },
+    }
+
+    start = time.perf_counter()
+    results = []
+    if n_workers == 1:
+        results = [_build_chunk(i, seeds[i], sizes[i], out_dir, options) for i in range(n_chunks)]
+    else:
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            pending = set()
+            for i in range(n_chunks):
+                if len(pending) >= 2 * n_workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    results.extend(f.result() for f in done)
+                pending.add(pool.submit(_build_chunk, i, seeds[i], sizes[i], out_dir, options))
+            results.extend(f.result() for f in pending)
+    results.sort(key=lambda r: r[0])
+
+    class_counts = np.sum([r[2] for r in results], axis=0)
+    manifest = {
+        "n_waveforms": n_waveforms,
+        "chunks": [os.path.basename(r[1]) for r in results],
+        "labels": LABELS,
+        "class_counts": {name: int(class_counts[label]) for name, label in LABELS.items()},
+        "feature_columns": list(feature_extractor.DETECTOR_FEATURES),
+        "seed": seed,
+        "elapsed_s": time.perf_counter() - start,
+        **options["generator"],
+    }
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def iter_chunks(out_dir, fields=("features", "labels")):
+    """Yields one dict of arrays per chunk, in order, reading only `fields`."""
+    with open(os.path.join(out_dir, "manifest.json")) as f:
+        manifest = json.load(f)
+    for name in manifest["chunks"]:
+        with np.load(os.path.join(out_dir, name)) as chunk:
+            yield {field: chunk[field] for field in fields}
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a labelled waveform corpus")
+    parser.add_argument("--out", required=True, help="output directory")
+    parser.add_argument("--n", type=int, default=100000, help="number of waveforms")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--features-only", action="store_true", help="do not store raw waveforms")
+    args = parser.parse_args()
+
+    manifest = build_dataset(args.out, args.n, args.chunk_size, args.workers, args.seed,
+                             store_waveforms=not args.features_only)
+    rate = manifest["n_waveforms"] / manifest["elapsed_s"]
+    print(f"{manifest['n_waveforms']} waveforms in {len(manifest['chunks'])} chunks, "
+          f"{manifest['elapsed_s']:.1f} s ({rate:,.0f} waveforms/sec)")
+    print(json.dumps(manifest["class_counts"]))
+
+if __name__ == "__main__":
+    main()
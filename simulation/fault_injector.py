@@ -4,11 +4,9 @@ Description: Implementation for fault_injector
 """
 
 import numpy as np
-import sys
-import os
+from collections import OrderedDict
+import threading
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from utils import config
 
 def inject_sag(waveform, depth=0.5, start_ratio=0.3, end_ratio=0.7):
@@ -45,11 +43,12 @@ def inject_harmonics(t, waveform, harmonics_dict):
     """
     fundamental_amp = config.VOLTAGE_RMS * np.sqrt(2)
     faulty_wave = waveform.copy()
-    
-    for order, ratio in harmonics_dict.items():
-        harmonic_freq = config.FREQUENCY * order
-        harmonic_wave = (fundamental_amp * ratio) * np.sin(2 * np.pi * harmonic_freq * t)
-        faulty_wave += harmonic_wave
+    if not harmonics_dict:
+        return faulty_wave
+
+    basis = harmonic_basis(t, config.FREQUENCY, tuple(harmonics_dict))
+    for row, ratio in zip(basis, harmonics_dict.values()):
+        faulty_wave += faulty_wave.dtype.type(fundamental_amp * ratio) * row
         
     return faulty_wave
 
@@ -59,4 +58,151 @@ def inject_noise(waveform, noise_level=0.01):
     """
     peak = config.VOLTAGE_RMS * np.sqrt(2)
     noise = np.random.normal(0, peak * noise_level, len(waveform))
-    return waveform + noise
+    return np.add(waveform, noise, dtype=np.result_type(waveform, np.float32))
+
+# Rows per block when a batch operation needs scratch space
+BLOCK_ROWS = 256
+
+_basis_cache = OrderedDict()
+_basis_lock = threading.Lock()
+
+def harmonic_basis(t, frequency, orders, kind="sin"):
+    """
+    Cached sin(2*pi*order*frequency*t) table (cos for kind="cos"), shape
+    (len(orders), len(t)).
+    t is assumed to be a uniform time base, identified by its length, end
+    points and dtype (the table has t's dtype). The returned array is shared
+    and read-only.
+    """
+    key = (len(t), float(t[0]), float(t[-1]), t.dtype.str, frequency, tuple(orders), kind)
+    with _basis_lock:
+        basis = _basis_cache.get(key)
+        if basis is not None:
+            _basis_cache.move_to_end(key)
+            return basis
+
+    harmonic_freqs = frequency * np.asarray(orders, dtype=float)
+    trig = np.cos if kind == "cos" else np.sin
+    basis = trig((2 * np.pi * harmonic_freqs)[:, np.newaxis] * t).astype(t.dtype, copy=False)
+    basis.setflags(write=False)
+    with _basis_lock:
+        _basis_cache[key] = basis
+        while len(_basis_cache) > config.HARMONIC_BASIS_CACHE_SIZE:
+            _basis_cache.popitem(last=False)
+    return basis
+
+def _prepare_out(waveforms, out):
+    """Returns the buffer a batch operation writes into, holding a copy of waveforms."""
+    if out is None:
+        return waveforms.copy()
+    if out is not waveforms:
+        np.copyto(out, waveforms)
+    return out
+
+def _rows(array):
+    """(..., n_samples) array as a (rows, n_samples) view; leading axes are flattened."""
+    rows = array.reshape(-1, array.shape[-1])
+    if not np.may_share_memory(rows, array):
+        raise ValueError("batch fault injection needs a contiguous array")
+    return rows
+
+def _per_row(values, leading_shape, dtype=float):
+    """Broadcasts a scalar or per-row parameter over the leading axes, flattened."""
+    return np.broadcast_to(np.asarray(values, dtype=dtype), leading_shape).reshape(-1)
+
+def _apply_envelope(waveforms, gains, start_ratios, end_ratios, out):
+    out = _prepare_out(waveforms, out)
+    rows = _rows(out)
+    n_samples = rows.shape[1]
+    gains = _per_row(gains, out.shape[:-1], out.dtype)
+    start_idx = (n_samples * _per_row(start_ratios, out.shape[:-1])).astype(int)
+    end_idx = (n_samples * _per_row(end_ratios, out.shape[:-1])).astype(int)
+
+    idx = np.arange(n_samples)
+    in_event = (idx >= start_idx[:, np.newaxis]) & (idx < end_idx[:, np.newaxis])
+    np.multiply(rows, gains[:, np.newaxis], out=rows, where=in_event)
+    return out
+
+def inject_sag_batch(waveforms, depths, start_ratios=0.3, end_ratios=0.7, out=None):
+    """
+    inject_sag for every row of a (batch, n_samples) array, or of a
+    (3, n_samples) / (batch, 3, n_samples) three-phase array.
+    depths, start_ratios, end_ratios: scalars or arrays broadcastable to the
+    leading axes, e.g. (batch, 3) for per-phase sags
+    out: buffer to write into; pass waveforms itself to work in place
+    """
+    return _apply_envelope(waveforms, depths, start_ratios, end_ratios, out)
+
+def inject_swell_batch(waveforms, magnitudes, start_ratios=0.3, end_ratios=0.7, out=None):
+    """
+    inject_swell for every row of a (..., n_samples) array.
+    magnitudes, start_ratios, end_ratios: scalars or arrays broadcastable to
+    the leading axes
+    out: buffer to write into; pass waveforms itself to work in place
+    """
+    return _apply_envelope(waveforms, magnitudes, start_ratios, end_ratios, out)
+
+def inject_harmonics_batch(t, waveforms, ratios, orders=(3, 5, 7), out=None, phase_shifts=None,
+                           frequency=config.FREQUENCY):
+    """
+    inject_harmonics for every row of a (..., n_samples) array.
+    ratios: per-row magnitude ratios, shape (..., len(orders)), or (len(orders),)
+    frequency: fundamental the harmonic orders are multiples of
+    phase_shifts: fundamental phase of each row in radians, broadcastable to
+    the leading axes (e.g. the -120/+120 degree shifts of phases B and C), so
+    that harmonic h is shifted by h * phase like a real distorted supply
+    out: buffer to write into; pass waveforms itself to work in place
+    """
+    out = _prepare_out(waveforms, out)
+    rows = _rows(out)
+    fundamental_amp = config.VOLTAGE_RMS * np.sqrt(2)
+    basis = harmonic_basis(t, frequency, orders)
+    coeffs = np.broadcast_to(fundamental_amp * np.asarray(ratios, dtype=out.dtype),
+                             out.shape[:-1] + (len(orders),)).reshape(len(rows), len(orders))
+
+    if phase_shifts is None:
+        for start in range(0, len(rows), BLOCK_ROWS):
+            rows[start:start + BLOCK_ROWS] += coeffs[start:start + BLOCK_ROWS] @ basis
+        return out
+
+    # sin(h*(wt + phi)) = cos(h*phi) sin(h*wt) + sin(h*phi) cos(h*wt)
+    cos_basis = harmonic_basis(t, frequency, orders, kind="cos")
+    shifts = _per_row(phase_shifts, out.shape[:-1])[:, np.newaxis] * np.asarray(orders, dtype=float)
+    sin_coeffs = (coeffs * np.cos(shifts)).astype(out.dtype, copy=False)
+    cos_coeffs = (coeffs * np.sin(shifts)).astype(out.dtype, copy=False)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = slice(start, start + BLOCK_ROWS)
+        rows[block] += sin_coeffs[block] @ basis
+        rows[block] += cos_coeffs[block] @ cos_basis
+    return out
+
+def inject_noise_batch(waveforms, noise_levels, rng=None, out=None):
+    """
+    inject_noise for every row of a (..., n_samples) array.
+    noise_levels: scalar or array broadcastable to the leading axes
+    rng: numpy Generator (default: a fresh one)
+    out: buffer to write into; pass waveforms itself to work in place
+    """
+    rng = rng if rng is not None else np.random.default_rng()
+    peak = config.VOLTAGE_RMS * np.sqrt(2)
+    sigma = (peak * _per_row(noise_levels, waveforms.shape[:-1]))[:, np.newaxis]
+
+    if out is None:
+        out = np.empty_like(waveforms)
+    if out is not waveforms:
+        # Draw straight into the output, then add the signal
+        rng.standard_normal(out=out, dtype=out.dtype)
+        rows = _rows(out)
+        rows *= sigma.astype(out.dtype)
+        out += waveforms
+        return out
+
+    # In place: noise goes through one reusable block of scratch rows
+    rows = _rows(out)
+    scratch = np.empty((min(BLOCK_ROWS, len(rows)), rows.shape[1]), dtype=out.dtype)
+    for start in range(0, len(rows), BLOCK_ROWS):
+        block = scratch[:len(rows[start:start + BLOCK_ROWS])]
+        rng.standard_normal(out=block, dtype=out.dtype)
+        block *= sigma[start:start + BLOCK_ROWS].astype(out.dtype)
+        rows[start:start + BLOCK_ROWS] += block
+    return out
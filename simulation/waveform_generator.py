@@ -4,20 +4,42 @@ Description: Implementation for waveform_generator
 """
 
 import numpy as np
-import sys
-import os
 
-# Add parent directory to path to import utils
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from utils import config
+from utils import config, precision
 
 def generate_sine_wave(frequency=config.FREQUENCY, sampling_rate=config.SAMPLING_RATE, duration=config.DURATION, amplitude=None):
     """
-    Generates a pure sine wave.
+    Generates a pure sine wave (in the config.PRECISION dtype).
     """
     if amplitude is None:
         amplitude = config.VOLTAGE_RMS * np.sqrt(2) # Peak voltage
-    
-    t = np.linspace(0, duration, int(sampling_rate * duration), endpoint=False)
-    waveform = amplitude * np.sin(2 * np.pi * frequency * t)
+
+    dtype = precision.float_dtype()
+    t = np.linspace(0, duration, int(sampling_rate * duration), endpoint=False, dtype=dtype)
+    waveform = dtype.type(amplitude) * np.sin(2 * np.pi * frequency * t)
     return t, waveform
+
+def generate_three_phase(frequency=config.FREQUENCY, sampling_rate=config.SAMPLING_RATE, duration=config.DURATION,
+                         amplitudes=None, angles=config.PHASE_ANGLES):
+    """
+    Generates a three-phase supply in one broadcast expression.
+    amplitudes: per-phase peak voltages, shape (3,) or (batch, 3) (default: nominal)
+    angles: per-phase angles in degrees, shape (3,) or (batch, 3)
+    Returns: t and a (3, n_samples) or (batch, 3, n_samples) array
+    """
+    if amplitudes is None:
+        amplitudes = config.VOLTAGE_RMS * np.sqrt(2)
+
+    dtype = precision.float_dtype()
+    amplitudes = np.asarray(amplitudes, dtype=float)
+    angles = np.deg2rad(np.asarray(angles, dtype=float))
+    shape = np.broadcast_shapes(amplitudes.shape, angles.shape, (3,))
+    if shape[-1] != 3:
+        raise ValueError("amplitudes and angles must have a trailing axis of 3 phases")
+
+    t = np.linspace(0, duration, int(sampling_rate * duration), endpoint=False, dtype=dtype)
+    waveforms = np.empty(shape + (len(t),), dtype=dtype)
+    np.add(dtype.type(2 * np.pi * frequency) * t, angles[..., np.newaxis].astype(dtype), out=waveforms)
+    np.sin(waveforms, out=waveforms)
+    waveforms *= np.broadcast_to(amplitudes, shape)[..., np.newaxis].astype(dtype)
+    return t, waveforms
@@ -7,11 +7,19 @@ import numpy as np
 import sys
 import os
 import shutil
+import pickle
+import tempfile
+import time
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from inference.anomaly_detector import AnomalyDetector
+from inference import model_loader
+from inference.flat_forest import FlatForest
+from inference.online_detector import OnlineDetector
+from inference import predictor_core
+from utils import config
 
 class TestAnomalyDetector(unittest.TestCase):
 
@@ -36,7 +44,171 @@ class TestAnomalyDetector(unittest.TestCase):
         pred = self.detector.predict(anomaly_sample)
         self.assertEqual(pred, -1) # -1 is anomaly
 
+    def test_predict_batch(self):
+        self.detector.train(self.normal_data)
+        X = np.array([[0.1, 0.1], [100.0, 100.0], [0.0, -0.2]])
+        preds = self.detector.predict_batch(X)
+        self.assertEqual(list(preds), [self.detector.predict(row) for row in X])
+        self.assertEqual(preds[1], -1)
+
+    def test_wider_rows_for_narrow_model(self):
+        # A model trained on [rms, thd] ignores the extra detector columns
+        self.detector.train(self.normal_data)
+        X = np.array([[0.1, 0.1], [100.0, 100.0]])
+        wide = np.hstack([X, np.full((2, 5), 1e6)])
+        np.testing.assert_array_equal(self.detector.predict_batch(wide), self.detector.predict_batch(X))
+
+    def test_registry_shares_and_hot_swaps(self):
+        self.detector.train(self.normal_data)
+        other = AnomalyDetector()
+        self.assertIs(other.active_model(), self.detector.model)
+
+        # A retrain from another process shows up after a refresh
+        shifted = AnomalyDetector()
+        shifted.model.fit(self.normal_data + 100.0)
+        stat = os.stat(shifted.model_path)
+        with open(shifted.model_path, 'wb') as f:
+            pickle.dump(shifted.model, f)
+        # Same size and, on coarse-timestamp filesystems, possibly the same
+        # mtime as the first save; step the mtime as a later write would
+        os.utime(shifted.model_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        version = model_loader.registry.stats(shifted.model_path)["version"]
+        model_loader.registry.refresh()
+        stats = model_loader.registry.stats(shifted.model_path)
+        self.assertEqual(stats["version"], version + 1)
+        self.assertGreater(stats["model_bytes"], 0)
+        self.assertEqual(other.predict([100.0, 100.0]), 1)
+
+    def test_lookups_never_load(self):
+        self.detector.train(self.normal_data)
+        registry = model_loader.ModelRegistry(watch_interval=0.05)
+        try:
+            # An unknown path is loaded by the watcher thread, not the caller
+            self.assertIsNone(registry.get(self.detector.model_path))
+            deadline = time.monotonic() + 5.0
+            while registry.get(self.detector.model_path) is None and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertIsNotNone(registry.get(self.detector.model_path))
+            # preload() reads the disk up front
+            self.assertIsNotNone(registry.preload(self.detector.flat_model_path))
+            self.assertEqual(registry.stats(self.detector.flat_model_path)["version"], 1)
+        finally:
+            registry.stop_watcher()
+
+    def test_preload_is_explicit(self):
+        # Building a detector never reads the disk; preload() loads every saved width
+        self.detector.train(self.normal_data)
+        AnomalyDetector().train(np.random.normal(size=(100, 7)))
+        paths = ("data/models/isolation_forest.pkl", "data/models/isolation_forest_7f.pkl")
+        for path in paths:
+            model_loader.registry.invalidate(path)
+        detector = AnomalyDetector()
+        self.assertFalse(any(model_loader.registry.stats(path)["loaded"] for path in paths))
+        detector.preload()
+        self.assertTrue(all(model_loader.registry.stats(path)["loaded"] for path in paths))
+
+    def test_flat_export_matches_sklearn(self):
+        self.detector.train(self.normal_data)
+        self.assertTrue(os.path.exists("data/models/isolation_forest.npz"))
+        flat = FlatForest.load("data/models/isolation_forest.npz")
+
+        X = np.random.normal(scale=3.0, size=(500, 2))
+        np.testing.assert_allclose(flat.score_samples(X), self.detector.model.score_samples(X), atol=1e-12)
+        np.testing.assert_array_equal(flat.predict(X), self.detector.model.predict(X))
+
+    def test_flat_load_then_train(self):
+        self.detector.train(self.normal_data)
+        previous = config.INFERENCE_MODEL_FORMAT
+        config.INFERENCE_MODEL_FORMAT = "flat"
+        try:
+            loaded = AnomalyDetector()
+            loaded.load_model()
+            self.assertIsInstance(loaded.flat_model, FlatForest)
+            self.assertEqual(loaded.predict([100.0, 100.0]), -1)
+            # The flat scorer never replaces the refittable model
+            loaded.train(self.normal_data + 100.0)
+            self.assertIsInstance(loaded.active_model(), FlatForest)
+            self.assertEqual(loaded.predict([100.0, 100.0]), 1)
+        finally:
+            config.INFERENCE_MODEL_FORMAT = previous
+
+    def test_wide_model_kept_apart(self):
+        # The dashboard trains on full DETECTOR_FEATURES rows; [rms, thd] callers keep working
+        self.detector.train(self.normal_data)
+        wide = AnomalyDetector()
+        wide.train(np.random.normal(size=(100, 7)))
+        self.assertTrue(os.path.exists("data/models/isolation_forest_7f.pkl"))
+
+        narrow = AnomalyDetector()
+        self.assertEqual(narrow.predict([0.1, 0.1]), 1)
+        self.assertEqual(narrow.predict([100.0, 100.0]), -1)
+        self.assertEqual(narrow.predict_batch(np.full((1, 7), 100.0))[0], -1)
+        previous = predictor_core.get_detector()
+        predictor_core.set_detector(narrow)
+        try:
+            self.assertNotIn("Anomaly", predictor_core.diagnose(0.1, 0.1))
+        finally:
+            predictor_core.set_detector(previous)
+
+        # A wide model left at the [rms, thd] path (saved before widths were kept apart) is refused clearly
+        with open("data/models/isolation_forest.pkl", "wb") as f:
+            pickle.dump(wide.model, f)
+        model_loader.registry.invalidate("data/models/isolation_forest.pkl")
+        stale = AnomalyDetector()
+        stale.preload()
+        with self.assertRaisesRegex(ValueError, "expects 7 features but rows have 2"):
+            stale.predict([0.1, 0.1])
+
     def tearDown(self):
         # Cleanup model file
-        if os.path.exists("data/models/isolation_forest.pkl"):
-            os.remove("data/models/isolation_forest.pkl") 
+        for path in ("data/models/isolation_forest.pkl", "data/models/isolation_forest.npz",
+                     "data/models/isolation_forest_7f.pkl", "data/models/isolation_forest_7f.npz"):
+            if os.path.exists(path):
+                os.remove(path)
+            model_loader.registry.invalidate(path)
+
+class TestOnlineDetector(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ids = rng.integers(0, 20, 4000)
+        # Each meter has its own envelope: a per-meter RMS level
+        level = 220.0 + self.ids
+        self.X = np.column_stack([rng.normal(level, 1.0), rng.normal(0.02, 0.003, 4000), rng.normal(0, 1, 4000)])
+
+    def test_batched_updates_match_full_statistics(self):
+        detector = OnlineDetector(3, capacity=4) # forces the arrays to grow
+        for start in range(0, len(self.X), 300):
+            detector.update(self.ids[start:start + 300], self.X[start:start + 300])
+        self.assertEqual(len(detector), 20)
+        for meter in (0, 7, 19):
+            rows = self.X[self.ids == meter]
+            np.testing.assert_allclose(detector.mean[detector.meter_ids.index(meter)], rows.mean(axis=0))
+            np.testing.assert_allclose(detector.covariance(meter), np.cov(rows.T), rtol=1e-9, atol=1e-12)
+
+    def test_scores_against_own_meter(self):
+        detector = OnlineDetector(3)
+        detector.update(self.ids, self.X)
+        # 230 V is normal for meter 10 but far outside meter 0's envelope
+        row = [230.0, 0.02, 0.0]
+        np.testing.assert_array_equal(detector.predict([10, 0], [row, row]), [1, -1])
+        # Unknown meters and meters still warming up are not scored
+        detector.update(["new"] * 5, self.X[:5])
+        np.testing.assert_array_equal(detector.score(["unknown", "new"], [row, row]), [0.0, 0.0])
+
+        # observe() does not learn the outlier into meter 0's baseline
+        count = detector.count[detector.meter_ids.index(0)]
+        self.assertEqual(list(detector.observe([0], [row])), [-1])
+        self.assertEqual(detector.count[detector.meter_ids.index(0)], count)
+
+    def test_snapshot_roundtrip(self):
+        detector = OnlineDetector(3, max_count=100)
+        detector.update([f"m{i}" for i in self.ids], self.X)
+        np.testing.assert_array_equal(detector.count[:len(detector)], 100) # capped
+        with tempfile.TemporaryDirectory() as tmp:
+            path = detector.snapshot(os.path.join(tmp, "online.npz"))
+            restored = OnlineDetector.load(path)
+        self.assertEqual(restored.meter_ids, detector.meter_ids)
+        self.assertEqual(restored.max_count, 100)
+        ids = [f"m{i}" for i in self.ids[:50]]
+        np.testing.assert_allclose(restored.score(ids, self.X[:50]), detector.score(ids, self.X[:50]))
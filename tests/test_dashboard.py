@@ -0,0 +1,97 @@
+"""
+Module: test_dashboard.py
+Description: Tests for the Streamlit-free dashboard pipeline and live worker
+"""
+import unittest
+import numpy as np
+import time
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dashboard import pipeline, live_worker, visualizations
+from inference import signatures
+from utils import config
+
+class TestDashboard(unittest.TestCase):
+
+    def test_run_cycle(self):
+        t, wave, f_f, f_m, rms, thd, diag = pipeline.run_cycle(50, "Sag", 0.5, 1.5, {}, 0.0)
+        self.assertEqual(len(t), len(wave))
+        self.assertLess(rms, config.VOLTAGE_RMS)
+        self.assertIn("Sag", diag)
+
+        *_, diag = pipeline.run_cycle(50, "None", 0.5, 1.5, {}, 0.0)
+        self.assertEqual(diag, signatures.get_status_messages()["NORMAL"])
+
+    def test_seeded_cycle_cache(self):
+        pipeline.clear_cache()
+        harmonics = {3: 0.1, 5: 0.05}
+        first = pipeline.run_cycle(55, "Harmonics", 0.5, 1.5, harmonics, 0.02, seed=7)
+        # Unrelated sag/swell settings and dict order do not change the key
+        again = pipeline.run_cycle(55, "Harmonics", 0.3, 1.9, {5: 0.05, 3: 0.1}, 0.02, seed=7)
+        self.assertIs(again[1], first[1])
+        self.assertIs(again[3], first[3])
+        self.assertFalse(first[1].flags.writeable)
+        self.assertGreaterEqual(pipeline.cache_stats()["hits"], 1)
+
+        other = pipeline.run_cycle(55, "Harmonics", 0.5, 1.5, harmonics, 0.02, seed=8)
+        self.assertFalse(np.array_equal(other[1], first[1]))
+        pipeline.clear_cache()
+        recomputed = pipeline.run_cycle(55, "Harmonics", 0.5, 1.5, harmonics, 0.02, seed=7)
+        np.testing.assert_array_equal(recomputed[1], first[1])
+
+        # Live mode (jitter) is never served from the cache
+        live = pipeline.run_cycle(55, "Harmonics", 0.5, 1.5, harmonics, 0.02, jitter=True, seed=7)
+        self.assertFalse(np.array_equal(live[1], first[1]))
+
+        for seed in range(config.CYCLE_CACHE_SIZE * 2):
+            pipeline.run_cycle(50, "None", 0.5, 1.5, {}, 0.01, seed=seed)
+        self.assertLessEqual(pipeline.cache_stats()["size"], config.CYCLE_CACHE_SIZE)
+
+    def test_worker_keeps_latest(self):
+        counter = iter(range(10**6))
+        worker = live_worker.AnalysisWorker(lambda: next(counter), interval=0.0, maxsize=2).start()
+        try:
+            time.sleep(0.2)
+            latest = worker.latest()
+            self.assertIsNotNone(latest)
+            # The queue is bounded, so older results were dropped
+            self.assertGreater(worker.dropped, 0)
+            self.assertGreaterEqual(latest["result"], worker.dropped)
+            self.assertEqual(latest["seq"], latest["result"] + 1)
+
+            worker.set_cycle(lambda: "swapped")
+            time.sleep(0.05)
+            self.assertEqual(worker.latest()["result"], "swapped")
+        finally:
+            worker.stop()
+
+    def test_worker_idle_timeout(self):
+        worker = live_worker.AnalysisWorker(lambda: None, interval=0.01, idle_timeout=0.05).start()
+        time.sleep(0.3)
+        self.assertFalse(worker.is_alive())
+
+    def test_decimation_budget(self):
+        fs = 100000
+        t = np.arange(fs) / fs
+        wave = 325 * np.sin(2 * np.pi * 50 * t)
+        wave[12345] = 900.0 # transient spike
+        x, y = visualizations.decimate_minmax(t, wave, max_points=1000)
+        self.assertLessEqual(len(x), 1000)
+        self.assertEqual(y.max(), 900.0)
+        self.assertAlmostEqual(y.min(), wave.min())
+        self.assertTrue(np.all(np.diff(x) >= 0))
+
+        freqs = np.arange(fs // 2, dtype=float)
+        mags = np.zeros(fs // 2)
+        mags[[50, 150, 250]] = [325.0, 32.5, 16.0]
+        f, m = visualizations.aggregate_spectrum(freqs, mags, max_bins=500)
+        self.assertLessEqual(len(f), 500)
+        self.assertEqual(sorted(m)[-3:], [16.0, 32.5, 325.0])
+
+        fig = visualizations.plot_time_domain(t, wave)
+        self.assertEqual(fig.data[0].type, "scattergl")
+        self.assertLessEqual(len(fig.data[0].x), 2000)
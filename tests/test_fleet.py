@@ -0,0 +1,162 @@
+"""
+Module: test_fleet.py
+Description: Tests for the multi-meter fleet service
+"""
+import unittest
+import numpy as np
+import sys
+import os
+import tempfile
+import json
+from concurrent.futures import Future
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fleet.service import FleetService, analyze_batch, run_spool
+from fleet.replay import replay_capture
+from simulation import waveform_generator, fault_injector
+from inference import signatures
+from inference.online_detector import OnlineDetector
+from inference.event_recorder import EventRecorder
+from processing import feature_extractor
+from utils import config, io, precision
+from utils.event_store import EventStore, EventWriter
+
+class TestFleetService(unittest.TestCase):
+
+    def setUp(self):
+        t, wave = waveform_generator.generate_sine_wave()
+        self.normal = wave
+        self.sag = fault_injector.inject_sag(wave, depth=0.3, start_ratio=0.0, end_ratio=1.0)
+
+    def run_service(self, n_workers):
+        service = FleetService(n_workers=n_workers, batch_size=4, max_pending=1)
+        try:
+            for round_ in range(3):
+                for meter in range(5):
+                    wave = self.sag if meter == 2 else self.normal
+                    service.submit(f"meter-{meter}", wave, timestamp=float(round_))
+            service.drain()
+        finally:
+            service.close()
+        return service
+
+    def test_inline_and_pool_agree(self):
+        inline = self.run_service(n_workers=0)
+        pooled = self.run_service(n_workers=1)
+        for service in (inline, pooled):
+            stats = service.stats()
+            self.assertEqual(stats["windows"], 15)
+            self.assertEqual(stats["batches"], 4) # 15 windows in batches of 4
+            self.assertEqual(stats["meters"], 5)
+            self.assertEqual(service.latest["meter-2"][1] & signatures.STATUS_SAG, signatures.STATUS_SAG)
+            self.assertEqual(service.latest["meter-0"][1], signatures.STATUS_NORMAL)
+            self.assertEqual(service.latest["meter-0"][0], 2.0)
+        # max_pending=1 forces the pooled service to wait on its worker
+        self.assertGreater(pooled.stats()["backpressure_waits"], 0)
+
+    def test_completes_in_submit_order(self):
+        completed = []
+        service = FleetService(n_workers=0, on_result=lambda ids, ts, result: completed.append(ts[0]))
+        result = analyze_batch(np.stack([self.normal]), config.FREQUENCY, config.SAMPLING_RATE)
+        older, newer = Future(), Future()
+        service._pending[older] = (["meter-0"], np.array([1.0]), np.array([0.0]), None)
+        service._pending[newer] = (["meter-0"], np.array([2.0]), np.array([0.0]), None)
+
+        # The newer batch finishing first waits for the older one
+        newer.set_result(dict(result))
+        service._collect(block=False)
+        self.assertEqual(completed, [])
+        older.set_result(dict(result))
+        service._collect(block=False)
+        self.assertEqual(completed, [1.0, 2.0])
+        self.assertEqual(service.latest["meter-0"][0], 2.0)
+
+        # A late, older window does not replace the latest diagnosis
+        service.submit("meter-0", self.sag, timestamp=0.5)
+        service.drain()
+        self.assertEqual(service.latest["meter-0"][0], 2.0)
+        self.assertEqual(service.latest["meter-0"][1], signatures.STATUS_NORMAL)
+
+    def test_run_spool_skips_bad_files(self):
+        with tempfile.TemporaryDirectory() as spool:
+            np.savez(os.path.join(spool, "a.npz"), meter_ids=np.array(["m1", "m2"]),
+                     waveforms=np.stack([self.normal, self.sag]), timestamps=np.array([1.0, 1.0]))
+            with open(os.path.join(spool, "b.npz"), "wb") as f:
+                f.write(b"not an npz")
+            np.savez(os.path.join(spool, "c.npz"), meter_ids=np.array(["m3"]))
+            np.savez(os.path.join(spool, "d.npz"), meter_ids=np.array(["m3"]), waveforms=self.normal[np.newaxis, :500])
+
+            service = FleetService(n_workers=0, batch_size=8)
+            try:
+                stats = run_spool(spool, service, once=True)
+            finally:
+                service.close()
+            self.assertEqual(stats["windows"], 3)
+            self.assertEqual(sorted(os.listdir(spool)), ["b.npz.bad", "c.npz.bad", "results.jsonl"])
+            with open(os.path.join(spool, "results.jsonl")) as f:
+                rows = {row["meter_id"]: row for row in map(json.loads, f)}
+        self.assertEqual(rows["m2"]["status"] & signatures.STATUS_SAG, signatures.STATUS_SAG)
+        self.assertEqual(rows["m3"]["status"], signatures.STATUS_NORMAL)
+
+    def test_synchronous_short_windows(self):
+        # 200 ms windows on a 47.3 Hz supply: the fixed 50 Hz plan leaks the
+        # fundamental into THD, the synchronous mode does not
+        t = np.arange(200) / config.SAMPLING_RATE
+        clean = 325.0 * np.sin(2 * np.pi * 47.3 * t)
+        distorted = clean + 0.08 * 325.0 * np.sin(2 * np.pi * 3 * 47.3 * t)
+        waves = np.stack([clean, distorted])
+        fixed = analyze_batch(waves, config.FREQUENCY, config.SAMPLING_RATE)
+        self.assertEqual(fixed["codes"][0] & signatures.STATUS_HARMONIC, signatures.STATUS_HARMONIC)
+        # Only RMS and THD differ; peak and the DWT columns come from the raw window
+        synced = analyze_batch(waves, config.FREQUENCY, config.SAMPLING_RATE, synchronous=True)
+        np.testing.assert_allclose(synced["features"][:, 2:], fixed["features"][:, 2:])
+
+        service = FleetService(n_workers=0, synchronous=True)
+        try:
+            service.submit_many(["clean", "distorted"], waves, [0.0, 0.0])
+            service.drain()
+        finally:
+            service.close()
+        self.assertEqual(service.latest["clean"][1], signatures.STATUS_NORMAL)
+        self.assertEqual(service.latest["distorted"][1], signatures.STATUS_HARMONIC)
+        self.assertAlmostEqual(service.latest["distorted"][3], 0.08, delta=2e-3)
+
+    def test_online_baselines(self):
+        rng = np.random.default_rng(0)
+        online = OnlineDetector(len(feature_extractor.DETECTOR_FEATURES), min_samples=20)
+        service = FleetService(n_workers=0, batch_size=16, online=online)
+        try:
+            for round_ in range(30):
+                for meter in range(2):
+                    service.submit(f"meter-{meter}", self.normal + rng.normal(0, 1.0, len(self.normal)))
+            service.drain()
+            self.assertEqual(len(online), 2)
+            # A 5% dip stays above the sag threshold but leaves the meter's envelope
+            service.submit("meter-0", 0.95 * self.normal + rng.normal(0, 1.0, len(self.normal)))
+            service.drain()
+        finally:
+            service.close()
+        self.assertEqual(service.latest["meter-0"][1], signatures.STATUS_ANOMALY)
+        self.assertEqual(service.latest["meter-1"][1], signatures.STATUS_NORMAL)
+
+    def test_replay_capture(self):
+        waves = np.stack([self.normal, self.sag, self.normal])
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "replay.cap")
+            with io.CaptureWriter(path, config.SAMPLING_RATE, scale=config.ADC_VOLTS_PER_COUNT, start_time=0.0) as writer:
+                writer.append(precision.volts_to_adc(waves.ravel()))
+            events_path = os.path.join(tmp, "events.evt")
+            with EventWriter(events_path, len(feature_extractor.DETECTOR_FEATURES)) as events:
+                recorder = EventRecorder(events)
+                results = list(replay_capture(path, batch=2, recorder=recorder))
+                recorder.flush()
+            store = EventStore(events_path)
+            self.assertEqual(store.rows(store.query(status=signatures.STATUS_SAG))[0]["time"], 1.0)
+            self.assertEqual(store.meter_of(0), "replay.cap")
+
+        codes = np.concatenate([r["codes"] for r in results])
+        np.testing.assert_array_equal(codes, analyze_batch(waves, config.FREQUENCY, config.SAMPLING_RATE)["codes"])
+        self.assertEqual(codes[1], signatures.STATUS_SAG)
+        np.testing.assert_allclose(np.concatenate([r["timestamps"] for r in results]), [0.0, 1.0, 2.0])
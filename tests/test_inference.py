@@ -3,13 +3,19 @@ Module: test_inference.py
 Description: Tests for predictor logic
 """
 import unittest
+import numpy as np
+import subprocess
 import sys
+import tempfile
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from inference import predictor_core, signatures
+from inference.anomaly_detector import AnomalyDetector
+from inference.event_recorder import EventRecorder
+from utils.event_store import EventStore, EventWriter
 from utils import config
 
 class TestInference(unittest.TestCase):
@@ -34,3 +40,96 @@ class TestInference(unittest.TestCase):
         self.assertIn("Sag", status)
         self.assertIn("Harmonic", status)
         self.assertIn("|", status)
+
+    def test_diagnose_batch_matches_single(self):
+        rows = [
+            [config.VOLTAGE_RMS, 0.01],
+            [config.VOLTAGE_RMS * 0.8, 0.01],
+            [config.VOLTAGE_RMS * 1.2, 0.01],
+            [config.VOLTAGE_RMS, 0.10],
+            [config.VOLTAGE_RMS * 0.8, 0.10],
+        ]
+        codes = predictor_core.diagnose_batch(np.array(rows))
+        self.assertEqual(codes.dtype, np.uint8)
+        self.assertEqual(list(codes[:3]), [signatures.STATUS_NORMAL, signatures.STATUS_SAG, signatures.STATUS_SWELL])
+        self.assertEqual(codes[4], signatures.STATUS_SAG | signatures.STATUS_HARMONIC)
+
+        rendered = predictor_core.diagnose_batch(np.array(rows), render=True)
+        self.assertEqual(rendered, [predictor_core.diagnose(rms, thd) for rms, thd in rows])
+
+    def test_diagnose_three_phase(self):
+        nominal = config.VOLTAGE_RMS
+        rows = np.array([
+            [[nominal, 0.01], [nominal, 0.01], [nominal, 0.01]],
+            [[nominal, 0.01], [nominal * 0.8, 0.01], [nominal, 0.01]],
+            [[nominal, 0.10], [nominal, 0.10], [nominal, 0.10]],
+            [[nominal, 0.01], [nominal, 0.01], [nominal, 0.01]],
+        ])
+        unbalance = np.array([0.0, 0.03, 0.0, 0.05])
+        codes, phase_codes = predictor_core.diagnose_three_phase(rows, unbalance)
+        self.assertEqual(phase_codes.shape, (4, 3))
+        self.assertEqual(list(phase_codes[1]), [signatures.STATUS_NORMAL, signatures.STATUS_SAG, signatures.STATUS_NORMAL])
+        self.assertEqual(list(codes), [signatures.STATUS_NORMAL, signatures.STATUS_SAG | signatures.STATUS_UNBALANCE,
+                                       signatures.STATUS_HARMONIC, signatures.STATUS_UNBALANCE])
+
+        rendered, _ = predictor_core.diagnose_three_phase(rows, unbalance, render=True)
+        self.assertEqual(rendered[0], signatures.get_status_messages()["NORMAL"])
+        self.assertEqual(rendered[1], "WARNING: Voltage Sag Detected (B) | WARNING: Voltage Unbalance Detected")
+        self.assertEqual(rendered[2], signatures.get_status_messages()["HARMONIC"])
+
+    def test_imports_are_lazy(self):
+        # Cold imports of the processing and inference paths, and a first
+        # diagnose with no saved model, load none of the heavy dependencies
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys; sys.path.insert(0, %r)\n"
+                "from processing import feature_extractor\n"
+                "from inference import predictor_core\n"
+                "predictor_core.diagnose(230.0, 0.01)\n"
+                "print(sorted(m for m in ('scipy', 'sklearn', 'streamlit', 'plotly') if m in sys.modules))" % root)
+        with tempfile.TemporaryDirectory() as tmp:
+            out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                                 check=True, cwd=tmp).stdout
+        self.assertEqual(out.strip(), "[]")
+
+    def test_detector_is_replaced_with_set_detector(self):
+        original = predictor_core.get_detector()
+        self.assertIs(predictor_core.detector, original)
+        replacement = AnomalyDetector(model_path="data/models/unused.pkl")
+        predictor_core.set_detector(replacement)
+        try:
+            self.assertIs(predictor_core.detector, replacement)
+            self.assertIs(predictor_core.get_detector(), replacement)
+            # Plain assignment is the same module global diagnose_batch reads
+            predictor_core.detector = original
+            self.assertIs(predictor_core.get_detector(), original)
+        finally:
+            predictor_core.set_detector(original)
+
+    def test_event_recorder(self):
+        fs = 100
+        windows = np.arange(8 * fs, dtype=float).reshape(8, fs) # 1 s windows of a ramp
+        codes = [0, 0, signatures.STATUS_SAG, signatures.STATUS_SAG, 0, signatures.STATUS_SAG | signatures.STATUS_HARMONIC, 0, 0]
+        features = np.arange(16, dtype=float).reshape(8, 2)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "events.evt")
+            with EventWriter(path, 2, sampling_rate=fs, dtype=np.float32) as writer:
+                recorder = EventRecorder(writer, sampling_rate=fs, pre_trigger=0.5, post_trigger=0.3)
+                opened = recorder.process_batch(["a"] * 8, 100.0 + np.arange(8), windows, codes, features)
+                # Meter b: a gap before its fault leaves no pre-trigger, and the
+                # pending event is written by flush()
+                recorder.process("b", 0.0, windows[0], 0, features[0])
+                recorder.process("b", 50.0, windows[1], signatures.STATUS_SWELL, features[1])
+                recorder.flush()
+            store = EventStore(path)
+
+            # A fault persisting over two windows is one event
+            self.assertEqual(opened, 2)
+            self.assertEqual(len(store), 3)
+            np.testing.assert_array_equal(store.query(meters=["a"]), [0, 1])
+            first = store.rows([0])[0]
+            self.assertEqual((first["time"], first["status"], first["pre_trigger_s"]), (102.0, signatures.STATUS_SAG, 0.5))
+            np.testing.assert_array_equal(first["features"], features[2])
+            # 0.5 s before the trigger window, the window, then 0.3 s after it
+            np.testing.assert_array_equal(store.segment(0), np.arange(150, 330))
+            self.assertEqual(store.rows([1])[0]["status"], signatures.STATUS_SAG | signatures.STATUS_HARMONIC)
+            np.testing.assert_array_equal(store.segment(2), windows[1])
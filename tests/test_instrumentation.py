@@ -0,0 +1,58 @@
+"""
+Module: test_instrumentation.py
+Description: Tests for per-stage instrumentation
+"""
+import unittest
+import threading
+import numpy as np
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import logger
+from processing import fft_core
+
+class TestInstrumentation(unittest.TestCase):
+
+    def setUp(self):
+        self.was_enabled = logger.is_enabled()
+        logger.metrics.reset()
+
+    def test_disabled_records_nothing(self):
+        logger.enable(False)
+        fft_core.compute_fft(np.ones(1000))
+        self.assertNotIn("processing.compute_fft", logger.metrics.snapshot())
+
+    def test_records_across_threads(self):
+        logger.enable(True)
+        wave = np.sin(np.linspace(0, 100, 1000))
+
+        def work():
+            for _ in range(5):
+                fft_core.compute_fft(wave)
+                with logger.stage_timer("test.block"):
+                    pass
+
+        threads = [threading.Thread(target=work) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        snapshot = logger.metrics.snapshot()
+        stats = snapshot["processing.compute_fft"]
+        self.assertEqual(stats["count"], 20)
+        self.assertEqual(sum(stats["buckets"]), 20)
+        self.assertEqual(stats["bytes"], 20 * 500 * 16) # frequencies + magnitudes, float64
+        self.assertEqual(snapshot["test.block"]["count"], 20)
+        self.assertLessEqual(stats["p50_ms"], stats["max_ms"])
+
+        text = logger.metrics.to_prometheus()
+        self.assertIn('smart_meter_stage_seconds_count{stage="processing.compute_fft"} 20', text)
+        self.assertIn('smart_meter_stage_seconds_bucket{stage="processing.compute_fft",le="+Inf"} 20', text)
+
+    def tearDown(self):
+        logger.enable(self.was_enabled)
+        logger.metrics.reset()
@@ -0,0 +1,181 @@
+"""
+Module: test_io.py
+Description: Tests for dataset loading and caching
+"""
+import unittest
+import numpy as np
+import pandas as pd
+import sys
+import os
+import tempfile
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import config, io
+from utils.event_store import EventStore, EventWriter
+
+class TestDatasetLoader(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+        self.frame = pd.read_csv(io.DATASET_PATH)
+
+    def test_cache_roundtrip(self):
+        ds = io.load_dataset(cache_dir=self.cache_dir)
+        self.assertEqual(len(ds), len(self.frame))
+        np.testing.assert_allclose(ds["THD"], self.frame["THD"])
+        np.testing.assert_array_equal(ds.decode("Fault_Type"), self.frame["Fault_Type"])
+
+        # Second load memory-maps the cache
+        ds = io.load_dataset(cache_dir=self.cache_dir)
+        self.assertIsInstance(ds["RMS_Voltage"], np.memmap)
+
+    def test_index_slicing(self):
+        ds = io.load_dataset(cache_dir=self.cache_dir)
+        sag = ds.rows(Fault_Type="Sag")
+        np.testing.assert_array_equal(np.sort(sag), np.flatnonzero(self.frame["Fault_Type"] == "Sag"))
+
+        rows = ds.rows(Fault_Type="Normal", Phase="B")
+        expected = np.flatnonzero((self.frame["Fault_Type"] == "Normal") & (self.frame["Phase"] == "B"))
+        np.testing.assert_array_equal(rows, expected)
+        self.assertEqual(len(ds.rows(Label=99)), 0)
+
+        X = ds.select(["RMS_Voltage", "THD"], Label=0)
+        self.assertEqual(X.shape, (len(ds.rows(Label=0)), 2))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+class TestCapture(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "meter.cap")
+        self.chunks = [np.arange(i * 100, (i + 1) * 100, dtype=np.int16) for i in range(5)]
+
+    def write(self, **kwargs):
+        # 300 contiguous samples from t=1000, then a 60 s gap before the last 200
+        with io.CaptureWriter(self.path, sampling_rate=100, start_time=1000.0, scale=0.015, **kwargs) as writer:
+            for i, chunk in enumerate(self.chunks):
+                writer.append(chunk, timestamp=1000.0 + i if i < 3 else 1063.0 + (i - 3))
+
+    def test_roundtrip_and_seek(self):
+        self.write(index_stride=128)
+        capture = io.Capture(self.path)
+        self.assertEqual(len(capture), 500)
+        self.assertEqual(capture.scale, 0.015)
+        self.assertIsInstance(capture.samples, np.memmap)
+        np.testing.assert_array_equal(capture.samples[:, 0], np.concatenate(self.chunks))
+
+        self.assertEqual(capture.seek(1000.0), 0)
+        self.assertEqual(capture.seek(1002.5), 250)
+        self.assertEqual(capture.seek(1030.0), 300)   # inside the gap -> next segment
+        self.assertEqual(capture.seek(1064.0), 400)
+        self.assertAlmostEqual(capture.time_at(450), 1064.5)
+        self.assertAlmostEqual(capture.time_at(200), 1002.0)   # from a stride entry
+        self.assertEqual(capture.seek(2000.0), 500)
+
+    def test_zero_copy_windows(self):
+        self.write()
+        capture = io.Capture(self.path)
+        blocks = list(capture.windows(100, start=1001.0, batch=3))
+        self.assertEqual([len(w) for _, w in blocks], [3, 1])
+        times, windows = blocks[0]
+        np.testing.assert_allclose(times, [1001.0, 1002.0, 1063.0])
+        np.testing.assert_array_equal(windows[2], self.chunks[3])
+        self.assertTrue(np.shares_memory(windows, capture.samples))
+
+    def test_append_to_existing(self):
+        self.write()
+        with io.CaptureWriter(self.path, sampling_rate=100, append=True) as writer:
+            writer.append(np.zeros(50, dtype=np.int16))
+        capture = io.Capture(self.path)
+        self.assertEqual(len(capture), 550)
+        self.assertAlmostEqual(capture.time_at(525), 1065.25)
+        with self.assertRaises(ValueError):
+            io.Capture(io.DATASET_PATH)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+class TestEventStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "events", "events.evt")
+        rng = np.random.default_rng(0)
+        self.n = 1000
+        self.meters = [f"m{i % 7}" for i in range(self.n)]
+        self.times = 1000.0 + np.arange(self.n)
+        self.statuses = np.array([1, 2, 4, 8, 5])[np.arange(self.n) % 5]
+        self.features = rng.normal(size=(self.n, 3))
+        self.segments = [np.sin(np.arange(20 + i % 3)) * 300 for i in range(self.n)]
+
+    def write(self):
+        with EventWriter(self.path, 3, sampling_rate=100) as writer:
+            # One event on its own, the rest in bulk
+            self.assertEqual(writer.append(self.meters[0], self.times[0], self.segments[0], self.statuses[0],
+                                           self.features[0], trigger=5), 0)
+            ids = writer.append_batch(self.meters[1:], self.times[1:], self.segments[1:], self.statuses[1:],
+                                      self.features[1:])
+            self.assertEqual(ids[-1], self.n - 1)
+
+    def test_roundtrip_and_queries(self):
+        self.write()
+        store = EventStore(self.path)
+        self.assertEqual(len(store), self.n)
+        self.assertTrue(store.ordered)
+        self.assertIsInstance(store.records, np.memmap)
+        np.testing.assert_allclose(store.segment(7), self.segments[7], atol=config.ADC_VOLTS_PER_COUNT / 2 + 1e-9)
+        row = store.rows([0])[0]
+        self.assertEqual((row["meter"], row["status"], row["pre_trigger_s"]), ("m0", 1, 0.05))
+        np.testing.assert_allclose(row["features"], self.features[0], rtol=1e-6)
+
+        meters = np.array(self.meters)
+        expected = np.flatnonzero((self.times >= 1100) & (self.times < 1300) & (meters == "m3")
+                                  & ((self.statuses & 4) != 0))
+        np.testing.assert_array_equal(store.query(start=1100, end=1300, meters=["m3"], status=4), expected)
+        self.assertEqual(store.count(status=8), np.sum(self.statuses == 8))
+        self.assertEqual(store.count(meters=["unknown"]), 0)
+        # Pages are slices of the same result
+        np.testing.assert_array_equal(store.query(status=1, offset=10, limit=5),
+                                      np.flatnonzero(self.statuses & 1)[10:15])
+
+    def test_swell_segments_are_not_clipped(self):
+        # A 2.0x swell (650 V peak) is past +/-491 V at 0.015 V/count; its segment gets a coarser scale
+        t = np.arange(1000) / 1000.0
+        nominal = 325.0 * np.sin(2 * np.pi * 50 * t)
+        swell = 2.0 * nominal
+        with EventWriter(self.path, 3, sampling_rate=1000, scale=0.015) as writer:
+            writer.append_batch(["a", "b"], [1.0, 2.0], [nominal, swell], [0, 2], np.zeros((2, 3)))
+        store = EventStore(self.path)
+        np.testing.assert_allclose(store.segment(0), nominal, atol=0.015 / 2 + 1e-9)
+        restored = store.segment(1)
+        np.testing.assert_allclose(restored, swell, atol=650.0 / 32767 / 2 + 1e-9)
+        self.assertAlmostEqual(np.sqrt(np.mean(restored ** 2)), np.sqrt(np.mean(swell ** 2)), delta=0.01)
+
+    def test_append_out_of_order_and_torn_record(self):
+        self.write()
+        with EventWriter(self.path, 3) as writer:
+            writer.append("late", 500.0, self.segments[0], 2, self.features[0])
+        with open(self.path + ".idx", "ab") as f:
+            f.write(b"torn")
+        store = EventStore(self.path)
+        self.assertEqual(len(store), self.n + 1)
+        self.assertFalse(store.ordered) # time ranges now scan instead of bisect
+        np.testing.assert_array_equal(store.query(end=1000.5), [0, self.n])
+        self.assertEqual(store.meter_of(self.n), "late")
+
+        # Reopening drops the torn bytes before appending
+        with EventWriter(self.path, 3) as writer:
+            self.assertEqual(writer.append("m0", 3000.0, self.segments[1], 1, self.features[1]), self.n + 1)
+        store.refresh()
+        self.assertEqual(len(store), self.n + 2)
+        np.testing.assert_allclose(store.segment(self.n + 1), self.segments[1], atol=config.ADC_VOLTS_PER_COUNT)
+        with self.assertRaises(ValueError):
+            EventWriter(self.path, 4)
+
+    def tearDown(self):
+        self.tmp.cleanup()
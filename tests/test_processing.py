@@ -11,8 +11,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from simulation import waveform_generator, fault_injector
-from processing import feature_extractor, fft_core
-from utils import config
+from processing import feature_extractor, fft_core, preprocessing, three_phase, wavelet
+from processing.streaming import StreamingAnalyzer
+from utils import config, precision
 
 class TestProcessing(unittest.TestCase):
 
@@ -32,3 +33,280 @@ class TestProcessing(unittest.TestCase):
         peak_idx = np.argmax(mags)
         peak_freq = freqs[peak_idx]
         self.assertAlmostEqual(peak_freq, 50, delta=1.0)
+
+    def test_batch_matches_single(self):
+        t, wave = waveform_generator.generate_sine_wave(frequency=50)
+        waves = [
+            wave,
+            fault_injector.inject_sag(wave, depth=0.5),
+            fault_injector.inject_harmonics(t, wave, {3: 0.1, 5: 0.05}),
+            fault_injector.inject_noise(wave, noise_level=0.05),
+        ]
+        batch = feature_extractor.extract_features_batch(waves, fundamental_freq=50)
+
+        for i, w in enumerate(waves):
+            freqs, mags = fft_core.compute_fft(w)
+            np.testing.assert_allclose(batch["frequencies"], freqs)
+            np.testing.assert_allclose(batch["magnitudes"][i], mags, atol=1e-9)
+            self.assertAlmostEqual(batch["rms"][i], feature_extractor.calculate_rms(w))
+            self.assertAlmostEqual(batch["peak"][i], feature_extractor.calculate_peak(w))
+            self.assertAlmostEqual(batch["thd"][i], feature_extractor.calculate_thd(w, 50))
+
+    def test_fused_features(self):
+        t, wave = waveform_generator.generate_sine_wave(frequency=50)
+        wave = fault_injector.inject_harmonics(t, wave, {3: 0.1, 5: 0.05}) + 2.0
+        features = feature_extractor.extract_features(wave, fundamental_freq=50, max_order=7)
+
+        freqs, mags = fft_core.compute_fft(wave)
+        np.testing.assert_allclose(features["magnitudes"], mags, atol=1e-9)
+        self.assertAlmostEqual(features["rms"], np.sqrt(np.mean(wave**2)))
+        self.assertAlmostEqual(features["peak"], np.max(np.abs(wave)))
+        self.assertAlmostEqual(features["crest_factor"], features["peak"] / features["rms"])
+        self.assertAlmostEqual(features["thd"], feature_extractor.calculate_thd(wave, 50))
+        self.assertAlmostEqual(features["dc_offset"], 2.0)
+        np.testing.assert_array_equal(features["harmonic_orders"], np.arange(1, 8))
+        np.testing.assert_allclose(features["harmonic_magnitudes"][[0, 2, 4]],
+                                   config.VOLTAGE_RMS * np.sqrt(2) * np.array([1, 0.1, 0.05]), rtol=1e-6)
+        # sin() has phase -pi/2 relative to the cosine basis of the FFT
+        self.assertAlmostEqual(features["harmonic_phases"][0], -np.pi / 2, places=6)
+
+    def test_sparse_thd_matches_fft(self):
+        t, wave = waveform_generator.generate_sine_wave(frequency=50)
+        waves = np.stack([fault_injector.inject_harmonics(t, wave, {3: r, 5: r / 2, 7: r / 4})
+                          for r in (0.0, 0.02, 0.1, 0.3)])
+        batch = feature_extractor.extract_features_batch(waves, fundamental_freq=50)
+        sparse = feature_extractor.sparse_thd_batch(waves, fundamental_freq=50)
+        np.testing.assert_allclose(sparse["thd"], batch["thd"], atol=1e-9)
+        self.assertAlmostEqual(feature_extractor.calculate_thd(waves[2], 50, method="sparse"), batch["thd"][2])
+        with self.assertRaises(ValueError):
+            feature_extractor.calculate_thd(waves[0], 50, method="wavelet")
+
+    def test_sparse_projection_long_windows(self):
+        # Windows longer than one table block are summed block by block
+        n = 3 * config.SPARSE_PROJECTION_BLOCK + 123
+        t = np.arange(n) / n
+        wave = 325.0 * (np.sin(2 * np.pi * 50 * t) + 0.1 * np.sin(2 * np.pi * 150 * t) + 0.05 * np.cos(2 * np.pi * 350 * t))
+        fft_thd = feature_extractor.calculate_thd(wave, 50, sampling_rate=n)
+        self.assertAlmostEqual(feature_extractor.calculate_thd(wave, 50, sampling_rate=n, method="sparse"), fft_thd, places=9)
+        self.assertAlmostEqual(feature_extractor.calculate_thd(wave.astype(np.float32), 50, sampling_rate=n, method="sparse"),
+                               fft_thd, places=5)
+
+        projection = fft_core.get_projection(n, n, 50)
+        self.assertEqual(projection.matrix.shape[0], config.SPARSE_PROJECTION_BLOCK)
+        self.assertIs(fft_core.get_projection(n, n, 50, dtype=np.float32).matrix.dtype, np.dtype(np.float32))
+        for f0 in np.arange(45.0, 55.0, 0.05):
+            fft_core.get_projection(n, n, f0)
+        self.assertLessEqual(sum(p.nbytes for p in fft_core._projection_cache.values()), config.SPARSE_PROJECTION_CACHE_BYTES)
+
+    def test_frequency_tracking(self):
+        expected = np.hypot(0.1, 0.05)
+        rng = np.random.default_rng(0)
+        waves = []
+        for f0 in (42.5, 57.3, 66.0):
+            t, wave = waveform_generator.generate_sine_wave(frequency=f0)
+            for order, ratio in ((3, 0.1), (5, 0.05)):
+                wave = wave + ratio * config.VOLTAGE_RMS * np.sqrt(2) * np.sin(2 * np.pi * order * f0 * t)
+            waves.append(wave + rng.normal(0, 0.005 * config.VOLTAGE_RMS * np.sqrt(2), len(wave)))
+        freqs = preprocessing.estimate_frequency(np.stack(waves))
+        np.testing.assert_allclose(freqs, [42.5, 57.3, 66.0], atol=0.05)
+
+        tracked = feature_extractor.sparse_thd_batch(waves, track_frequency=True)
+        np.testing.assert_allclose(tracked["thd"], expected, atol=2e-3)
+        # A fixed 50 Hz projection cannot see the off-nominal harmonics. At
+        # 42.5 Hz its error happens to land near the true THD (0.08-0.11 over
+        # noise draws), so only the 57.3 and 66 Hz rows are checked; they
+        # miss by more than 0.1 for every draw
+        fixed = feature_extractor.sparse_thd_batch(waves)
+        self.assertTrue(np.all(np.abs(fixed["thd"][1:] - expected) > 0.05))
+
+    def test_synchronous_short_windows(self):
+        expected = np.hypot(0.05, 0.03)
+        freqs = (42.5, 47.3, 57.3, 66.0)
+        t = np.arange(300) / config.SAMPLING_RATE
+        waves = np.stack([325.0 * (np.sin(2 * np.pi * f0 * t + 0.4) + 0.05 * np.sin(2 * np.pi * 3 * f0 * t)
+                                   + 0.03 * np.sin(2 * np.pi * 5 * f0 * t + 1.0)) for f0 in freqs])
+        waves += np.random.default_rng(0).normal(0, 0.005 * 325.0, waves.shape)
+
+        # Both trackers work on 10-cycle windows
+        short = waves[:, :240]
+        np.testing.assert_allclose(preprocessing.estimate_frequency(short), freqs, atol=0.01)
+        np.testing.assert_allclose(preprocessing.estimate_frequency(short, method="fft"), freqs, atol=0.02)
+
+        synced = preprocessing.resample_cycles(waves, freqs, cycles=10)
+        self.assertEqual(synced.shape, (4, 10 * config.SYNC_SAMPLES_PER_CYCLE))
+        with self.assertRaises(ValueError):
+            preprocessing.resample_cycles(waves[:, :100], freqs, cycles=10)
+
+        features = feature_extractor.synchronous_features(short)
+        np.testing.assert_allclose(features["frequency"], freqs, atol=config.FREQ_TRACK_RESOLUTION)
+        np.testing.assert_allclose(features["thd"], expected, atol=2e-3)
+        np.testing.assert_allclose(features["rms"], 325.0 * np.sqrt((1 + expected ** 2) / 2), rtol=2e-3)
+        np.testing.assert_allclose(np.abs(features["fundamental"]), 325.0, rtol=2e-3)
+        np.testing.assert_allclose(features["harmonic_magnitudes"][:, 2] / 325.0, 0.05, atol=2e-3)
+        for wave, f0, thd in zip(short, freqs, features["thd"]):
+            window = wave[:int(np.ceil(10 * config.SAMPLING_RATE / f0))]
+            self.assertAlmostEqual(feature_extractor.calculate_thd(window, method="synchronous"), thd, delta=2e-3)
+            # The fixed 50 Hz plan leaks the off-nominal fundamental across a 200 ms window
+            self.assertGreater(feature_extractor.calculate_thd(window), 0.5)
+
+        # A single cycle, at the frequency tracked over earlier windows
+        one = feature_extractor.synchronous_features(waves[:, :30], frequencies=freqs, cycles=1)
+        np.testing.assert_allclose(one["thd"], expected, atol=5e-3)
+
+    def test_float32_precision(self):
+        def features():
+            t, wave = waveform_generator.generate_sine_wave(frequency=50)
+            wave = fault_injector.inject_harmonics(t, wave, {3: 0.04, 5: 0.02})
+            wave = fault_injector.inject_sag(wave, depth=0.6)
+            return wave, feature_extractor.extract_features_batch(wave)
+
+        reference_wave, reference = features()
+        original = config.PRECISION
+        config.PRECISION = "float32"
+        try:
+            wave, reduced = features()
+        finally:
+            config.PRECISION = original
+
+        self.assertEqual(wave.dtype, np.float32)
+        self.assertEqual(reduced["magnitudes"].dtype, np.float32)
+        np.testing.assert_allclose(reduced["rms"], reference["rms"], rtol=1e-5)
+        np.testing.assert_allclose(reduced["thd"], reference["thd"], atol=1e-5)
+
+    def test_adc_int16_input(self):
+        t, wave = waveform_generator.generate_sine_wave(frequency=50)
+        wave = fault_injector.inject_harmonics(t, wave, {3: 0.05})
+        raw = precision.volts_to_adc(wave)
+        self.assertEqual(raw.dtype, np.int16)
+
+        volts = feature_extractor.extract_features_batch(np.stack([wave, wave]))
+        counts = feature_extractor.extract_features_batch(np.stack([raw, raw]))
+        # 16-bit quantization: 0.03 V steps on a 325 V peak
+        np.testing.assert_allclose(counts["rms"], volts["rms"], rtol=1e-4)
+        np.testing.assert_allclose(counts["peak"], volts["peak"], atol=config.ADC_VOLTS_PER_COUNT)
+        np.testing.assert_allclose(counts["thd"], volts["thd"], atol=1e-4)
+        np.testing.assert_allclose(precision.adc_to_volts(raw), wave, atol=config.ADC_VOLTS_PER_COUNT)
+        # Full scale leaves headroom for the largest simulated swell (2.0x) plus harmonics
+        swell = 2.0 * wave
+        np.testing.assert_allclose(precision.adc_to_volts(precision.volts_to_adc(swell)), swell,
+                                   atol=config.ADC_VOLTS_PER_COUNT / 2 + 1e-9)
+        self.assertAlmostEqual(feature_extractor.extract_features(raw)["rms"], counts["rms"][0], places=6)
+
+        # The per-window helpers scale counts to volts like the fused extractors
+        self.assertAlmostEqual(feature_extractor.calculate_rms(raw), counts["rms"][0], places=6)
+        self.assertAlmostEqual(feature_extractor.calculate_rms(wave), volts["rms"][0], places=6)
+        self.assertAlmostEqual(feature_extractor.calculate_peak(raw), counts["peak"][0], places=6)
+        self.assertAlmostEqual(feature_extractor.calculate_peak(raw, volts_per_count=1.0), np.abs(raw).max())
+        for method in ("fft", "sparse", "synchronous"):
+            self.assertAlmostEqual(feature_extractor.calculate_thd(raw, method=method),
+                                   feature_extractor.calculate_thd(wave, method=method), delta=1e-4)
+
+    def test_dwt_features(self):
+        rng = np.random.default_rng(0)
+        t, wave = waveform_generator.generate_sine_wave(frequency=50, sampling_rate=1024, duration=1.0)
+        sigma = 10.0
+        waves = np.stack([wave, wave + rng.normal(0, sigma, len(wave)), wave.copy()])
+        waves[2, 500:510] += 200.0   # short transient
+
+        for name in wavelet.WAVELETS:
+            dwt = wavelet.dwt_features(waves, levels=4, wavelet=name)
+            # Orthonormal periodized transform: level energies sum to the signal energy
+            np.testing.assert_allclose(dwt["energy"].sum(axis=1), np.einsum('ij,ij->i', waves, waves), rtol=1e-10)
+            np.testing.assert_allclose(dwt["relative_energy"].sum(axis=1), 100.0)
+
+        dwt = wavelet.dwt_features(waves)
+        self.assertGreater(dwt["relative_energy"][2, 0], 10 * dwt["relative_energy"][0, 0])
+        self.assertGreater(dwt["entropy"][2], dwt["entropy"][0])
+        expected_snr = 10 * np.log10(np.mean(wave ** 2) / sigma ** 2)
+        self.assertAlmostEqual(dwt["snr_db"][1], expected_snr, delta=1.0)
+        self.assertGreater(dwt["snr_db"][0], dwt["snr_db"][1] + 10)
+        self.assertTrue(np.all(np.isfinite(dwt["snr_db"])))
+
+        # Batch rows match single windows, and feed the detector vector
+        single = wavelet.dwt_features(waves[1])
+        np.testing.assert_allclose(single["energy"][0], dwt["energy"][1])
+        batch = feature_extractor.extract_features_batch(waves, 50, 1024, wavelet_features=True)
+        matrix = feature_extractor.detector_matrix(batch)
+        self.assertEqual(matrix.shape, (3, len(feature_extractor.DETECTOR_FEATURES)))
+        one = feature_extractor.extract_features(waves[2], 50, 1024, wavelet_features=True)
+        np.testing.assert_allclose([one[name] for name in feature_extractor.DETECTOR_FEATURES], matrix[2])
+
+    def test_three_phase_analysis(self):
+        peak = config.VOLTAGE_RMS * np.sqrt(2)
+        t, balanced = waveform_generator.generate_three_phase()
+        self.assertEqual(balanced.shape, (3, len(t)))
+        np.testing.assert_allclose(balanced[1], peak * np.sin(2 * np.pi * config.FREQUENCY * t - 2 * np.pi / 3), atol=1e-9)
+
+        # Batch: balanced, phase B at 90%, phase C shifted by 10 degrees, harmonics on every phase
+        t, waves = waveform_generator.generate_three_phase(
+            amplitudes=peak * np.array([[1, 1, 1], [1, 0.9, 1], [1, 1, 1], [1, 1, 1]]),
+            angles=np.array([[0, -120, 120], [0, -120, 120], [0, -120, 130], [0, -120, 120]]))
+        angles = np.deg2rad(config.PHASE_ANGLES)
+        fault_injector.inject_harmonics_batch(t, waves[3], [0.1, 0.05, 0.0], out=waves[3], phase_shifts=angles)
+        single = fault_injector.inject_harmonics(t, balanced[0], {3: 0.1, 5: 0.05, 7: 0.0})
+        np.testing.assert_allclose(waves[3, 0], single, atol=1e-6)
+        # Harmonic h of phase C is shifted by h * 120 degrees
+        wt = 2 * np.pi * config.FREQUENCY * t + angles[2]
+        expected = peak * (np.sin(wt) + 0.1 * np.sin(3 * wt) + 0.05 * np.sin(5 * wt))
+        np.testing.assert_allclose(waves[3, 2], expected, atol=1e-6)
+
+        features = three_phase.analyze_three_phase(waves)
+        self.assertEqual(features["rms"].shape, (4, 3))
+        self.assertEqual(features["magnitudes"].shape[:2], (4, 3))
+        np.testing.assert_allclose(features["rms"][0], config.VOLTAGE_RMS, rtol=1e-9)
+        np.testing.assert_allclose(features["thd"][3], np.hypot(0.1, 0.05), rtol=1e-6)
+        np.testing.assert_allclose(np.abs(features["fundamental"][1]), peak * np.array([1, 0.9, 1]), rtol=1e-9)
+
+        # Reference values for the sequence components of each case
+        expected = three_phase.symmetrical_components(
+            peak * np.array([[1, 1, 1], [1, 0.9, 1], [1, 1, 1]]) * np.exp(1j * np.deg2rad(
+                [[0, -120, 120], [0, -120, 120], [0, -120, 130]])))
+        negative, zero = three_phase.unbalance(expected)
+        np.testing.assert_allclose(features["unbalance"][:3], negative, atol=1e-9)
+        np.testing.assert_allclose(features["zero_sequence"][:3], zero, atol=1e-9)
+        self.assertLess(features["unbalance"][0], 1e-9)
+        self.assertAlmostEqual(features["unbalance"][1], 0.1 / 2.9, places=9)
+        self.assertGreater(features["unbalance"][2], config.UNBALANCE_THRESHOLD)
+        self.assertLess(features["unbalance"][3], 1e-9)
+        np.testing.assert_allclose(np.abs(features["sequence"][0]), [0, peak, 0], atol=1e-9)
+
+        # Per-phase sag on phase A only; int16 input matches volts
+        sagged = fault_injector.inject_sag_batch(balanced, [0.5, 1.0, 1.0])
+        np.testing.assert_array_equal(sagged[1:], balanced[1:])
+        raw = precision.volts_to_adc(sagged, config.ADC_VOLTS_PER_COUNT)
+        from_raw = three_phase.analyze_three_phase(raw)
+        np.testing.assert_allclose(from_raw["rms"], three_phase.analyze_three_phase(sagged)["rms"], rtol=1e-3)
+        with self.assertRaises(ValueError):
+            three_phase.analyze_three_phase(waves[:, :2])
+
+    def test_fft_plan_cache(self):
+        plan = fft_core.get_plan(1000, 1000, 50)
+        self.assertIs(plan, fft_core.get_plan(1000, 1000, 50))
+        self.assertIsNot(plan, fft_core.get_plan(1000, 1000, 60))
+        # Defaulted, keyword and float arguments share the same plan
+        self.assertIs(fft_core.get_plan(1000), fft_core.get_plan(1000, sampling_rate=1000.0, fundamental_freq=50.0))
+        fft_core.compute_fft(np.zeros(1000))
+        self.assertIs(fft_core.get_plan(1000), plan)
+        self.assertEqual(plan.frequencies[plan.fundamental_idx], 50)
+        np.testing.assert_array_equal(plan.frequencies[plan.harmonic_indices[:3]], [50, 100, 150])
+        self.assertFalse(plan.frequencies.flags.writeable)
+
+    def test_streaming_matches_block(self):
+        t, wave = waveform_generator.generate_sine_wave(frequency=50)
+        wave = fault_injector.inject_sag(wave, depth=0.5, start_ratio=0.4, end_ratio=0.5)
+        analyzer = StreamingAnalyzer(frequency=50)
+
+        half_rms, thd = [], []
+        for chunk in np.array_split(wave, [7, 130, 131, 500, 777]):
+            for reading in analyzer.process(chunk):
+                if reading["type"] == "rms":
+                    half_rms.extend(reading["half_cycle_rms"])
+                else:
+                    thd.extend(reading["thd"])
+
+        # 10 samples per half-cycle at 1 kHz / 50 Hz
+        expected = np.sqrt(np.mean(wave.reshape(-1, 10)**2, axis=1))
+        np.testing.assert_allclose(half_rms, expected)
+        self.assertLess(min(half_rms), config.SAG_THRESHOLD)
+        self.assertEqual(len(thd), len(wave) // analyzer.thd_window)
+        self.assertAlmostEqual(thd[0], feature_extractor.calculate_thd(wave[:analyzer.thd_window], 50))
@@ -6,11 +6,12 @@ import unittest
 import numpy as np
 import sys
 import os
+import tempfile
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from simulation import waveform_generator, fault_injector
+from simulation import waveform_generator, fault_injector, dataset_builder
 from processing import feature_extractor
 from utils import config
 
@@ -34,3 +35,64 @@ class TestSimulation(unittest.TestCase):
         rms = feature_extractor.calculate_rms(swelled_wave)
         expected = config.VOLTAGE_RMS * 1.5
         self.assertAlmostEqual(rms, expected, delta=1.0)
+
+    def test_batch_injection_matches_single(self):
+        t, wave = waveform_generator.generate_sine_wave()
+        batch = np.tile(wave, (3, 1))
+        depths = np.array([0.2, 0.5, 0.8])
+        starts = np.array([0.0, 0.25, 0.5])
+        ends = np.array([0.5, 0.75, 1.0])
+
+        sagged = fault_injector.inject_sag_batch(batch, depths, starts, ends)
+        for i in range(3):
+            np.testing.assert_array_equal(sagged[i], fault_injector.inject_sag(wave, depths[i], starts[i], ends[i]))
+
+        ratios = np.array([[0.1, 0.0, 0.0], [0.0, 0.05, 0.02], [0.2, 0.1, 0.05]])
+        out = np.empty_like(batch)
+        result = fault_injector.inject_harmonics_batch(t, batch, ratios, (3, 5, 7), out=out)
+        self.assertIs(result, out)
+        for i in range(3):
+            expected = fault_injector.inject_harmonics(t, wave, dict(zip((3, 5, 7), ratios[i])))
+            np.testing.assert_allclose(out[i], expected, atol=1e-9)
+
+        # In place, with per-row noise levels
+        noisy = batch.copy()
+        fault_injector.inject_noise_batch(noisy, [0.0, 0.01, 0.1], np.random.default_rng(0), out=noisy)
+        np.testing.assert_array_equal(noisy[0], wave)
+        sigma = (noisy - batch).std(axis=1)
+        self.assertAlmostEqual(sigma[2] / sigma[1], 10.0, delta=1.0)
+
+    def test_harmonics_follow_fundamental(self):
+        # 60 Hz supply: harmonic h sits at h * 60 Hz, and for shifted phases too
+        t = np.arange(config.SAMPLING_RATE) / config.SAMPLING_RATE
+        batch = np.zeros((2, len(t)))
+        fault_injector.inject_harmonics_batch(t, batch, [0.1, 0.0, 0.0], out=batch, phase_shifts=[0.0, 0.5],
+                                              frequency=60.0)
+        amp = 0.1 * config.VOLTAGE_RMS * np.sqrt(2)
+        np.testing.assert_allclose(batch[0], amp * np.sin(2 * np.pi * 180.0 * t), atol=1e-9)
+        np.testing.assert_allclose(batch[1], amp * np.sin(3 * (2 * np.pi * 60.0 * t + 0.5)), atol=1e-9)
+
+        block = dataset_builder.generate_block(4, np.random.default_rng(0), fault_classes=("Harmonics",),
+                                               frequency=60.0, noise_range=(0.0, 0.0))
+        thd = feature_extractor.extract_features_batch(block["waveforms"], fundamental_freq=60.0)["thd"]
+        np.testing.assert_allclose(thd, np.linalg.norm(block["harmonic_ratios"], axis=1), rtol=1e-3)
+
+    def test_dataset_builder_reproducible(self):
+        with tempfile.TemporaryDirectory() as serial, tempfile.TemporaryDirectory() as parallel:
+            m1 = dataset_builder.build_dataset(serial, 250, chunk_size=100, n_workers=1, seed=7)
+            m2 = dataset_builder.build_dataset(parallel, 250, chunk_size=100, n_workers=2, seed=7)
+            self.assertEqual(m1["class_counts"], m2["class_counts"])
+            self.assertEqual(sum(m1["class_counts"].values()), 250)
+
+            chunks1 = list(dataset_builder.iter_chunks(serial, fields=("features", "labels", "waveforms")))
+            chunks2 = list(dataset_builder.iter_chunks(parallel, fields=("features", "labels")))
+            self.assertEqual([len(c["labels"]) for c in chunks1], [100, 100, 50])
+            for c1, c2 in zip(chunks1, chunks2):
+                np.testing.assert_array_equal(c1["labels"], c2["labels"])
+                np.testing.assert_array_equal(c1["features"], c2["features"])
+
+            # Stored features match the per-waveform extractors
+            wave = chunks1[0]["waveforms"][0].astype(float)
+            self.assertAlmostEqual(chunks1[0]["features"][0, 0], feature_extractor.calculate_rms(wave), delta=0.01)
+            normal = chunks1[0]["labels"] == dataset_builder.LABELS["Normal"]
+            self.assertTrue(np.all(chunks1[0]["features"][normal, 1] < config.THD_THRESHOLD))
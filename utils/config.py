@@ -10,3 +10,78 @@ VOLTAGE_RMS = 230     # Volts
 SAG_THRESHOLD = 207.0      # (0.9 * 230)
 SWELL_THRESHOLD = 253.0    # (1.1 * 230)
 THD_THRESHOLD = 0.05       # 5%
+UNBALANCE_THRESHOLD = 0.02 # 2% negative/positive sequence ratio (EN 50160)
+
+# Three-Phase Supply
+PHASE_ANGLES = (0.0, -120.0, 120.0) # Degrees, phases A, B, C (positive sequence)
+
+# Numeric Precision
+PRECISION = "float64"             # "float64" or "float32" for generation, injection and FFT
+ADC_VOLTS_PER_COUNT = 0.03        # Volts per int16 ADC count (+/-983 V full scale, ~3x nominal peak, so 2.0x swells fit)
+
+# FFT Engine
+FFT_WORKERS = 1            # scipy.fft worker threads per transform
+FFT_PLAN_CACHE_SIZE = 32   # Distinct (N, sampling rate, fundamental) plans kept
+MAX_HARMONIC_ORDER = 50    # Highest harmonic order tracked by FFT plans
+
+# Wavelet Features
+DWT_WAVELET = "db4"               # "db4" or "haar"
+DWT_LEVELS = 4                    # Decomposition levels (d1 = fs/4..fs/2)
+DWT_PLAN_CACHE_SIZE = 8           # Cached (N, levels, wavelet) filter-bank plans
+
+# Sparse THD & Frequency Tracking
+SPARSE_THD_MAX_ORDER = 40         # Highest harmonic order evaluated by the sparse THD mode
+SPARSE_PROJECTION_BLOCK = 4096    # Samples per cos/sin table block; longer windows are summed block by block
+SPARSE_PROJECTION_CACHE_BYTES = 32 * 2**20 # Memory held by cached sparse projections
+FREQ_TRACK_MIN = 40.0             # Hz, lower bound of the tracked fundamental
+FREQ_TRACK_MAX = 70.0             # Hz, upper bound of the tracked fundamental
+FREQ_TRACK_RESOLUTION = 0.05      # Hz, tracked frequencies are snapped to this grid
+
+# Synchronous Resampling (short analysis windows)
+SYNC_CYCLES = 10                  # Whole cycles per synchronous analysis window (200 ms at 50 Hz)
+SYNC_SAMPLES_PER_CYCLE = 64       # Samples per cycle after resampling; harmonic h lands on bin h * cycles
+SYNC_KERNEL_LOBES = 3             # Half-width of the Lanczos interpolation kernel, in input samples
+# Cached (N, sampling rate, fundamental, cycles) resamplers: one per quantized
+# frequency of the tracking range (~50 KB each for 10-cycle windows)
+SYNC_RESAMPLER_CACHE_SIZE = int(round((FREQ_TRACK_MAX - FREQ_TRACK_MIN) / FREQ_TRACK_RESOLUTION)) + 1
+
+# Model Registry
+MODEL_WATCH_INTERVAL = 2.0 # Seconds between checks for a retrained model on disk (0 disables)
+INFERENCE_MODEL_FORMAT = "pickle" # "pickle" (sklearn) or "flat" (NumPy-only .npz export)
+
+# Online Anomaly Baselines (per meter)
+ONLINE_MIN_SAMPLES = 30           # Windows a meter needs before it is scored
+ONLINE_THRESHOLD = 5.0            # Mahalanobis distance above which a window is anomalous
+ONLINE_MAX_COUNT = 10_000         # Effective window count cap; older windows fade out
+ONLINE_REGULARIZATION = 1e-3      # Minimum std as a fraction of each feature's mean level
+ONLINE_INITIAL_METERS = 1024      # Preallocated meter slots (doubles when full)
+ONLINE_SNAPSHOT_INTERVAL = 60.0   # Seconds between state snapshots (0 disables)
+
+# Event Recording
+EVENT_STORE_PATH = "data/events/events.evt" # Append-only event store (segments + .idx records)
+EVENT_PRE_TRIGGER = 0.5           # Seconds of signal kept before a fault onset
+EVENT_POST_TRIGGER = 0.5          # Seconds of signal kept after the triggering window
+EVENT_PAGE_SIZE = 50              # Events per page in the dashboard event log
+
+# Fault Injection
+HARMONIC_BASIS_CACHE_SIZE = 8 # Cached (time base, frequency, orders) harmonic tables
+
+# Dashboard
+ANALYSIS_INTERVAL = 0.25          # Seconds between background analysis cycles (live mode)
+DASHBOARD_REFRESH_INTERVAL = 0.5  # Seconds between UI redraws (live mode)
+RESULT_QUEUE_SIZE = 4             # Analysis results buffered for the UI
+WORKER_IDLE_TIMEOUT = 30.0        # Stop the worker when the UI stops polling
+PLOT_MAX_POINTS = 2000            # Point budget of the time-domain trace
+SPECTRUM_MAX_BINS = 1000          # Bin budget of the spectrum trace
+SPECTRUM_BAR_LIMIT = 600          # Above this many bins the spectrum is a line
+WEBGL_MIN_POINTS = 1000           # Traces larger than this use Scattergl
+CYCLE_CACHE_SIZE = 32             # Memoized waveforms / seeded cycle results (LRU)
+
+# Fleet Service
+FLEET_BATCH_SIZE = 512            # Windows per worker batch
+FLEET_MAX_PENDING = 8             # In-flight batches before submit() blocks
+FLEET_LATENCY_WINDOW = 1000       # Recent batches kept for latency percentiles
+
+# Logging & Instrumentation
+LOG_LEVEL = "INFO"
+INSTRUMENTATION_ENABLED = False   # Per-stage timing (also SMART_METER_INSTRUMENT=1)
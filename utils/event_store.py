@@ -0,0 +1,342 @@
+"""
+Module: event_store.py
+Description: Append-only binary store of power-quality events (waveform segment + features) with an on-disk index
+"""
+import numpy as np
+import bisect
+import os
+
+from utils import config, precision
+
+# An event store is three files:
+#   <path>         fixed little-endian header, then the raw waveform segments
+#                  back to back (int16 ADC counts or float volts)
+#   <path>.idx     one fixed-size record per event (time, meter, status,
+#                  segment location and the detector features); the event
+#                  count follows from the file size, so a torn trailing
+#                  record is ignored and appends never rewrite anything
+#   <path>.meters  meter IDs, one per line; records refer to them by line
+# Int segments carry their own volts-per-count in their record, chosen from
+# the segment's peak, so a swell beyond the header scale's full range is
+# stored coarser instead of clipped. Version 1 stores (one scale for every
+# segment, from the header) are still read and appended to.
+# Records are appended in arrival order. While event times never go
+# backwards the header's `ordered` flag stays set and time ranges are found
+# by binary search instead of a scan.
+EVENT_MAGIC = b"SMEVENTS"
+EVENT_VERSION = 2
+EVENT_HEADER_SIZE = 64
+EVENT_HEADER = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("n_features", "<u4"),
+    ("sampling_rate", "<f8"),
+    ("scale", "<f8"),          # finest volts per count (1.0 for float segments)
+    ("dtype", "S8"),
+    ("ordered", "u1"),
+])
+
+def event_record(n_features, version=EVENT_VERSION):
+    """Index record layout for a store with n_features detector features."""
+    scale = [("scale", "<f8")] if version >= 2 else [] # volts per count of this segment
+    return np.dtype([
+        ("time", "<f8"),           # trigger time (epoch seconds)
+        ("offset", "<i8"),         # first sample of the segment in the data file
+        ("n_samples", "<u4"),
+        *scale,
+        ("trigger", "<u4"),        # sample of the segment where the trigger window starts
+        ("meter", "<u4"),          # line of <path>.meters
+        ("status", "u1"),          # signatures.STATUS_* flags
+        ("features", "<f4", (n_features,)),
+    ])
+
+def _index_path(path):
+    return path + ".idx"
+
+def _meters_path(path):
+    return path + ".meters"
+
+def _read_meters(path):
+    if not os.path.exists(_meters_path(path)):
+        return []
+    with open(_meters_path(path)) as f:
+        return f.read().splitlines()
+
+def _read_header(path):
+    header = np.fromfile(path, dtype=EVENT_HEADER, count=1)
+    if len(header) == 0 or header[0]["magic"] != EVENT_MAGIC:
+        raise ValueError(f"{path} is not an event store")
+    header = header[0]
+    if header["version"] not in (1, EVENT_VERSION):
+        raise ValueError(f"Unsupported event store version {header['version']} in {path}")
+    return header
+
+class EventWriter:
+    """
+    Appends events to a store, creating it if needed (an existing store is
+    continued). Each event is one write of its segment and one of its record.
+    dtype: segment sample type on disk (int16 ADC counts, float32 volts)
+    scale: finest volts per count for int segments; a segment whose peak
+           exceeds its full scale is stored at peak / 32767 V per count
+    """
+    def __init__(self, path, n_features, sampling_rate=config.SAMPLING_RATE, dtype=np.int16,
+                 scale=config.ADC_VOLTS_PER_COUNT):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        if os.path.exists(path):
+            header = _read_header(path)
+            self.n_features = int(header["n_features"])
+            if self.n_features != n_features:
+                raise ValueError(f"{path} stores {self.n_features} features, not {n_features}")
+            self.sampling_rate = float(header["sampling_rate"])
+            self.scale = float(header["scale"])
+            self.dtype = np.dtype(header["dtype"].decode())
+            self.ordered = bool(header["ordered"])
+            self.version = int(header["version"])
+            self.record = event_record(self.n_features, self.version)
+
+            self._index_file = open(_index_path(path), "r+b" if os.path.exists(_index_path(path)) else "wb")
+            self.n_events = os.path.getsize(_index_path(path)) // self.record.itemsize
+            last = np.fromfile(_index_path(path), dtype=self.record, count=1,
+                               offset=max(self.n_events - 1, 0) * self.record.itemsize) if self.n_events else []
+            self.last_time = float(last[0]["time"]) if len(last) else -np.inf
+            self.n_samples = int(last[0]["offset"] + last[0]["n_samples"]) if len(last) else 0
+            # Drop a torn trailing record, and any segment it never indexed
+            self._index_file.truncate(self.n_events * self.record.itemsize)
+            self._index_file.seek(0, os.SEEK_END)
+            self._file = open(path, "r+b")
+            self._file.truncate(EVENT_HEADER_SIZE + self.n_samples * self.dtype.itemsize)
+            self._file.seek(0, os.SEEK_END)
+        else:
+            self.n_features = int(n_features)
+            self.sampling_rate = float(sampling_rate)
+            self.dtype = np.dtype(dtype).newbyteorder("<")
+            self.scale = float(scale) if self.dtype.kind in "iu" else 1.0
+            self.ordered = True
+            self.version = EVENT_VERSION
+            self.record = event_record(self.n_features)
+            self.n_events = 0
+            self.n_samples = 0
+            self.last_time = -np.inf
+            self._file = open(path, "wb")
+            self._write_header()
+            self._index_file = open(_index_path(path), "wb")
+
+        self.meters = _read_meters(path)
+        self._meter_codes = {meter: code for code, meter in enumerate(self.meters)}
+        self._meters_file = open(_meters_path(path), "a")
+
+    def _write_header(self):
+        header = np.zeros(1, dtype=EVENT_HEADER)
+        header[0] = (EVENT_MAGIC, self.version, self.n_features, self.sampling_rate, self.scale,
+                     self.dtype.str.encode(), self.ordered)
+        self._file.seek(0)
+        self._file.write(header.tobytes().ljust(EVENT_HEADER_SIZE, b"\0"))
+        self._file.seek(0, os.SEEK_END)
+
+    def _meter_code(self, meter_id):
+        meter_id = str(meter_id)
+        code = self._meter_codes.get(meter_id)
+        if code is None:
+            if "\n" in meter_id:
+                raise ValueError("meter IDs cannot contain newlines")
+            code = self._meter_codes[meter_id] = len(self.meters)
+            self.meters.append(meter_id)
+            self._meters_file.write(meter_id + "\n")
+            self._meters_file.flush()
+        return code
+
+    def _scales(self, segments):
+        """Volts per count of each segment: the store's scale unless the segment's peak needs more range."""
+        if self.dtype.kind not in "iu" or self.version < 2:
+            return np.full(len(segments), self.scale)
+        peaks = np.array([np.max(np.abs(segment), initial=0.0) for segment in segments])
+        return np.maximum(self.scale, peaks / np.iinfo(np.int16).max)
+
+    def _encode(self, samples, scales):
+        if self.dtype.kind in "iu":
+            return precision.volts_to_adc(samples, scales).astype(self.dtype, copy=False)
+        return np.asarray(samples, dtype=self.dtype)
+
+    def append(self, meter_id, timestamp, segment, status, features, trigger=0):
+        """
+        Stores one event.
+        segment: waveform around the trigger, in volts
+        trigger: sample of the segment where the triggering window starts
+        Returns: the event's ID (its position in the store)
+        """
+        return self.append_batch([meter_id], [timestamp], [np.asarray(segment)], [status], [features], [trigger])[0]
+
+    def append_batch(self, meter_ids, timestamps, segments, statuses, features, triggers=None):
+        """
+        Stores many events with one write per file.
+        segments: (n, n_samples) array or a list of 1-D segments
+        features: (n, n_features)
+        Returns: (n,) event IDs
+        """
+        n = len(meter_ids)
+        if n == 0:
+            return np.empty(0, dtype=np.int64)
+        segments = [np.ravel(segment) for segment in segments]
+        lengths = np.array([len(segment) for segment in segments], dtype=np.int64)
+        scales = self._scales(segments)
+        data = self._encode(np.concatenate(segments), np.repeat(scales, lengths))
+
+        records = np.zeros(n, dtype=self.record)
+        records["time"] = timestamps
+        records["offset"] = self.n_samples + np.concatenate([[0], np.cumsum(lengths)[:-1]])
+        records["n_samples"] = lengths
+        if self.version >= 2:
+            records["scale"] = scales
+        records["trigger"] = 0 if triggers is None else triggers
+        records["meter"] = [self._meter_code(meter_id) for meter_id in meter_ids]
+        records["status"] = statuses
+        records["features"] = np.asarray(features, dtype=np.float32).reshape(n, self.n_features)
+
+        times = records["time"]
+        if self.ordered and (times[0] < self.last_time or np.any(np.diff(times) < 0)):
+            self.ordered = False
+            self._write_header()
+        self.last_time = max(self.last_time, float(times.max()))
+
+        # Segments first: a record is only written once the samples it points to exist
+        self._file.write(memoryview(np.ascontiguousarray(data)).cast("B"))
+        self._index_file.write(records.tobytes())
+        ids = np.arange(self.n_events, self.n_events + n)
+        self.n_events += n
+        self.n_samples += int(lengths.sum())
+        return ids
+
+    def flush(self):
+        self._file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        self._file.close()
+        self._index_file.close()
+        self._meters_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class EventStore:
+    """
+    Read-only, memory-mapped view of an event store. Queries work on the
+    index records only; a segment is read from the data file when asked for,
+    so paging through millions of events touches just the rows shown.
+    records: (n_events,) np.memmap of event_record(n_features)
+    """
+    def __init__(self, path):
+        self.path = path
+        header = _read_header(path)
+        self.n_features = int(header["n_features"])
+        self.sampling_rate = float(header["sampling_rate"])
+        self.scale = float(header["scale"])
+        self.dtype = np.dtype(header["dtype"].decode())
+        self.ordered = bool(header["ordered"])
+        self.version = int(header["version"])
+        self.record = event_record(self.n_features, self.version)
+        self.refresh()
+
+    def refresh(self):
+        """Picks up events appended since the store was opened."""
+        n_events = 0
+        if os.path.exists(_index_path(self.path)):
+            n_events = os.path.getsize(_index_path(self.path)) // self.record.itemsize
+        if n_events > 0:
+            self.records = np.memmap(_index_path(self.path), dtype=self.record, mode="r", shape=(n_events,))
+        else:
+            self.records = np.empty(0, dtype=self.record)
+        n_samples = (os.path.getsize(self.path) - EVENT_HEADER_SIZE) // self.dtype.itemsize
+        if n_samples > 0:
+            self.samples = np.memmap(self.path, dtype=self.dtype, mode="r", offset=EVENT_HEADER_SIZE,
+                                     shape=(n_samples,))
+        else:
+            self.samples = np.empty(0, dtype=self.dtype)
+        self.meters = _read_meters(self.path)
+        self._meter_codes = {meter: code for code, meter in enumerate(self.meters)}
+        self.ordered = bool(_read_header(self.path)["ordered"])
+
+    def __len__(self):
+        return len(self.records)
+
+    def _time_range(self, start, end):
+        """Slice of records that can fall in [start, end)."""
+        if not self.ordered:
+            return slice(0, len(self.records))
+        # bisect probes ~log2(n) records in place; np.searchsorted would first
+        # gather the strided time column into a contiguous copy
+        times = self.records["time"]
+        first = 0 if start is None else bisect.bisect_left(times, start)
+        last = len(times) if end is None else bisect.bisect_left(times, end)
+        return slice(first, max(first, last))
+
+    def query(self, start=None, end=None, meters=None, status=None, offset=0, limit=None):
+        """
+        IDs of the events matching every given filter, in storage order.
+        start, end: trigger time range [start, end)
+        meters: meter IDs to keep
+        status: STATUS_* flags; an event matches if it has any of them
+        offset, limit: page of the result
+        """
+        window = self._time_range(start, end)
+        records = self.records[window]
+        mask = None
+
+        def both(condition):
+            return condition if mask is None else mask & condition
+
+        if not self.ordered:
+            if start is not None:
+                mask = both(records["time"] >= start)
+            if end is not None:
+                mask = both(records["time"] < end)
+        if meters is not None:
+            codes = [self._meter_codes[str(m)] for m in meters if str(m) in self._meter_codes]
+            mask = both(np.isin(records["meter"], codes))
+        if status is not None:
+            mask = both((records["status"] & status) != 0)
+
+        if mask is None:
+            ids = np.arange(window.start, window.stop)
+        else:
+            ids = window.start + np.flatnonzero(mask)
+        stop = None if limit is None else offset + limit
+        return ids[offset:stop]
+
+    def count(self, **filters):
+        """Number of events matching query() filters."""
+        return len(self.query(**filters))
+
+    def meter_of(self, event_id):
+        return self.meters[int(self.records["meter"][event_id])]
+
+    def segment(self, event_id):
+        """The event's waveform segment in volts."""
+        record = self.records[event_id]
+        samples = self.samples[record["offset"]:record["offset"] + record["n_samples"]]
+        if self.dtype.kind in "iu":
+            return precision.adc_to_volts(samples, record["scale"] if self.version >= 2 else self.scale)
+        return np.asarray(samples, dtype=float)
+
+    def rows(self, event_ids):
+        """
+        Plain-Python rows (dicts) for a page of events: id, time, meter,
+        status, trigger time and features, without the segments.
+        """
+        records = np.asarray(self.records[np.asarray(event_ids, dtype=np.int64)])
+        return [{
+            "id": int(event_id),
+            "time": float(record["time"]),
+            "meter": self.meters[int(record["meter"])],
+            "status": int(record["status"]),
+            "duration_s": float(record["n_samples"] / self.sampling_rate),
+            "pre_trigger_s": float(record["trigger"] / self.sampling_rate),
+            "features": record["features"].astype(float),
+        } for event_id, record in zip(event_ids, records)]
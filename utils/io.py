@@ -1,5 +1,352 @@
 """
 Module: io.py
-Description: Implementation for io
+Description: Columnar, memory-mapped loading of the power quality dataset and raw waveform captures
 """
+import numpy as np
+import json
+import shutil
+import time
+import os
+from numpy.lib.stride_tricks import sliding_window_view
 
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DATASET_PATH = os.path.join(ROOT_DIR, "data", "power_quality_fault_dataset.csv")
+
+CACHE_VERSION = 1
+
+# Explicit dtypes, so the CSV is parsed once without type inference
+DATASET_DTYPES = {
+    "ID": np.int32,
+    "Fault_Type": "category",
+    "Phase": "category",
+    "RMS_Voltage": np.float64,
+    "Peak_Voltage": np.float64,
+    "THD": np.float64,
+    "Duration_ms": np.int32,
+    "DWT_Energy_Level1": np.float64,
+    "DWT_Energy_Level2": np.float64,
+    "DWT_Entropy": np.float64,
+    "Signal_Noise_Ratio_dB": np.float64,
+    "Label": np.int8,
+}
+INDEX_COLUMNS = ("Fault_Type", "Phase", "Label")
+
+class ColumnarDataset:
+    """
+    Column store backed by one memory-mapped .npy file per column.
+    Categorical columns hold integer codes; `categories[name]` maps them back.
+    Every INDEX_COLUMNS column has a precomputed row grouping, so the rows for
+    one value are a slice of a stored permutation.
+    """
+    def __init__(self, cache_dir, manifest):
+        self.cache_dir = cache_dir
+        self.categories = manifest["categories"]
+        self.columns = {name: np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode='r')
+                        for name in manifest["columns"]}
+        self._index_order = {name: np.load(os.path.join(cache_dir, f"index_{name}.npy"), mmap_mode='r')
+                             for name in manifest["index"]}
+        self._index_bounds = manifest["index"]
+
+    def __len__(self):
+        return len(next(iter(self.columns.values())))
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def decode(self, name):
+        """String values of a categorical column."""
+        return np.asarray(self.categories[name])[self.columns[name]]
+
+    def rows(self, **filters):
+        """
+        Row indices matching every filter, e.g. rows(Fault_Type="Sag", Phase="A").
+        A single filter is an O(1) slice of the stored index.
+        """
+        result = None
+        for name, value in filters.items():
+            if name not in self._index_bounds:
+                raise KeyError(f"{name} is not indexed; indexed columns: {list(self._index_bounds)}")
+            bounds = self._index_bounds[name].get(str(value))
+            if bounds is None:
+                return np.empty(0, dtype=np.int64)
+            selected = self._index_order[name][bounds[0]:bounds[1]]
+            result = selected if result is None else np.intersect1d(result, selected, assume_unique=True)
+        return np.arange(len(self)) if result is None else result
+
+    def select(self, columns, **filters):
+        """(n_rows, len(columns)) float matrix, e.g. for AnomalyDetector.train."""
+        rows = self.rows(**filters)
+        return np.column_stack([np.asarray(self.columns[name][rows], dtype=float) for name in columns])
+
+def load_dataset(csv_path=DATASET_PATH, cache_dir=None, refresh=False):
+    """
+    Loads a dataset CSV as a ColumnarDataset. The first call parses the CSV
+    and writes a column cache; later calls memory-map the cache unless the
+    CSV's size or mtime changed (or refresh=True).
+    cache_dir: defaults to data/.cache/<csv name> next to the CSV
+    """
+    if cache_dir is None:
+        name = os.path.splitext(os.path.basename(csv_path))[0]
+        cache_dir = os.path.join(os.path.dirname(os.path.abspath(csv_path)), ".cache", name)
+
+    stat = os.stat(csv_path)
+    source = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    manifest_path = os.path.join(cache_dir, "manifest.json")
+    if not refresh and os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("version") == CACHE_VERSION and manifest.get("source") == source:
+            return ColumnarDataset(cache_dir, manifest)
+
+    _build_cache(csv_path, cache_dir, source)
+    with open(manifest_path) as f:
+        return ColumnarDataset(cache_dir, json.load(f))
+
+def _build_cache(csv_path, cache_dir, source):
+    # pandas is only needed for the one-time parse
+    import pandas as pd
+
+    frame = pd.read_csv(csv_path, dtype=DATASET_DTYPES)
+    tmp_dir = cache_dir + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {"version": CACHE_VERSION, "source": source, "columns": [], "categories": {}, "index": {}}
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            manifest["categories"][name] = [str(c) for c in column.cat.categories]
+            values = column.cat.codes.to_numpy()
+        else:
+            values = column.to_numpy()
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), values)
+        manifest["columns"].append(name)
+
+        if name in INDEX_COLUMNS:
+            order = np.argsort(values, kind="stable")
+            uniques, starts = np.unique(values[order], return_index=True)
+            stops = np.append(starts[1:], len(values))
+            labels = manifest["categories"].get(name)
+            manifest["index"][name] = {
+                (labels[u] if labels else str(u)): [int(a), int(b)] for u, a, b in zip(uniques, starts, stops)
+            }
+            np.save(os.path.join(tmp_dir, f"index_{name}.npy"), order)
+
+    with open(os.path.join(tmp_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+
+    shutil.rmtree(cache_dir, ignore_errors=True)
+    os.makedirs(os.path.dirname(cache_dir), exist_ok=True)
+    os.replace(tmp_dir, cache_dir)
+
+# Raw waveform captures: a fixed little-endian header followed by the sample
+# body as contiguous (n_frames, n_channels) frames. The frame count follows
+# from the file size, so appending never rewrites the header and a torn
+# trailing frame is simply ignored. A sidecar "<path>.idx" holds a sparse
+# (sample, timestamp) index: one entry per CAPTURE_INDEX_STRIDE samples and
+# one wherever the writer saw a timestamp discontinuity.
+CAPTURE_MAGIC = b"SMCAPTUR"
+CAPTURE_VERSION = 1
+CAPTURE_HEADER_SIZE = 64
+CAPTURE_HEADER = np.dtype([
+    ("magic", "S8"),
+    ("version", "<u4"),
+    ("n_channels", "<u4"),
+    ("sampling_rate", "<f8"),
+    ("start_time", "<f8"),
+    ("scale", "<f8"),          # volts per count (1.0 for float captures)
+    ("dtype", "S8"),
+    ("index_stride", "<u8"),
+])
+CAPTURE_INDEX = np.dtype([("sample", "<i8"), ("time", "<f8")])
+CAPTURE_INDEX_STRIDE = 1 << 16
+
+def _index_path(path):
+    return path + ".idx"
+
+class CaptureWriter:
+    """
+    Appends sample chunks to a capture file, e.g. from a live acquisition loop.
+    Each append is one write of the chunk's bytes; the header is written once.
+    dtype: sample type on disk (int16 ADC counts, float32 or float64 volts)
+    scale: volts per count stored in the header (int captures)
+    append: continue an existing capture instead of starting a new one
+    """
+    def __init__(self, path, sampling_rate, n_channels=1, dtype=np.int16, start_time=None, scale=1.0,
+                 index_stride=CAPTURE_INDEX_STRIDE, append=False):
+        self.path = path
+        if append and os.path.exists(path):
+            capture = Capture(path)
+            self.sampling_rate = capture.sampling_rate
+            self.n_channels = capture.n_channels
+            self.dtype = capture.dtype
+            self.scale = capture.scale
+            self.start_time = capture.start_time
+            self.index_stride = capture.index_stride
+            self.n_frames = len(capture)
+            self._segment = (int(capture.index_samples[-1]), float(capture.index_times[-1]))
+            del capture
+            # Drop a torn trailing frame before appending
+            self._file = open(path, "r+b")
+            self._file.truncate(CAPTURE_HEADER_SIZE + self.n_frames * self.dtype.itemsize * self.n_channels)
+            self._file.seek(0, os.SEEK_END)
+            self._index_file = open(_index_path(path), "r+b" if os.path.exists(_index_path(path)) else "wb")
+            self._index_file.seek(0, os.SEEK_END)
+            return
+
+        self.sampling_rate = float(sampling_rate)
+        self.n_channels = int(n_channels)
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.scale = float(scale)
+        self.start_time = time.time() if start_time is None else float(start_time)
+        self.index_stride = int(index_stride)
+        self.n_frames = 0
+        self._segment = (0, self.start_time)
+
+        self._file = open(path, "wb")
+        self._index_file = open(_index_path(path), "wb")
+        self._write_header()
+        self._write_index(0, self.start_time)
+
+    def _write_header(self):
+        header = np.zeros(1, dtype=CAPTURE_HEADER)
+        header[0] = (CAPTURE_MAGIC, CAPTURE_VERSION, self.n_channels, self.sampling_rate, self.start_time,
+                     self.scale, self.dtype.str.encode(), self.index_stride)
+        self._file.seek(0)
+        self._file.write(header.tobytes().ljust(CAPTURE_HEADER_SIZE, b"\0"))
+
+    def _write_index(self, sample, timestamp):
+        self._index_file.write(np.array([(sample, timestamp)], dtype=CAPTURE_INDEX).tobytes())
+
+    def time_at(self, sample):
+        """Timestamp of a sample in the segment currently being written."""
+        segment_sample, segment_time = self._segment
+        return segment_time + (sample - segment_sample) / self.sampling_rate
+
+    def append(self, samples, timestamp=None):
+        """
+        Appends a chunk of samples: (n,) for one channel or (n, n_channels).
+        timestamp: time of the chunk's first sample; if it is more than half a
+                   sample away from where the capture ends, a gap is recorded
+        """
+        samples = np.asarray(samples).astype(self.dtype, casting="same_kind", copy=False)
+        samples = np.ascontiguousarray(samples.reshape(-1, self.n_channels))
+        n = len(samples)
+        if n == 0:
+            return
+
+        if timestamp is not None and abs(timestamp - self.time_at(self.n_frames)) > 0.5 / self.sampling_rate:
+            if self.n_frames == 0:
+                # First chunk: its timestamp is the capture's start time
+                self.start_time = float(timestamp)
+                self._write_header()
+                self._file.seek(0, os.SEEK_END)
+                self._index_file.seek(0)
+                self._index_file.truncate()
+            self._segment = (self.n_frames, float(timestamp))
+            self._write_index(*self._segment)
+
+        first = -(-self.n_frames // self.index_stride) * self.index_stride
+        if first == self._segment[0]:
+            first += self.index_stride
+        for sample in range(first, self.n_frames + n, self.index_stride):
+            self._write_index(sample, self.time_at(sample))
+
+        self._file.write(memoryview(samples).cast("B"))
+        self.n_frames += n
+
+    def flush(self):
+        self._file.flush()
+        self._index_file.flush()
+
+    def close(self):
+        self._file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class Capture:
+    """
+    Read-only, memory-mapped view of a capture file; nothing is loaded into
+    RAM up front, so multi-GB captures open instantly.
+    samples: (n_frames, n_channels) np.memmap in the on-disk dtype
+    """
+    def __init__(self, path):
+        self.path = path
+        header = np.fromfile(path, dtype=CAPTURE_HEADER, count=1)
+        if len(header) == 0 or header[0]["magic"] != CAPTURE_MAGIC:
+            raise ValueError(f"{path} is not a capture file")
+        header = header[0]
+        if header["version"] != CAPTURE_VERSION:
+            raise ValueError(f"Unsupported capture version {header['version']} in {path}")
+
+        self.n_channels = int(header["n_channels"])
+        self.sampling_rate = float(header["sampling_rate"])
+        self.start_time = float(header["start_time"])
+        self.scale = float(header["scale"])
+        self.dtype = np.dtype(header["dtype"].decode())
+        self.index_stride = int(header["index_stride"])
+
+        frame_bytes = self.dtype.itemsize * self.n_channels
+        n_frames = (os.path.getsize(path) - CAPTURE_HEADER_SIZE) // frame_bytes
+        if n_frames > 0:
+            self.samples = np.memmap(path, dtype=self.dtype, mode="r", offset=CAPTURE_HEADER_SIZE,
+                                     shape=(n_frames, self.n_channels))
+        else:
+            self.samples = np.empty((0, self.n_channels), dtype=self.dtype)
+
+        index = np.empty(0, dtype=CAPTURE_INDEX)
+        if os.path.exists(_index_path(path)):
+            index = np.fromfile(_index_path(path), dtype=CAPTURE_INDEX)
+        index = index[index["sample"] < max(n_frames, 1)]
+        if len(index) == 0 or index["sample"][0] != 0:
+            index = np.concatenate([np.array([(0, self.start_time)], dtype=CAPTURE_INDEX), index])
+        self.index_samples = np.ascontiguousarray(index["sample"])
+        self.index_times = np.ascontiguousarray(index["time"])
+
+    def __len__(self):
+        return len(self.samples)
+
+    @property
+    def duration(self):
+        """Seconds of signal (excluding gaps)."""
+        return len(self) / self.sampling_rate
+
+    def time_at(self, sample):
+        """Timestamp of sample index (or array of indices)."""
+        k = np.searchsorted(self.index_samples, sample, side="right") - 1
+        return self.index_times[k] + (np.asarray(sample) - self.index_samples[k]) / self.sampling_rate
+
+    def seek(self, timestamp):
+        """
+        Index of the first sample at or after `timestamp`, via the sparse
+        index (timestamps inside a gap resolve to the next segment's start).
+        """
+        k = max(int(np.searchsorted(self.index_times, timestamp, side="right")) - 1, 0)
+        offset = max(0.0, (timestamp - self.index_times[k]) * self.sampling_rate)
+        sample = self.index_samples[k] + int(np.ceil(offset - 1e-6))
+        if k + 1 < len(self.index_samples):
+            sample = min(sample, self.index_samples[k + 1])
+        return int(min(sample, len(self)))
+
+    def windows(self, window_size, step=None, start=None, end=None, batch=1, channel=0):
+        """
+        Yields (timestamps, windows) with windows a zero-copy (k, window_size)
+        view into the memory map, k <= batch; ready for extract_features_batch.
+        start, end: optional timestamps bounding the replay
+        """
+        step = window_size if step is None else step
+        first = 0 if start is None else self.seek(start)
+        last = len(self) if end is None else self.seek(end)
+        if last - first < window_size:
+            return
+
+        views = sliding_window_view(self.samples[first:last, channel], window_size)[::step]
+        for i in range(0, len(views), batch):
+            block = views[i:i + batch]
+            starts = first + (i + np.arange(len(block))) * step
+            yield self.time_at(starts), block
@@ -0,0 +1,37 @@
+"""
+Module: lazy.py
+Description: Deferred imports of heavy optional dependencies (scipy, sklearn, streamlit, plotly)
+"""
+import importlib
+import threading
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+    `go = LazyModule("plotly.graph_objects")` then behaves like
+    `import plotly.graph_objects as go`, minus the import-time cost for code
+    paths that never touch it.
+    """
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        """Imports (once) and returns the real module."""
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    @property
+    def loaded(self):
+        return self._module is not None
+
+    def __getattr__(self, attr):
+        return getattr(self.load(), attr)
+
+    def __repr__(self):
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<LazyModule {self._name!r} ({state})>"
@@ -1,5 +1,191 @@
 """
 Module: logger.py
-Description: Implementation for logger
+Description: Logging setup and lightweight per-stage instrumentation
 """
+import functools
+import json
+import logging
+import threading
+import time
+import os
 
+from utils import config
+
+# Upper bounds (seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (1e-5, 5e-5, 1e-4, 5e-4, 1e-3, 5e-3, 1e-2, 5e-2, 1e-1, 5e-1, 1.0, 5.0)
+
+# Layout of one stage's stats list: count, total seconds, max seconds, bytes, then bucket counts
+_COUNT, _TOTAL, _MAX, _BYTES, _BUCKETS = range(5)
+
+def get_logger(name):
+    """Module logger with one shared stderr handler at config.LOG_LEVEL."""
+    root = logging.getLogger("smart_meter")
+    if not root.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+        root.addHandler(handler)
+        root.setLevel(config.LOG_LEVEL)
+    return root.getChild(name)
+
+class MetricsRegistry:
+    """
+    Per-stage call counts, latency histograms and output sizes. Each thread
+    records into its own shard, so the hot path takes no lock; shards are
+    only merged when a snapshot is taken.
+    """
+    def __init__(self):
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def _shard(self):
+        shard = getattr(self._local, "shard", None)
+        if shard is None:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+        return shard
+
+    def record(self, stage, seconds, nbytes=0):
+        shard = self._shard()
+        stats = shard.get(stage)
+        if stats is None:
+            stats = shard[stage] = [0, 0.0, 0.0, 0] + [0] * (len(LATENCY_BUCKETS) + 1)
+        stats[_COUNT] += 1
+        stats[_TOTAL] += seconds
+        if seconds > stats[_MAX]:
+            stats[_MAX] = seconds
+        stats[_BYTES] += nbytes
+        bucket = 0
+        while bucket < len(LATENCY_BUCKETS) and seconds > LATENCY_BUCKETS[bucket]:
+            bucket += 1
+        stats[_BUCKETS + bucket] += 1
+
+    def reset(self):
+        with self._lock:
+            for shard in self._shards:
+                shard.clear()
+
+    def snapshot(self):
+        """
+        Merged view: {stage: {'count', 'total_s', 'mean_ms', 'max_ms',
+        'p50_ms', 'p99_ms', 'bytes', 'buckets'}}. Percentiles are the upper
+        bound of the histogram bucket they fall in.
+        """
+        merged = {}
+        with self._lock:
+            shards = list(self._shards)
+        for shard in shards:
+            for stage, stats in list(shard.items()):
+                total = merged.setdefault(stage, [0, 0.0, 0.0, 0] + [0] * (len(LATENCY_BUCKETS) + 1))
+                for i, value in enumerate(list(stats)):
+                    total[i] = max(total[i], value) if i == _MAX else total[i] + value
+
+        result = {}
+        for stage, stats in sorted(merged.items()):
+            count = stats[_COUNT]
+            buckets = stats[_BUCKETS:]
+            result[stage] = {
+                "count": count,
+                "total_s": stats[_TOTAL],
+                "mean_ms": stats[_TOTAL] / count * 1000 if count else 0.0,
+                "max_ms": stats[_MAX] * 1000,
+                "p50_ms": _bucket_quantile(buckets, 0.50, stats[_MAX]) * 1000,
+                "p99_ms": _bucket_quantile(buckets, 0.99, stats[_MAX]) * 1000,
+                "bytes": stats[_BYTES],
+                "buckets": buckets,
+            }
+        return result
+
+    def to_json(self):
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self, prefix="smart_meter"):
+        """Prometheus text exposition of the current snapshot."""
+        lines = [
+            f"# HELP {prefix}_stage_seconds Latency of instrumented pipeline stages",
+            f"# TYPE {prefix}_stage_seconds histogram",
+        ]
+        snapshot = self.snapshot()
+        for stage, stats in snapshot.items():
+            cumulative = 0
+            for bound, count in zip(LATENCY_BUCKETS + (float("inf"),), stats["buckets"]):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f'{prefix}_stage_seconds_bucket{{stage="{stage}",le="{le}"}} {cumulative}')
+            lines.append(f'{prefix}_stage_seconds_sum{{stage="{stage}"}} {stats["total_s"]!r}')
+            lines.append(f'{prefix}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        lines += [
+            f"# HELP {prefix}_stage_output_bytes_total Bytes of arrays returned by instrumented stages",
+            f"# TYPE {prefix}_stage_output_bytes_total counter",
+        ]
+        lines += [f'{prefix}_stage_output_bytes_total{{stage="{stage}"}} {stats["bytes"]}'
+                  for stage, stats in snapshot.items()]
+        return "\n".join(lines) + "\n"
+
+def _bucket_quantile(buckets, q, max_seconds):
+    count = sum(buckets)
+    if count == 0:
+        return 0.0
+    target = q * count
+    running = 0
+    for bound, n in zip(LATENCY_BUCKETS, buckets):
+        running += n
+        if running >= target:
+            return min(bound, max_seconds)
+    return max_seconds
+
+def _nbytes(result):
+    """Size of the arrays a stage returned (ndarrays inside tuples/dicts too)."""
+    if hasattr(result, "nbytes"):
+        return result.nbytes
+    if isinstance(result, (tuple, list)):
+        return sum(getattr(item, "nbytes", 0) for item in result)
+    if isinstance(result, dict):
+        return sum(getattr(item, "nbytes", 0) for item in result.values())
+    return 0
+
+# Process-wide registry and switch
+metrics = MetricsRegistry()
+_enabled = [config.INSTRUMENTATION_ENABLED or os.environ.get("SMART_METER_INSTRUMENT") == "1"]
+
+def enable(flag=True):
+    _enabled[0] = bool(flag)
+
+def is_enabled():
+    return _enabled[0]
+
+def instrument(stage):
+    """
+    Decorator recording latency, call count and output size under `stage`.
+    When instrumentation is off the wrapper only adds one flag check.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _enabled[0]:
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            result = fn(*args, **kwargs)
+            metrics.record(stage, time.perf_counter() - start, _nbytes(result))
+            return result
+        return wrapper
+    return decorator
+
+class stage_timer:
+    """Context manager form of instrument(), for blocks inside a function."""
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage):
+        self.stage = stage
+        self.start = None
+
+    def __enter__(self):
+        if _enabled[0]:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            metrics.record(self.stage, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,55 @@
+"""
+Module: precision.py
+Description: Floating-point dtype policy (config.PRECISION) and raw int16 ADC input handling
+"""
+
+import numpy as np
+
+from utils import config
+
+PRECISIONS = ("float64", "float32")
+
+def float_dtype():
+    """Real dtype that generation, injection and feature extraction work in."""
+    if config.PRECISION not in PRECISIONS:
+        raise ValueError(f"Unknown PRECISION: {config.PRECISION} (expected one of {PRECISIONS})")
+    return np.dtype(config.PRECISION)
+
+def complex_dtype():
+    """Matching complex dtype (complex128 / complex64) of the spectra."""
+    return np.result_type(float_dtype(), np.complex64)
+
+def as_float(waveform):
+    """Waveform as a policy-dtype array; no copy when it already is one."""
+    return np.asarray(waveform, dtype=float_dtype())
+
+def is_adc(waveform):
+    """True for raw integer ADC sample buffers."""
+    return np.issubdtype(np.asarray(waveform).dtype, np.integer)
+
+def adc_counts(raw, out=None):
+    """
+    Raw ADC counts as policy-dtype floats, without applying the volt scale.
+    RMS, peak and spectra scale linearly and THD / crest factor not at all,
+    so callers fold volts_per_count into their (n_channels,) results instead
+    of multiplying every sample.
+    out: optional preallocated float buffer to reuse across calls
+    """
+    raw = np.asarray(raw)
+    if out is None:
+        out = np.empty(raw.shape, dtype=float_dtype())
+    np.copyto(out, raw)
+    return out
+
+def adc_to_volts(raw, volts_per_count=config.ADC_VOLTS_PER_COUNT, out=None):
+    """Raw ADC counts converted to volts in one pass (policy dtype)."""
+    dtype = float_dtype() if out is None else out.dtype
+    return np.multiply(raw, dtype.type(volts_per_count), out=out, dtype=dtype)
+
+def volts_to_adc(waveform, volts_per_count=config.ADC_VOLTS_PER_COUNT):
+    """Quantizes a waveform to int16 counts, clipping at full scale (simulated ADC)."""
+    info = np.iinfo(np.int16)
+    counts = np.divide(waveform, volts_per_count)
+    np.rint(counts, out=counts)
+    np.clip(counts, info.min, info.max, out=counts)
+    return counts.astype(np.int16)